@@ -10,7 +10,21 @@ Environment Variables:
     PHONE_AGENT_MODEL: Model name (default: autoglm-phone-9b)
     PHONE_AGENT_API_KEY: API key for model authentication (default: EMPTY)
     PHONE_AGENT_MAX_STEPS: Maximum steps per task (default: 100)
+    PHONE_AGENT_STREAM: Stream model output with early action parsing (default: off)
+    PHONE_AGENT_GUIDED_DECODING: Constrain output to the action grammar, regex/json (default: off)
     PHONE_AGENT_DEVICE_ID: ADB device ID for multi-device setups
+    PHONE_AGENT_PERSISTENT_SHELL: Reuse one adb shell for device commands (default: off)
+    PHONE_AGENT_NATIVE_ADB: Use the ADB server socket protocol directly (default: off)
+    PHONE_AGENT_SCREENSHOT_MODE: Screen capture mode, stream/raw/pull (default: stream)
+    PHONE_AGENT_IMAGE_MAX_SIDE: Downscale screenshots to this long side (default: off)
+    PHONE_AGENT_IMAGE_FORMAT: Image format sent to the model (default: png)
+    PHONE_AGENT_IMAGE_QUALITY: JPEG/WebP quality (default: 85)
+    PHONE_AGENT_CONTEXT_TURNS: Recent turns kept verbatim in the context (default: all)
+    PHONE_AGENT_CONTEXT_MAX_CHARS: Character budget for the context (default: none)
+    PHONE_AGENT_MESSAGE_LAYOUT: Message layout, default/prefix (default: default)
+    PHONE_AGENT_ACTION_PLAN: Let the model emit several actions per step (default: off)
+    PHONE_AGENT_PLAN_MAX_ACTIONS: Maximum actions per plan (default: 4)
+    PHONE_AGENT_MACRO_DIR: Directory of recorded macros (default: ~/.cache/phone_agent/macros)
 """
 
 import argparse
@@ -23,9 +37,11 @@ from urllib.parse import urlparse
 from openai import OpenAI
 
 from phone_agent import PhoneAgent
-from phone_agent.adb import ADBConnection, list_devices
+from phone_agent.adb import ADBConnection, ScreenshotConfig, list_devices
 from phone_agent.agent import AgentConfig
 from phone_agent.config.apps import list_supported_apps
+from phone_agent.fleet import FleetRunner
+from phone_agent.macro import DEFAULT_MACRO_DIR
 from phone_agent.model import ModelConfig
 
 
@@ -269,6 +285,9 @@ Examples:
     # Run with specific device
     python main.py --device-id emulator-5554
 
+    # Spread tasks over all connected devices (one task per input line)
+    python main.py --fleet
+
     # Connect to remote device
     python main.py --connect 192.168.1.100:5555
 
@@ -305,6 +324,21 @@ Examples:
         help="API key for model authentication",
     )
 
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        default=os.getenv("PHONE_AGENT_STREAM", "").lower() in ("1", "true", "yes"),
+        help="Stream model output and stop as soon as the action is complete",
+    )
+
+    parser.add_argument(
+        "--guided-decoding",
+        type=str,
+        choices=["regex", "json"],
+        default=os.getenv("PHONE_AGENT_GUIDED_DECODING") or None,
+        help="Constrain model output to valid actions with vLLM guided decoding",
+    )
+
     parser.add_argument(
         "--max-steps",
         type=int,
@@ -321,6 +355,12 @@ Examples:
         help="ADB device ID",
     )
 
+    parser.add_argument(
+        "--fleet",
+        action="store_true",
+        help="Run tasks on every connected device (--device-id pins tasks to a device)",
+    )
+
     parser.add_argument(
         "--connect",
         "-c",
@@ -351,6 +391,114 @@ Examples:
         help="Enable TCP/IP debugging on USB device (default port: 5555)",
     )
 
+    parser.add_argument(
+        "--persistent-shell",
+        action="store_true",
+        default=os.getenv("PHONE_AGENT_PERSISTENT_SHELL", "").lower()
+        in ("1", "true", "yes"),
+        help="Reuse one long-lived adb shell for device commands",
+    )
+
+    parser.add_argument(
+        "--native-adb",
+        action="store_true",
+        default=os.getenv("PHONE_AGENT_NATIVE_ADB", "").lower() in ("1", "true", "yes"),
+        help="Talk to the ADB server socket directly instead of running adb",
+    )
+
+    # Screenshot options
+    parser.add_argument(
+        "--screenshot-mode",
+        type=str,
+        choices=["stream", "raw", "pull"],
+        default=os.getenv("PHONE_AGENT_SCREENSHOT_MODE", "stream"),
+        help="Screen capture mode (default: stream)",
+    )
+
+    parser.add_argument(
+        "--image-max-side",
+        type=int,
+        default=int(os.getenv("PHONE_AGENT_IMAGE_MAX_SIDE", "0")) or None,
+        help="Downscale screenshots so the longer side is at most this many pixels",
+    )
+
+    parser.add_argument(
+        "--image-format",
+        type=str,
+        choices=["png", "jpeg", "webp"],
+        default=os.getenv("PHONE_AGENT_IMAGE_FORMAT", "png"),
+        help="Image format sent to the model (default: png)",
+    )
+
+    parser.add_argument(
+        "--image-quality",
+        type=int,
+        default=int(os.getenv("PHONE_AGENT_IMAGE_QUALITY", "85")),
+        help="JPEG/WebP quality (default: 85)",
+    )
+
+    # Context options
+    parser.add_argument(
+        "--context-turns",
+        type=int,
+        default=int(os.getenv("PHONE_AGENT_CONTEXT_TURNS", "0")) or None,
+        help="Keep this many recent turns verbatim, older ones become an action log",
+    )
+
+    parser.add_argument(
+        "--context-max-chars",
+        type=int,
+        default=int(os.getenv("PHONE_AGENT_CONTEXT_MAX_CHARS", "0")) or None,
+        help="Character budget for the conversation context",
+    )
+
+    parser.add_argument(
+        "--message-layout",
+        type=str,
+        choices=["default", "prefix"],
+        default=os.getenv("PHONE_AGENT_MESSAGE_LAYOUT", "default"),
+        help="Message layout; 'prefix' keeps earlier messages unchanged for "
+        "server-side prefix caching (default: default)",
+    )
+
+    parser.add_argument(
+        "--action-plan",
+        action="store_true",
+        default=os.getenv("PHONE_AGENT_ACTION_PLAN", "").lower()
+        in ("1", "true", "yes"),
+        help="Let the model emit an ordered list of actions per step",
+    )
+
+    parser.add_argument(
+        "--plan-max-actions",
+        type=int,
+        default=int(os.getenv("PHONE_AGENT_PLAN_MAX_ACTIONS", "4")),
+        help="Maximum actions in one plan (default: 4)",
+    )
+
+    parser.add_argument(
+        "--macro-key",
+        type=str,
+        help="Record the task as a macro under this key and replay it on "
+        "later runs while the screens match",
+    )
+
+    parser.add_argument(
+        "--macro-param",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Value that differs between runs of the macro, substituted into "
+        "replayed actions (repeatable)",
+    )
+
+    parser.add_argument(
+        "--macro-dir",
+        type=str,
+        default=os.getenv("PHONE_AGENT_MACRO_DIR", DEFAULT_MACRO_DIR),
+        help=f"Directory of recorded macros (default: {DEFAULT_MACRO_DIR})",
+    )
+
     # Other options
     parser.add_argument(
         "--quiet", "-q", action="store_true", help="Suppress verbose output"
@@ -476,6 +624,8 @@ def main():
         base_url=args.base_url,
         model_name=args.model,
         api_key=args.apikey,
+        stream=args.stream,
+        guided_decoding=args.guided_decoding,
     )
 
     agent_config = AgentConfig(
@@ -483,8 +633,26 @@ def main():
         device_id=args.device_id,
         verbose=not args.quiet,
         lang=args.lang,
+        persistent_shell=args.persistent_shell,
+        native_adb=args.native_adb,
+        screenshot_config=ScreenshotConfig(
+            mode=args.screenshot_mode,
+            max_side=args.image_max_side,
+            image_format=args.image_format,
+            quality=args.image_quality,
+        ),
+        context_turns=args.context_turns,
+        context_max_chars=args.context_max_chars,
+        message_layout=args.message_layout,
+        action_plan=args.action_plan,
+        plan_max_actions=args.plan_max_actions,
+        macro_dir=args.macro_dir,
     )
 
+    if args.fleet:
+        run_fleet(args, model_config, agent_config)
+        return
+
     # Create agent
     agent = PhoneAgent(
         model_config=model_config,
@@ -512,7 +680,11 @@ def main():
     # Run with provided task or enter interactive mode
     if args.task:
         print(f"\nTask: {args.task}\n")
-        result = agent.run(args.task)
+        result = agent.run(
+            args.task,
+            macro_key=args.macro_key,
+            macro_params=dict(p.partition("=")[::2] for p in args.macro_param),
+        )
         print(f"\nResult: {result}")
     else:
         # Interactive mode
@@ -541,5 +713,53 @@ def main():
                 print(f"\nError: {e}\n")
 
 
+def run_fleet(args, model_config: ModelConfig, agent_config: AgentConfig) -> None:
+    """Run tasks across all connected devices until input ends."""
+    fleet = FleetRunner(model_config=model_config, agent_config=agent_config)
+    devices = fleet.start()
+    if not devices:
+        print("No devices connected.")
+        return
+
+    print(f"Fleet devices: {', '.join(devices)}")
+
+    def report(task: str, future) -> None:
+        try:
+            print(f"\nResult [{task}]: {future.result()}")
+        except Exception as e:
+            print(f"\nError [{task}]: {e}")
+
+    def submit(task: str) -> None:
+        future = fleet.submit(task, device_id=args.device_id)
+        future.add_done_callback(lambda f: report(task, f))
+
+    try:
+        if args.task:
+            submit(args.task)
+        else:
+            print("\nEnter one task per line. Type 'quit' or send EOF to finish.\n")
+            while True:
+                try:
+                    task = input().strip()
+                except EOFError:
+                    break
+                if task.lower() in ("quit", "exit", "q"):
+                    break
+                if task:
+                    submit(task)
+
+        fleet.shutdown(wait=True)
+    except KeyboardInterrupt:
+        print("\n\nInterrupted. Cancelling queued tasks...")
+        fleet.shutdown(wait=False, cancel_pending=True)
+
+    print("\nPer-device throughput:")
+    for device_id, stats in fleet.stats().items():
+        print(
+            f"  {device_id:<30} done={stats.completed} failed={stats.failed} "
+            f"rate={stats.tasks_per_hour:.1f}/h busy={stats.utilization:.0%}"
+        )
+
+
 if __name__ == "__main__":
     main()
@@ -1,5 +1,21 @@
 """Action handling module for Phone Agent."""
 
-from phone_agent.actions.handler import ActionHandler, ActionResult
+from phone_agent.actions.handler import (
+    ActionHandler,
+    ActionResult,
+    AsyncActionHandler,
+)
+from phone_agent.actions.parser import (
+    ActionParseError,
+    parse_action,
+    parse_action_plan,
+)
 
-__all__ = ["ActionHandler", "ActionResult"]
+__all__ = [
+    "ActionHandler",
+    "AsyncActionHandler",
+    "ActionResult",
+    "ActionParseError",
+    "parse_action",
+    "parse_action_plan",
+]
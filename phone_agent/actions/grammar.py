@@ -0,0 +1,185 @@
+"""Decoding grammars that restrict the model to valid actions."""
+
+import json
+import re
+from dataclasses import replace
+from typing import Any
+
+from phone_agent.actions.handler import ActionHandler
+
+GUIDED_DECODING_MODES = ("regex", "json")
+
+# Arguments per action as (name, kind, required), in the order the model
+# emits them. Actions missing here accept any string keyword arguments.
+ACTION_ARGUMENTS: dict[str, list[tuple[str, str, bool]]] = {
+    "Launch": [("app", "string", True)],
+    "Tap": [("element", "point", True), ("message", "string", False)],
+    "Type": [("text", "string", True)],
+    "Type_Name": [("text", "string", True)],
+    "Swipe": [("start", "point", True), ("end", "point", True)],
+    "Back": [],
+    "Home": [],
+    "Double Tap": [("element", "point", True)],
+    "Long Press": [("element", "point", True)],
+    "Wait": [("duration", "duration", True)],
+    "Take_over": [("message", "string", True)],
+    "Note": [("message", "string", True)],
+    "Call_API": [
+        ("instruction", "string", False),
+        ("url", "string", False),
+        ("data", "object", False),
+    ],
+    "Interact": [],
+}
+
+_STRING_RE = r'"(?:[^"\\\n]|\\.)*"'
+_VALUE_RE = {
+    "string": _STRING_RE,
+    "point": r"\[\d{1,4}, ?\d{1,4}\]",
+    "duration": r'"\d{1,3}(?:\.\d)? seconds"',
+    "object": rf"\{{(?:{_STRING_RE}: ?{_STRING_RE}(?:, ?{_STRING_RE}: ?{_STRING_RE})*)?\}}",
+}
+_POINT_SCHEMA = {
+    "type": "array",
+    "items": {"type": "integer", "minimum": 0, "maximum": 1000},
+    "minItems": 2,
+    "maxItems": 2,
+}
+_VALUE_SCHEMA = {
+    "string": {"type": "string"},
+    "point": _POINT_SCHEMA,
+    "duration": {"type": "string", "pattern": r"^\d{1,3}(\.\d)? seconds$"},
+    "object": {"type": "object", "additionalProperties": {"type": "string"}},
+}
+
+
+def action_names() -> list[str]:
+    """Actions ActionHandler can execute."""
+    return list(ActionHandler.ACTION_HANDLERS)
+
+
+def action_regex(actions: list[str] | None = None, max_calls: int = 1) -> str:
+    """
+    Build a regex matching one model turn: thinking, then the action.
+
+    The output keeps the `<think>...</think><answer>...</answer>` format of
+    the system prompt, with the answer limited to `do(...)` calls for the
+    given actions (default: all handled actions) or `finish(message=...)`.
+
+    Args:
+        actions: Action names to allow.
+        max_calls: Allow up to this many newline-separated `do(...)` calls
+            (action-plan mode).
+
+    Returns:
+        Regex for vLLM's `guided_regex`.
+    """
+    do_calls = [_call_regex(name) for name in actions or action_names()]
+    do_call = f"(?:{'|'.join(do_calls)})"
+    if max_calls > 1:
+        do_call += rf"(?:\n{do_call}){{0,{max_calls - 1}}}"
+    finish_call = rf"finish\(message={_STRING_RE}\)"
+    return rf"<think>[^<]*</think>\n?<answer>(?:{do_call}|{finish_call})</answer>"
+
+
+def _call_regex(name: str) -> str:
+    """Regex for one `do(action="Name", ...)` call."""
+    pattern = rf"do\(action={re.escape(json.dumps(name))}"
+    arguments = ACTION_ARGUMENTS.get(name)
+    if arguments is None:
+        return pattern + rf"(?:, \w+={_STRING_RE})*\)"
+
+    for arg, kind, required in arguments:
+        part = rf", {arg}={_VALUE_RE[kind]}"
+        pattern += part if required else f"(?:{part})?"
+    return pattern + r"\)"
+
+
+def action_schema(actions: list[str] | None = None) -> dict[str, Any]:
+    """
+    Build a JSON schema for one model turn: `{"thinking": ..., "action": {...}}`.
+
+    The action object carries the action name under "action" ("finish" for
+    finishing) and its arguments as sibling keys.
+
+    Args:
+        actions: Action names to allow (default: all handled actions).
+
+    Returns:
+        Schema for vLLM's `guided_json`.
+    """
+    variants = [_action_schema(name) for name in actions or action_names()]
+    variants.append(
+        {
+            "type": "object",
+            "properties": {
+                "action": {"const": "finish"},
+                "message": {"type": "string"},
+            },
+            "required": ["action", "message"],
+            "additionalProperties": False,
+        }
+    )
+    return {
+        "type": "object",
+        "properties": {
+            "thinking": {"type": "string"},
+            "action": {"anyOf": variants},
+        },
+        "required": ["thinking", "action"],
+        "additionalProperties": False,
+    }
+
+
+def _action_schema(name: str) -> dict[str, Any]:
+    """JSON schema for one action object."""
+    arguments = ACTION_ARGUMENTS.get(name)
+    if arguments is None:
+        return {
+            "type": "object",
+            "properties": {"action": {"const": name}},
+            "required": ["action"],
+            "additionalProperties": {"type": "string"},
+        }
+
+    properties: dict[str, Any] = {"action": {"const": name}}
+    required = ["action"]
+    for arg, kind, is_required in arguments:
+        properties[arg] = _VALUE_SCHEMA[kind]
+        if is_required:
+            required.append(arg)
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": required,
+        "additionalProperties": False,
+    }
+
+
+def apply_guided_decoding(
+    model_config, actions: list[str] | None = None, max_calls: int = 1
+):
+    """
+    Return a copy of a ModelConfig whose extra_body carries the action grammar.
+
+    Does nothing unless `model_config.guided_decoding` is set. Keys already
+    present in extra_body take precedence. The JSON grammar always allows a
+    single action.
+
+    Args:
+        model_config: The model configuration.
+        actions: Action names to allow (default: all handled actions).
+        max_calls: Calls allowed per turn by the regex grammar.
+
+    Returns:
+        The (possibly updated) ModelConfig.
+    """
+    mode = model_config.guided_decoding
+    if mode is None:
+        return model_config
+
+    if mode == "regex":
+        grammar = {"guided_regex": action_regex(actions, max_calls)}
+    else:
+        grammar = {"guided_json": action_schema(actions)}
+    return replace(model_config, extra_body={**grammar, **model_config.extra_body})
@@ -1,22 +1,27 @@
 """Action handler for processing AI model outputs."""
 
+import asyncio
 import time
 from dataclasses import dataclass
 from typing import Any, Callable
 import requests
 
+from phone_agent.actions.parser import parse_action  # noqa: F401 (re-exported)
 from phone_agent.adb import (
     back,
     clear_text,
     detect_and_set_adb_keyboard,
     double_tap,
+    get_current_app,
     home,
+    invalidate_current_app,
     launch_app,
     long_press,
     restore_keyboard,
     swipe,
     tap,
     type_text,
+    wait_for_settle,
 )
 
 
@@ -28,6 +33,8 @@ class ActionResult:
     should_finish: bool
     message: str | None = None
     requires_confirmation: bool = False
+    # Number of actions run, for action plans
+    executed: int | None = None
 
 
 class ActionHandler:
@@ -39,17 +46,46 @@ class ActionHandler:
         confirmation_callback: Optional callback for sensitive action confirmation.
             Should return True to proceed, False to cancel.
         takeover_callback: Optional callback for takeover requests (login, captcha).
+        settle_timeout: Maximum seconds to wait for the screen to stop changing
+            after an action. None restores the fixed 1-second delays.
     """
 
+    # Extra wait before polling for actions whose effect shows up late
+    LAUNCH_MIN_DELAY = 0.5
+
+    # Action name -> handler method name; this is also the action set the
+    # guided decoding grammar allows
+    ACTION_HANDLERS = {
+        "Launch": "_handle_launch",
+        "Tap": "_handle_tap",
+        "Type": "_handle_type",
+        "Type_Name": "_handle_type",
+        "Swipe": "_handle_swipe",
+        "Back": "_handle_back",
+        "Home": "_handle_home",
+        "Double Tap": "_handle_double_tap",
+        "Long Press": "_handle_long_press",
+        "Wait": "_handle_wait",
+        "Take_over": "_handle_takeover",
+        "Note": "_handle_note",
+        "Call_API": "_handle_call_api",
+        "Interact": "_handle_interact",
+    }
+
+    # Actions expected to switch the foreground app within a plan
+    NAVIGATION_ACTIONS = ("Launch", "Back", "Home")
+
     def __init__(
         self,
         device_id: str | None = None,
         confirmation_callback: Callable[[str], bool] | None = None,
         takeover_callback: Callable[[str], None] | None = None,
+        settle_timeout: float | None = 3.0,
     ):
         self.device_id = device_id
         self.confirmation_callback = confirmation_callback or self._default_confirmation
         self.takeover_callback = takeover_callback or self._default_takeover
+        self.settle_timeout = settle_timeout
 
     def execute(
         self, action: dict[str, Any], screen_width: int, screen_height: int
@@ -65,15 +101,48 @@ class ActionHandler:
         Returns:
             ActionResult indicating success and whether to finish.
         """
+        return self._execute(action, screen_width, screen_height)
+
+    def _execute(
+        self, action: dict[str, Any], screen_width: int, screen_height: int
+    ) -> ActionResult:
+        """Run an action on the calling thread (shared by the async variant)."""
+        handler_method, result = self._resolve(action)
+        if result is not None:
+            return result
+
+        try:
+            return handler_method(action, screen_width, screen_height)
+        except Exception as e:
+            return ActionResult(
+                success=False, should_finish=False, message=f"Action failed: {e}"
+            )
+        finally:
+            # The action may have switched the foreground app
+            invalidate_current_app(self.device_id)
+
+    def _resolve(
+        self, action: dict[str, Any]
+    ) -> tuple[Callable | None, ActionResult | None]:
+        """
+        Look up the handler for an action.
+
+        Returns:
+            (handler, None) for a runnable action, or (None, result) when the
+            action finishes the task or cannot be handled.
+        """
         action_type = action.get("_metadata")
 
         if action_type == "finish":
-            return ActionResult(
+            return None, ActionResult(
                 success=True, should_finish=True, message=action.get("message")
             )
 
+        if action_type == "plan":
+            return self._handle_plan, None
+
         if action_type != "do":
-            return ActionResult(
+            return None, ActionResult(
                 success=False,
                 should_finish=True,
                 message=f"Unknown action type: {action_type}",
@@ -83,38 +152,18 @@ class ActionHandler:
         handler_method = self._get_handler(action_name)
 
         if handler_method is None:
-            return ActionResult(
+            return None, ActionResult(
                 success=False,
                 should_finish=False,
                 message=f"Unknown action: {action_name}",
             )
 
-        try:
-            return handler_method(action, screen_width, screen_height)
-        except Exception as e:
-            return ActionResult(
-                success=False, should_finish=False, message=f"Action failed: {e}"
-            )
+        return handler_method, None
 
     def _get_handler(self, action_name: str) -> Callable | None:
         """Get the handler method for an action."""
-        handlers = {
-            "Launch": self._handle_launch,
-            "Tap": self._handle_tap,
-            "Type": self._handle_type,
-            "Type_Name": self._handle_type,
-            "Swipe": self._handle_swipe,
-            "Back": self._handle_back,
-            "Home": self._handle_home,
-            "Double Tap": self._handle_double_tap,
-            "Long Press": self._handle_long_press,
-            "Wait": self._handle_wait,
-            "Take_over": self._handle_takeover,
-            "Note": self._handle_note,
-            "Call_API": self._handle_call_api,
-            "Interact": self._handle_interact,
-        }
-        return handlers.get(action_name)
+        method_name = self.ACTION_HANDLERS.get(action_name)
+        return getattr(self, method_name) if method_name else None
 
     def _convert_relative_to_absolute(
         self, element: list[int], screen_width: int, screen_height: int
@@ -124,14 +173,59 @@ class ActionHandler:
         y = int(element[1] / 1000 * screen_height)
         return x, y
 
+    def _handle_plan(self, action: dict, width: int, height: int) -> ActionResult:
+        """
+        Run a plan's actions in order.
+
+        Every action already waits for the screen to settle. The plan stops
+        at the first failure, finish or confirmation refusal, or when the
+        foreground app changes after an action that is not expected to
+        navigate.
+        """
+        steps = action.get("actions") or []
+        # Still cached from the screen capture of this step
+        expected_app = get_current_app(self.device_id, cached=True)
+        result = ActionResult(True, False)
+        for index, step in enumerate(steps):
+            result = self._execute(step, width, height)
+            if not result.success or result.should_finish:
+                return self._plan_result(result, index + 1)
+            if index + 1 == len(steps):
+                break
+
+            current_app = get_current_app(self.device_id)
+            if step.get("action") in self.NAVIGATION_ACTIONS:
+                expected_app = current_app
+            elif current_app != expected_app:
+                return self._plan_stopped(index + 1, len(steps), current_app)
+        return self._plan_result(result, len(steps))
+
+    @staticmethod
+    def _plan_result(result: ActionResult, executed: int) -> ActionResult:
+        """Tag the result of a plan's last action with the number run."""
+        result.executed = executed
+        return result
+
+    @staticmethod
+    def _plan_stopped(executed: int, total: int, current_app: str) -> ActionResult:
+        """Result for a plan cut short by an unexpected app switch."""
+        return ActionResult(
+            True,
+            False,
+            message=f"Plan stopped after {executed} of {total} actions: "
+            f"screen switched to {current_app}",
+            executed=executed,
+        )
+
     def _handle_launch(self, action: dict, width: int, height: int) -> ActionResult:
         """Handle app launch action."""
         app_name = action.get("app")
         if not app_name:
             return ActionResult(False, False, "No app name specified")
 
-        success = launch_app(app_name, self.device_id)
+        success = launch_app(app_name, self.device_id, delay=0)
         if success:
+            self._wait_for_settle(min_delay=self.LAUNCH_MIN_DELAY)
             return ActionResult(True, False)
         return ActionResult(False, False, f"App not found: {app_name}")
 
@@ -152,7 +246,8 @@ class ActionHandler:
                     message="User cancelled sensitive operation",
                 )
 
-        tap(x, y, self.device_id)
+        tap(x, y, self.device_id, delay=0)
+        self._wait_for_settle()
         return ActionResult(True, False)
 
     def _handle_type(self, action: dict, width: int, height: int) -> ActionResult:
@@ -161,18 +256,15 @@ class ActionHandler:
 
         # Switch to ADB keyboard
         original_ime = detect_and_set_adb_keyboard(self.device_id)
-        time.sleep(1.0)
 
-        # Clear existing text and type new text
+        # Clear existing text and type new text; the broadcasts return once
+        # the keyboard has handled them
         clear_text(self.device_id)
-        time.sleep(1.0)
-
         type_text(text, self.device_id)
-        time.sleep(1.0)
 
-        # Restore original keyboard
+        # Restore original keyboard, then settle once for the whole sequence
         restore_keyboard(original_ime, self.device_id)
-        time.sleep(1.0)
+        self._wait_for_settle()
 
         return ActionResult(True, False)
 
@@ -187,17 +279,20 @@ class ActionHandler:
         start_x, start_y = self._convert_relative_to_absolute(start, width, height)
         end_x, end_y = self._convert_relative_to_absolute(end, width, height)
 
-        swipe(start_x, start_y, end_x, end_y, device_id=self.device_id)
+        swipe(start_x, start_y, end_x, end_y, device_id=self.device_id, delay=0)
+        self._wait_for_settle()
         return ActionResult(True, False)
 
     def _handle_back(self, action: dict, width: int, height: int) -> ActionResult:
         """Handle back button action."""
-        back(self.device_id)
+        back(self.device_id, delay=0)
+        self._wait_for_settle()
         return ActionResult(True, False)
 
     def _handle_home(self, action: dict, width: int, height: int) -> ActionResult:
         """Handle home button action."""
-        home(self.device_id)
+        home(self.device_id, delay=0)
+        self._wait_for_settle()
         return ActionResult(True, False)
 
     def _handle_double_tap(self, action: dict, width: int, height: int) -> ActionResult:
@@ -207,7 +302,8 @@ class ActionHandler:
             return ActionResult(False, False, "No element coordinates")
 
         x, y = self._convert_relative_to_absolute(element, width, height)
-        double_tap(x, y, self.device_id)
+        double_tap(x, y, self.device_id, delay=0)
+        self._wait_for_settle()
         return ActionResult(True, False)
 
     def _handle_long_press(self, action: dict, width: int, height: int) -> ActionResult:
@@ -217,7 +313,8 @@ class ActionHandler:
             return ActionResult(False, False, "No element coordinates")
 
         x, y = self._convert_relative_to_absolute(element, width, height)
-        long_press(x, y, device_id=self.device_id)
+        long_press(x, y, device_id=self.device_id, delay=0)
+        self._wait_for_settle()
         return ActionResult(True, False)
 
     def _handle_wait(self, action: dict, width: int, height: int) -> ActionResult:
@@ -248,9 +345,9 @@ class ActionHandler:
         url = action.get("url")
         if not url:
             return ActionResult(False, False, "Missing 'url' for Call_API")
-        
+
         data = action.get("data", {})
-        
+
         try:
             # Verify if it's a valid URL or just a placeholder
             if not url.startswith("http"):
@@ -258,11 +355,13 @@ class ActionHandler:
 
             response = requests.post(url, json=data, timeout=10)
             response.raise_for_status()
-            
+
             # We return success but usually don't finish the whole task unless specified
             # The agent might need to perform cleanup or other actions.
-            return ActionResult(True, False, message=f"API Request Success: {response.text[:100]}")
-            
+            return ActionResult(
+                True, False, message=f"API Request Success: {response.text[:100]}"
+            )
+
         except Exception as e:
             return ActionResult(False, False, message=f"API Request Failed: {str(e)}")
 
@@ -271,6 +370,15 @@ class ActionHandler:
         # This action signals that user input is needed
         return ActionResult(True, False, message="User interaction required")
 
+    def _wait_for_settle(self, min_delay: float = 0.0) -> None:
+        """Wait for the screen to stop changing after an action."""
+        if self.settle_timeout is None:
+            time.sleep(max(1.0, min_delay))
+            return
+        wait_for_settle(
+            self.device_id, timeout=self.settle_timeout, min_delay=min_delay
+        )
+
     @staticmethod
     def _default_confirmation(message: str) -> bool:
         """Default confirmation callback using console input."""
@@ -283,34 +391,39 @@ class ActionHandler:
         input(f"{message}\nPress Enter after completing manual operation...")
 
 
-def parse_action(response: str) -> dict[str, Any]:
+class AsyncActionHandler(ActionHandler):
     """
-    Parse action from model response.
+    Asyncio variant of ActionHandler.
+
+    `execute` runs ActionHandler.execute in a worker thread, so actions go
+    through the same handlers and device transport as the synchronous
+    handler. Callbacks run in that thread too.
 
     Args:
-        response: Raw response string from the model.
+        device_id: Optional ADB device ID for multi-device setups.
+        confirmation_callback: Optional callback for sensitive action confirmation.
+        takeover_callback: Optional callback for takeover requests (login, captcha).
+        settle_timeout: Maximum seconds to wait for the screen to stop changing
+            after an action. None restores the fixed 1-second delays.
+    """
 
-    Returns:
-        Parsed action dictionary.
+    async def execute(
+        self, action: dict[str, Any], screen_width: int, screen_height: int
+    ) -> ActionResult:
+        """
+        Execute an action from the AI model.
 
-    Raises:
-        ValueError: If the response cannot be parsed.
-    """
-    try:
-        # Try to evaluate as Python dict/function call
-        response = response.strip()
-        if response.startswith("do"):
-            action = eval(response)
-        elif response.startswith("finish"):
-            action = {
-                "_metadata": "finish",
-                "message": response.replace("finish(message=", "")[1:-2],
-            }
-        else:
-            raise ValueError(f"Failed to parse action: {response}")
-        return action
-    except Exception as e:
-        raise ValueError(f"Failed to parse action: {e}")
+        Args:
+            action: The action dictionary from the model.
+            screen_width: Current screen width in pixels.
+            screen_height: Current screen height in pixels.
+
+        Returns:
+            ActionResult indicating success and whether to finish.
+        """
+        return await asyncio.to_thread(
+            self._execute, action, screen_width, screen_height
+        )
 
 
 def do(**kwargs) -> dict[str, Any]:
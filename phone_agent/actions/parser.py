@@ -0,0 +1,333 @@
+"""Parser for the do(...)/finish(...) action grammar emitted by the model."""
+
+import re
+from typing import Any
+
+_WHITESPACE = " \t\r\n"
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_NUMBER_RE = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_CONSTANTS = {"True": True, "False": False, "None": None}
+_ESCAPES = {
+    "\\": "\\",
+    "'": "'",
+    '"': '"',
+    "n": "\n",
+    "t": "\t",
+    "r": "\r",
+    "0": "\0",
+    "\n": "",
+}
+
+# Fast paths for the shapes that make up most steps; anything else (extra
+# arguments, escapes, floats) goes through the full parser.
+_INT = r"\s*(-?\d+)\s*"
+_POINT_ACTION_RE = re.compile(
+    rf'do\(action="(Tap|Long Press|Double Tap)",\s*element=\[{_INT},{_INT}\]\s*\)'
+)
+_SWIPE_RE = re.compile(
+    rf'do\(action="Swipe",\s*start=\[{_INT},{_INT}\],\s*end=\[{_INT},{_INT}\]\s*\)'
+)
+_TYPE_RE = re.compile(r'do\(action="(Type|Type_Name)",\s*text="([^"\\]*)"\s*\)')
+# Free-form finish messages may contain unescaped quotes; the message runs
+# from the first quote to the last matching quote before the closing paren
+_LENIENT_FINISH_RE = re.compile(
+    r"finish\(\s*message\s*=\s*([\"'])(.*)\1\s*\)", re.DOTALL
+)
+
+
+class ActionParseError(ValueError):
+    """
+    Raised when a model response is not a valid action.
+
+    Attributes:
+        text: The response being parsed.
+        position: Character offset where parsing failed.
+    """
+
+    def __init__(self, reason: str, text: str, position: int):
+        self.reason = reason
+        self.text = text
+        self.position = position
+        snippet = text[max(0, position - 20) : position + 20]
+        super().__init__(f"{reason} at position {position} near {snippet!r}")
+
+
+def parse_action(response: str) -> dict[str, Any]:
+    """
+    Parse action from model response.
+
+    Supports `do(...)` and `finish(...)` calls with keyword arguments whose
+    values are string, number, boolean/None, list, tuple or dict literals.
+    Nothing is evaluated.
+
+    Args:
+        response: Raw response string from the model.
+
+    Returns:
+        Parsed action dictionary, with "_metadata" set to "do" or "finish".
+
+    Raises:
+        ActionParseError: If the response cannot be parsed.
+    """
+    response = response.strip()
+
+    action = _parse_fast(response)
+    if action is not None:
+        return action
+
+    try:
+        parser = _Parser(response)
+        action = parser.parse_call()
+        parser.expect_end()
+        return action
+    except ActionParseError:
+        match = _LENIENT_FINISH_RE.fullmatch(response)
+        if match:
+            return {"_metadata": "finish", "message": match.group(2)}
+        raise
+
+
+def parse_action_plan(response: str, max_actions: int | None = None) -> dict[str, Any]:
+    """
+    Parse a response that may hold several calls, one after another.
+
+    A single call parses exactly like `parse_action`. Several calls, separated
+    by whitespace/newlines or ";", become a plan action:
+    `{"_metadata": "plan", "actions": [...], "calls": [...]}`, where "calls"
+    holds the source text of each action.
+
+    Args:
+        response: Raw response string from the model.
+        max_actions: Keep at most this many calls of a plan.
+
+    Returns:
+        Parsed action dictionary.
+
+    Raises:
+        ActionParseError: If the response cannot be parsed.
+    """
+    response = response.strip()
+    parser = _Parser(response)
+    actions = []
+    calls = []
+    try:
+        while True:
+            start = parser.pos
+            actions.append(parser.parse_call())
+            calls.append(response[start : parser.pos].strip())
+            parser.skip_ws()
+            if parser.peek(";"):
+                parser.pos += 1
+                parser.skip_ws()
+            if parser.pos == len(response):
+                break
+    except ActionParseError:
+        # Keep single-call behavior, including the lenient finish fallback
+        return parse_action(response)
+
+    if max_actions is not None:
+        del actions[max_actions:], calls[max_actions:]
+    if len(actions) == 1:
+        return actions[0]
+    return {"_metadata": "plan", "actions": actions, "calls": calls}
+
+
+def _parse_fast(response: str) -> dict[str, Any] | None:
+    """Match the common Tap/Swipe/Type shapes without tokenizing."""
+    match = _POINT_ACTION_RE.fullmatch(response)
+    if match:
+        x, y = int(match.group(2)), int(match.group(3))
+        return {"action": match.group(1), "element": [x, y], "_metadata": "do"}
+
+    match = _SWIPE_RE.fullmatch(response)
+    if match:
+        x1, y1, x2, y2 = (int(v) for v in match.groups())
+        return {
+            "action": "Swipe",
+            "start": [x1, y1],
+            "end": [x2, y2],
+            "_metadata": "do",
+        }
+
+    match = _TYPE_RE.fullmatch(response)
+    if match:
+        return {"action": match.group(1), "text": match.group(2), "_metadata": "do"}
+
+    return None
+
+
+class _Parser:
+    """Recursive-descent parser over a single response string."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def error(self, reason: str, position: int | None = None) -> ActionParseError:
+        return ActionParseError(
+            reason, self.text, self.pos if position is None else position
+        )
+
+    def parse_call(self) -> dict[str, Any]:
+        name_pos = self.pos
+        name = self.parse_ident()
+        if name not in ("do", "finish"):
+            raise self.error(f"Unknown action function {name!r}", name_pos)
+
+        self.skip_ws()
+        self.expect("(")
+        action: dict[str, Any] = {}
+        self.skip_ws()
+        while not self.peek(")"):
+            key_pos = self.pos
+            key = self.parse_ident()
+            self.skip_ws()
+            if not self.peek("="):
+                raise self.error("Expected keyword argument")
+            self.pos += 1
+            if key in action:
+                raise self.error(f"Duplicate argument {key!r}", key_pos)
+            action[key] = self.parse_value()
+            if not self.comma_or(")"):
+                break
+        self.expect(")")
+
+        action["_metadata"] = name
+        return action
+
+    def expect_end(self) -> None:
+        self.skip_ws()
+        if self.pos != len(self.text):
+            raise self.error("Unexpected trailing text")
+
+    def parse_value(self) -> Any:
+        self.skip_ws()
+        if self.pos >= len(self.text):
+            raise self.error("Unexpected end of input")
+
+        char = self.text[self.pos]
+        if char in "\"'":
+            return self.parse_string()
+        if char == "[":
+            return self.parse_sequence("]")
+        if char == "(":
+            return tuple(self.parse_sequence(")"))
+        if char == "{":
+            return self.parse_dict()
+
+        match = _NUMBER_RE.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            literal = match.group()
+            if any(c in literal for c in ".eE"):
+                return float(literal)
+            return int(literal)
+
+        match = _IDENT_RE.match(self.text, self.pos)
+        if match and match.group() in _CONSTANTS:
+            self.pos = match.end()
+            return _CONSTANTS[match.group()]
+
+        raise self.error("Expected a value")
+
+    def parse_string(self) -> str:
+        start = self.pos
+        quote = self.text[self.pos]
+        self.pos += 1
+        parts = []
+        chunk_start = self.pos
+        while True:
+            end = self.pos
+            if end >= len(self.text):
+                raise self.error("Unterminated string", start)
+            char = self.text[end]
+            if char == quote:
+                parts.append(self.text[chunk_start:end])
+                self.pos = end + 1
+                return "".join(parts)
+            if char == "\\":
+                parts.append(self.text[chunk_start:end])
+                parts.append(self.parse_escape())
+                chunk_start = self.pos
+            else:
+                self.pos += 1
+
+    def parse_escape(self) -> str:
+        start = self.pos
+        self.pos += 1
+        if self.pos >= len(self.text):
+            raise self.error("Unterminated string", start)
+        char = self.text[self.pos]
+        self.pos += 1
+        if char in _ESCAPES:
+            return _ESCAPES[char]
+        if char in "xuU":
+            width = {"x": 2, "u": 4, "U": 8}[char]
+            digits = self.text[self.pos : self.pos + width]
+            try:
+                value = chr(int(digits, 16))
+            except ValueError:
+                raise self.error("Invalid escape sequence", start) from None
+            if len(digits) != width:
+                raise self.error("Invalid escape sequence", start)
+            self.pos += width
+            return value
+        # Unknown escapes are kept verbatim, as in Python
+        return "\\" + char
+
+    def parse_sequence(self, close: str) -> list[Any]:
+        self.pos += 1
+        items = []
+        self.skip_ws()
+        while not self.peek(close):
+            items.append(self.parse_value())
+            if not self.comma_or(close):
+                break
+        self.expect(close)
+        return items
+
+    def parse_dict(self) -> dict[Any, Any]:
+        self.pos += 1
+        items = {}
+        self.skip_ws()
+        while not self.peek("}"):
+            key = self.parse_value()
+            self.skip_ws()
+            self.expect(":")
+            items[key] = self.parse_value()
+            if not self.comma_or("}"):
+                break
+        self.expect("}")
+        return items
+
+    def parse_ident(self) -> str:
+        self.skip_ws()
+        match = _IDENT_RE.match(self.text, self.pos)
+        if not match:
+            raise self.error("Expected a name")
+        self.pos = match.end()
+        return match.group()
+
+    def comma_or(self, close: str) -> bool:
+        """Consume a separating comma; False when the closing bracket follows."""
+        self.skip_ws()
+        if self.peek(","):
+            self.pos += 1
+            self.skip_ws()
+            return not self.peek(close)
+        if self.peek(close):
+            return False
+        raise self.error(f"Expected ',' or {close!r}")
+
+    def expect(self, char: str) -> None:
+        self.skip_ws()
+        if not self.peek(char):
+            raise self.error(f"Expected {char!r}")
+        self.pos += 1
+
+    def peek(self, char: str) -> bool:
+        return self.text.startswith(char, self.pos)
+
+    def skip_ws(self) -> None:
+        while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+            self.pos += 1
@@ -1,5 +1,6 @@
 """ADB utilities for Android device interaction."""
 
+from phone_agent.adb.client import AdbClient, AdbProtocolError
 from phone_agent.adb.connection import (
     ADBConnection,
     ConnectionType,
@@ -12,6 +13,7 @@ from phone_agent.adb.device import (
     double_tap,
     get_current_app,
     home,
+    invalidate_current_app,
     launch_app,
     long_press,
     swipe,
@@ -23,11 +25,21 @@ from phone_agent.adb.input import (
     restore_keyboard,
     type_text,
 )
-from phone_agent.adb.screenshot import get_screenshot
+from phone_agent.adb.screenshot import Screenshot, ScreenshotConfig, get_screenshot
+from phone_agent.adb.session import (
+    DeviceSession,
+    DeviceSessionError,
+    close_session,
+    get_session,
+    open_session,
+)
+from phone_agent.adb.settle import get_frame_hash, get_frame_signature, wait_for_settle
 
 __all__ = [
     # Screenshot
     "get_screenshot",
+    "Screenshot",
+    "ScreenshotConfig",
     # Input
     "type_text",
     "clear_text",
@@ -35,6 +47,7 @@ __all__ = [
     "restore_keyboard",
     # Device control
     "get_current_app",
+    "invalidate_current_app",
     "tap",
     "swipe",
     "back",
@@ -42,10 +55,23 @@ __all__ = [
     "double_tap",
     "long_press",
     "launch_app",
+    # Screen settle
+    "wait_for_settle",
+    "get_frame_signature",
+    "get_frame_hash",
+    # Persistent shell sessions
+    "DeviceSession",
+    "DeviceSessionError",
+    "open_session",
+    "get_session",
+    "close_session",
     # Connection management
     "ADBConnection",
     "DeviceInfo",
     "ConnectionType",
     "quick_connect",
     "list_devices",
+    # Native ADB protocol client
+    "AdbClient",
+    "AdbProtocolError",
 ]
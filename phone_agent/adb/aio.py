@@ -0,0 +1,53 @@
+"""Asyncio counterparts of the ADB helpers for driving many devices in one loop.
+
+Each helper runs its synchronous counterpart in a worker thread, so commands
+go through the same transport as the rest of the package: the device's
+persistent shell session or native `AdbClient` when one is open (see
+`open_session`), otherwise an `adb` subprocess.
+
+The helpers run on the event loop's default executor. When driving more
+devices than it has threads, give the loop a larger one with
+`loop.set_default_executor`.
+"""
+
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable
+
+from phone_agent.adb import device, screenshot, session, settle
+from phone_agent.adb import input as text_input
+
+
+def _threaded(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """Wrap a blocking ADB helper into a coroutine function."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    return wrapper
+
+
+# Process helpers
+run_shell = _threaded(session.run_shell)
+run_exec_out = _threaded(session.run_exec_out)
+
+# Screenshot and screen settle
+get_screenshot = _threaded(screenshot.get_screenshot)
+wait_for_settle = _threaded(settle.wait_for_settle)
+
+# Device control
+get_current_app = _threaded(device.get_current_app)
+tap = _threaded(device.tap)
+double_tap = _threaded(device.double_tap)
+long_press = _threaded(device.long_press)
+swipe = _threaded(device.swipe)
+back = _threaded(device.back)
+home = _threaded(device.home)
+launch_app = _threaded(device.launch_app)
+
+# Text input
+type_text = _threaded(text_input.type_text)
+clear_text = _threaded(text_input.clear_text)
+detect_and_set_adb_keyboard = _threaded(text_input.detect_and_set_adb_keyboard)
+restore_keyboard = _threaded(text_input.restore_keyboard)
@@ -0,0 +1,274 @@
+"""Pure-Python client for the ADB server smart-socket protocol."""
+
+import shlex
+import socket
+import struct
+import threading
+
+
+class AdbProtocolError(RuntimeError):
+    """Raised when the ADB server rejects a request or the stream is malformed."""
+
+
+class AdbClient:
+    """
+    Talks to the local ADB server directly instead of forking the `adb` binary.
+
+    Implements the host smart-socket protocol (4-hex-digit length prefixed
+    requests answered by OKAY/FAIL) for `host:` queries, device transport
+    selection, the `shell:`/`exec:` services and `sync:` file pulls. Sync
+    connections are kept per device and reused across pulls.
+
+    Args:
+        host: ADB server host.
+        port: ADB server port.
+        timeout: Default socket timeout in seconds.
+
+    Example:
+        >>> client = AdbClient()
+        >>> client.devices()
+        [('emulator-5554', 'device', {'model': 'sdk_gphone64'})]
+        >>> png = client.exec_out("emulator-5554", ["screencap", "-p"])
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 5037, timeout: float = 10.0
+    ):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+        self._sync_conns: dict[str | None, socket.socket] = {}
+        self._sync_locks: dict[str | None, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Host services
+    # ------------------------------------------------------------------
+
+    def host_request(self, service: str) -> str:
+        """
+        Run a `host:` service that answers with a length-prefixed payload.
+
+        Args:
+            service: Service name, e.g. "host:version" or "host:devices-l".
+
+        Returns:
+            The decoded payload.
+        """
+        with self._connect() as sock:
+            self._send_request(sock, service)
+            return self._read_length_prefixed(sock).decode("utf-8", errors="replace")
+
+    def devices(self) -> list[tuple[str, str, dict[str, str]]]:
+        """
+        List devices known to the ADB server.
+
+        Returns:
+            List of (serial, state, attributes) tuples, where attributes holds
+            the key:value pairs reported by `host:devices-l`.
+        """
+        devices = []
+        for line in self.host_request("host:devices-l").splitlines():
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            attrs = dict(p.split(":", 1) for p in parts[2:] if ":" in p)
+            devices.append((parts[0], parts[1], attrs))
+        return devices
+
+    # ------------------------------------------------------------------
+    # Device services
+    # ------------------------------------------------------------------
+
+    def connect_service(
+        self, serial: str | None, service: str, timeout: float | None = None
+    ) -> socket.socket:
+        """
+        Open a socket bound to a device service.
+
+        Args:
+            serial: Device serial, or None for the only connected device.
+            service: Device service, e.g. "shell:ls" or "exec:sh".
+            timeout: Socket timeout in seconds; None uses the client default.
+
+        Returns:
+            Connected socket streaming the service. The caller owns it.
+        """
+        sock = self._connect(timeout)
+        try:
+            transport = f"host:transport:{serial}" if serial else "host:transport-any"
+            self._send_request(sock, transport)
+            self._send_request(sock, service)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def shell(
+        self, serial: str | None, args: list[str] | str, timeout: float | None = None
+    ) -> str:
+        """
+        Run a shell command and return its output as text.
+
+        Args:
+            serial: Device serial, or None for the only connected device.
+            args: Command arguments or a raw shell string.
+            timeout: Socket timeout in seconds.
+
+        Returns:
+            Command output.
+        """
+        data = self._run_service(serial, f"shell:{_join(args)}", timeout)
+        return data.decode("utf-8", errors="replace").replace("\r\n", "\n")
+
+    def exec_out(
+        self, serial: str | None, args: list[str] | str, timeout: float | None = None
+    ) -> bytes:
+        """
+        Run a command through the binary-safe `exec:` service.
+
+        Args:
+            serial: Device serial, or None for the only connected device.
+            args: Command arguments or a raw shell string.
+            timeout: Socket timeout in seconds.
+
+        Returns:
+            Raw stdout bytes.
+        """
+        return self._run_service(serial, f"exec:{_join(args)}", timeout)
+
+    def pull(
+        self, serial: str | None, remote_path: str, timeout: float | None = None
+    ) -> bytes:
+        """
+        Read a file from the device with the sync protocol.
+
+        The sync connection for the device is kept open and reused; a stale
+        connection is replaced once before giving up.
+
+        Args:
+            serial: Device serial, or None for the only connected device.
+            remote_path: Absolute path on the device.
+            timeout: Socket timeout in seconds.
+
+        Returns:
+            File contents.
+        """
+        with self._lock:
+            lock = self._sync_locks.setdefault(serial, threading.Lock())
+
+        with lock:
+            sock = self._sync_conns.pop(serial, None)
+            if sock is not None:
+                try:
+                    sock.settimeout(timeout or self.timeout)
+                    data = self._sync_recv(sock, remote_path)
+                    self._sync_conns[serial] = sock
+                    return data
+                except OSError:
+                    # Stale connection (device reconnected, server restarted)
+                    sock.close()
+                except AdbProtocolError:
+                    sock.close()
+                    raise
+
+            sock = self.connect_service(serial, "sync:", timeout)
+            try:
+                data = self._sync_recv(sock, remote_path)
+            except Exception:
+                sock.close()
+                raise
+            self._sync_conns[serial] = sock
+            return data
+
+    def close(self) -> None:
+        """Close all cached sync connections."""
+        with self._lock:
+            conns = list(self._sync_conns.values())
+            self._sync_conns.clear()
+        for sock in conns:
+            try:
+                sock.sendall(b"QUIT" + struct.pack("<I", 0))
+            except OSError:
+                pass
+            sock.close()
+
+    # ------------------------------------------------------------------
+    # Wire protocol
+    # ------------------------------------------------------------------
+
+    def _connect(self, timeout: float | None = None) -> socket.socket:
+        """Open a TCP connection to the ADB server."""
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=timeout or self.timeout
+        )
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _run_service(
+        self, serial: str | None, service: str, timeout: float | None
+    ) -> bytes:
+        """Open a device service and read it to EOF."""
+        with self.connect_service(serial, service, timeout) as sock:
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            return b"".join(chunks)
+
+    def _send_request(self, sock: socket.socket, request: str) -> None:
+        """Send a length-prefixed request and wait for OKAY."""
+        payload = request.encode("utf-8")
+        sock.sendall(b"%04x" % len(payload) + payload)
+
+        status = _recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            message = self._read_length_prefixed(sock).decode("utf-8", errors="replace")
+            raise AdbProtocolError(f"{request}: {message}")
+        raise AdbProtocolError(f"{request}: unexpected status {status!r}")
+
+    @staticmethod
+    def _read_length_prefixed(sock: socket.socket) -> bytes:
+        """Read a 4-hex-digit length followed by that many bytes."""
+        length = int(_recv_exact(sock, 4), 16)
+        return _recv_exact(sock, length)
+
+    @staticmethod
+    def _sync_recv(sock: socket.socket, remote_path: str) -> bytes:
+        """Issue a sync RECV and collect the DATA frames until DONE."""
+        path = remote_path.encode("utf-8")
+        sock.sendall(b"RECV" + struct.pack("<I", len(path)) + path)
+
+        chunks = []
+        while True:
+            frame_id, length = struct.unpack("<4sI", _recv_exact(sock, 8))
+            if frame_id == b"DATA":
+                chunks.append(_recv_exact(sock, length))
+            elif frame_id == b"DONE":
+                return b"".join(chunks)
+            elif frame_id == b"FAIL":
+                message = _recv_exact(sock, length).decode("utf-8", errors="replace")
+                raise AdbProtocolError(f"pull {remote_path}: {message}")
+            else:
+                raise AdbProtocolError(f"pull {remote_path}: bad frame {frame_id!r}")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Read exactly `size` bytes or raise on EOF."""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Connection closed by ADB server")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _join(args: list[str] | str) -> str:
+    """Turn an argument list into a device shell command line."""
+    return args if isinstance(args, str) else shlex.join(args)
@@ -6,6 +6,8 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 
+from phone_agent.adb.client import AdbClient
+
 
 class ConnectionType(Enum):
     """Type of ADB connection."""
@@ -40,16 +42,21 @@ class ADBConnection:
         >>> devices = conn.list_devices()
         >>> # Disconnect
         >>> conn.disconnect("192.168.1.100:5555")
+        >>> # Talk to the ADB server directly, without forking adb
+        >>> conn = ADBConnection(client=AdbClient())
     """
 
-    def __init__(self, adb_path: str = "adb"):
+    def __init__(self, adb_path: str = "adb", client: AdbClient | None = None):
         """
         Initialize ADB connection manager.
 
         Args:
             adb_path: Path to ADB executable.
+            client: Optional native ADB client. When given, queries go over the
+                ADB server socket instead of spawning the executable.
         """
         self.adb_path = adb_path
+        self.client = client
 
     def connect(self, address: str, timeout: int = 10) -> tuple[bool, str]:
         """
@@ -71,14 +78,16 @@ class ADBConnection:
             address = f"{address}:5555"  # Default ADB port
 
         try:
-            result = subprocess.run(
-                [self.adb_path, "connect", address],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-            )
-
-            output = result.stdout + result.stderr
+            if self.client is not None:
+                output = self.client.host_request(f"host:connect:{address}")
+            else:
+                result = subprocess.run(
+                    [self.adb_path, "connect", address],
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout,
+                )
+                output = result.stdout + result.stderr
 
             if "connected" in output.lower():
                 return True, f"Connected to {address}"
@@ -103,6 +112,10 @@ class ADBConnection:
             Tuple of (success, message).
         """
         try:
+            if self.client is not None:
+                output = self.client.host_request(f"host:disconnect:{address or ''}")
+                return True, output.strip() or "Disconnected"
+
             cmd = [self.adb_path, "disconnect"]
             if address:
                 cmd.append(address)
@@ -123,15 +136,20 @@ class ADBConnection:
             List of DeviceInfo objects.
         """
         try:
-            result = subprocess.run(
-                [self.adb_path, "devices", "-l"],
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
+            if self.client is not None:
+                output = self.client.host_request("host:devices-l")
+                lines = output.strip().split("\n")
+            else:
+                result = subprocess.run(
+                    [self.adb_path, "devices", "-l"],
+                    capture_output=True,
+                    text=True,
+                    timeout=5,
+                )
+                lines = result.stdout.strip().split("\n")[1:]  # Skip header
 
             devices = []
-            for line in result.stdout.strip().split("\n")[1:]:  # Skip header
+            for line in lines:
                 if not line.strip():
                     continue
 
@@ -234,16 +252,21 @@ class ADBConnection:
             After this, you can disconnect USB and connect via WiFi.
         """
         try:
-            cmd = [self.adb_path]
-            if device_id:
-                cmd.extend(["-s", device_id])
-            cmd.extend(["tcpip", str(port)])
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            if self.client is not None:
+                with self.client.connect_service(device_id, f"tcpip:{port}") as sock:
+                    output = sock.recv(1024).decode("utf-8", errors="replace")
+                returncode = 0 if output else 1
+            else:
+                cmd = [self.adb_path]
+                if device_id:
+                    cmd.extend(["-s", device_id])
+                cmd.extend(["tcpip", str(port)])
 
-            output = result.stdout + result.stderr
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+                output = result.stdout + result.stderr
+                returncode = result.returncode
 
-            if "restarting" in output.lower() or result.returncode == 0:
+            if "restarting" in output.lower() or returncode == 0:
                 time.sleep(2)  # Wait for ADB to restart
                 return True, f"TCP/IP mode enabled on port {port}"
             else:
@@ -263,15 +286,19 @@ class ADBConnection:
             IP address string or None if not found.
         """
         try:
-            cmd = [self.adb_path]
-            if device_id:
-                cmd.extend(["-s", device_id])
-            cmd.extend(["shell", "ip", "route"])
+            if self.client is not None:
+                route_output = self.client.shell(device_id, ["ip", "route"], 5)
+            else:
+                cmd = [self.adb_path]
+                if device_id:
+                    cmd.extend(["-s", device_id])
+                cmd.extend(["shell", "ip", "route"])
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+                route_output = result.stdout
 
             # Parse IP from route output
-            for line in result.stdout.split("\n"):
+            for line in route_output.split("\n"):
                 if "src" in line:
                     parts = line.split()
                     for i, part in enumerate(parts):
@@ -279,15 +306,20 @@ class ADBConnection:
                             return parts[i + 1]
 
             # Alternative: try wlan0 interface
-            cmd[-1] = "ip addr show wlan0"
-            result = subprocess.run(
-                cmd[:-1] + ["shell", "ip", "addr", "show", "wlan0"],
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
-
-            for line in result.stdout.split("\n"):
+            if self.client is not None:
+                addr_output = self.client.shell(
+                    device_id, ["ip", "addr", "show", "wlan0"], 5
+                )
+            else:
+                result = subprocess.run(
+                    cmd[:-3] + ["shell", "ip", "addr", "show", "wlan0"],
+                    capture_output=True,
+                    text=True,
+                    timeout=5,
+                )
+                addr_output = result.stdout
+
+            for line in addr_output.split("\n"):
                 if "inet " in line:
                     parts = line.strip().split()
                     if len(parts) >= 2:
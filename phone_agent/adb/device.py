@@ -1,38 +1,76 @@
 """Device control utilities for Android automation."""
 
-import os
-import subprocess
+import re
+import threading
 import time
 from typing import List, Optional, Tuple
 
-from phone_agent.config.apps import APP_PACKAGES
+from phone_agent.adb.session import run_shell
+from phone_agent.config.apps import APP_PACKAGES, get_app_name
 
+# Filter on the device so only the focus lines cross the wire; the full
+# `dumpsys window` output is hundreds of KB on some ROMs
+FOCUS_COMMAND = "dumpsys window | grep -E 'mCurrentFocus|mFocusedApp'"
+_FOCUS_MARKERS = ("mCurrentFocus", "mFocusedApp")
+_PACKAGE_RE = re.compile(r"[A-Za-z]\w*(?:\.\w+)+")
 
-def get_current_app(device_id: str | None = None) -> str:
+# Focused app per device, valid until the next action (see invalidate_current_app)
+_current_apps: dict[str | None, str] = {}
+_current_app_generations: dict[str | None, int] = {}
+_current_apps_lock = threading.Lock()
+
+
+def get_current_app(device_id: str | None = None, cached: bool = False) -> str:
     """
     Get the currently focused app name.
 
     Args:
         device_id: Optional ADB device ID for multi-device setups.
+        cached: Reuse the last result for the device if no action ran since
+            (ActionHandler calls invalidate_current_app after every action).
 
     Returns:
         The app name if recognized, otherwise "System Home".
     """
-    adb_prefix = _get_adb_prefix(device_id)
+    if cached:
+        app = _current_apps.get(device_id)
+        if app is not None:
+            return app
 
-    result = subprocess.run(
-        adb_prefix + ["shell", "dumpsys", "window"], capture_output=True, text=True
-    )
-    output = result.stdout
+    generation = _current_app_generation(device_id)
+    output = run_shell(FOCUS_COMMAND, device_id)
+    if not any(marker in output for marker in _FOCUS_MARKERS):
+        # No grep on the device
+        output = run_shell(["dumpsys", "window"], device_id)
+    app = _parse_current_app(output)
+    _store_current_app(device_id, generation, app)
+    return app
 
-    # Parse window focus info
-    for line in output.split("\n"):
-        if "mCurrentFocus" in line or "mFocusedApp" in line:
-            for app_name, package in APP_PACKAGES.items():
-                if package in line:
-                    return app_name
 
-    return "System Home"
+def invalidate_current_app(device_id: str | None = None) -> None:
+    """
+    Drop the cached focused app of a device.
+
+    Call after anything that may change the foreground app. Lookups already
+    in flight will not cache their (possibly stale) result.
+
+    Args:
+        device_id: Optional ADB device ID.
+    """
+    with _current_apps_lock:
+        _current_apps.pop(device_id, None)
+        _current_app_generations[device_id] = _current_app_generation(device_id) + 1
+
+
+def _current_app_generation(device_id: str | None) -> int:
+    return _current_app_generations.get(device_id, 0)
+
+
+def _store_current_app(device_id: str | None, generation: int, app: str) -> None:
+    """Cache a lookup unless the device was invalidated while it ran."""
+    with _current_apps_lock:
+        if _current_app_generation(device_id) == generation:
+            _current_apps[device_id] = app
 
 
 def tap(x: int, y: int, device_id: str | None = None, delay: float = 1.0) -> None:
@@ -45,11 +83,7 @@ def tap(x: int, y: int, device_id: str | None = None, delay: float = 1.0) -> Non
         device_id: Optional ADB device ID.
         delay: Delay in seconds after tap.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix + ["shell", "input", "tap", str(x), str(y)], capture_output=True
-    )
+    run_shell(["input", "tap", str(x), str(y)], device_id)
     time.sleep(delay)
 
 
@@ -65,15 +99,9 @@ def double_tap(
         device_id: Optional ADB device ID.
         delay: Delay in seconds after double tap.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix + ["shell", "input", "tap", str(x), str(y)], capture_output=True
-    )
+    run_shell(["input", "tap", str(x), str(y)], device_id)
     time.sleep(0.1)
-    subprocess.run(
-        adb_prefix + ["shell", "input", "tap", str(x), str(y)], capture_output=True
-    )
+    run_shell(["input", "tap", str(x), str(y)], device_id)
     time.sleep(delay)
 
 
@@ -94,12 +122,8 @@ def long_press(
         device_id: Optional ADB device ID.
         delay: Delay in seconds after long press.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix
-        + ["shell", "input", "swipe", str(x), str(y), str(x), str(y), str(duration_ms)],
-        capture_output=True,
+    run_shell(
+        ["input", "swipe", str(x), str(y), str(x), str(y), str(duration_ms)], device_id
     )
     time.sleep(delay)
 
@@ -125,18 +149,11 @@ def swipe(
         device_id: Optional ADB device ID.
         delay: Delay in seconds after swipe.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
     if duration_ms is None:
-        # Calculate duration based on distance
-        dist_sq = (start_x - end_x) ** 2 + (start_y - end_y) ** 2
-        duration_ms = int(dist_sq / 1000)
-        duration_ms = max(1000, min(duration_ms, 2000))  # Clamp between 1000-2000ms
-
-    subprocess.run(
-        adb_prefix
-        + [
-            "shell",
+        duration_ms = _swipe_duration(start_x, start_y, end_x, end_y)
+
+    run_shell(
+        [
             "input",
             "swipe",
             str(start_x),
@@ -145,7 +162,7 @@ def swipe(
             str(end_y),
             str(duration_ms),
         ],
-        capture_output=True,
+        device_id,
     )
     time.sleep(delay)
 
@@ -158,11 +175,7 @@ def back(device_id: str | None = None, delay: float = 1.0) -> None:
         device_id: Optional ADB device ID.
         delay: Delay in seconds after pressing back.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix + ["shell", "input", "keyevent", "4"], capture_output=True
-    )
+    run_shell(["input", "keyevent", "4"], device_id)
     time.sleep(delay)
 
 
@@ -174,11 +187,7 @@ def home(device_id: str | None = None, delay: float = 1.0) -> None:
         device_id: Optional ADB device ID.
         delay: Delay in seconds after pressing home.
     """
-    adb_prefix = _get_adb_prefix(device_id)
-
-    subprocess.run(
-        adb_prefix + ["shell", "input", "keyevent", "KEYCODE_HOME"], capture_output=True
-    )
+    run_shell(["input", "keyevent", "KEYCODE_HOME"], device_id)
     time.sleep(delay)
 
 
@@ -197,28 +206,32 @@ def launch_app(app_name: str, device_id: str | None = None, delay: float = 1.0)
     if app_name not in APP_PACKAGES:
         return False
 
-    adb_prefix = _get_adb_prefix(device_id)
     package = APP_PACKAGES[app_name]
 
-    subprocess.run(
-        adb_prefix
-        + [
-            "shell",
-            "monkey",
-            "-p",
-            package,
-            "-c",
-            "android.intent.category.LAUNCHER",
-            "1",
-        ],
-        capture_output=True,
+    run_shell(
+        ["monkey", "-p", package, "-c", "android.intent.category.LAUNCHER", "1"],
+        device_id,
     )
     time.sleep(delay)
     return True
 
 
-def _get_adb_prefix(device_id: str | None) -> list:
-    """Get ADB command prefix with optional device specifier."""
-    if device_id:
-        return ["adb", "-s", device_id]
-    return ["adb"]
+def _parse_current_app(output: str) -> str:
+    """Find the focused app in `dumpsys window` output."""
+    # Parse window focus info, e.g.
+    # mCurrentFocus=Window{5e0c1f u0 com.tencent.mm/com.tencent.mm.ui.LauncherUI}
+    for line in output.split("\n"):
+        if "mCurrentFocus" in line or "mFocusedApp" in line:
+            for package in _PACKAGE_RE.findall(line):
+                app_name = get_app_name(package)
+                if app_name is not None:
+                    return app_name
+
+    return "System Home"
+
+
+def _swipe_duration(start_x: int, start_y: int, end_x: int, end_y: int) -> int:
+    """Calculate swipe duration based on distance."""
+    dist_sq = (start_x - end_x) ** 2 + (start_y - end_y) ** 2
+    duration_ms = int(dist_sq / 1000)
+    return max(1000, min(duration_ms, 2000))  # Clamp between 1000-2000ms
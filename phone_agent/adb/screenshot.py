@@ -1,16 +1,34 @@
 """Screenshot utilities for capturing Android device screen."""
 
 import base64
-import os
-import subprocess
-import tempfile
-import uuid
+import struct
 from dataclasses import dataclass
 from io import BytesIO
 from typing import Tuple
 
 from PIL import Image
 
+from phone_agent.adb.session import run_exec_out, run_pull, run_shell
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# screencap pixel formats (android PixelFormat) -> (bytes per pixel, PIL mode, raw mode)
+_RAW_PIXEL_FORMATS = {
+    1: (4, "RGBA", "RGBA"),  # RGBA_8888
+    2: (4, "RGBX", "RGBX"),  # RGBX_8888
+    3: (3, "RGB", "RGB"),  # RGB_888
+    # Android packs RGB_565 as (R << 11 | G << 5 | B) little-endian; Pillow
+    # names that layout by its low bits first, so it is "BGR;16", not "RGB;16"
+    4: (2, "RGB", "BGR;16"),  # RGB_565
+    5: (4, "RGBA", "BGRA"),  # BGRA_8888
+}
+
+_MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
 
 @dataclass
 class Screenshot:
@@ -20,76 +38,226 @@ class Screenshot:
     width: int
     height: int
     is_sensitive: bool = False
+    mime_type: str = "image/png"
+
+
+@dataclass
+class ScreenshotConfig:
+    """
+    Configuration for screenshot capture and encoding.
+
+    Attributes:
+        mode: Capture mode. "stream" reads the PNG straight from
+            `adb exec-out screencap -p`; "raw" reads the unencoded framebuffer
+            (`screencap` without -p) and encodes it on the host; "pull" writes
+            the frame to /sdcard and pulls it back (for adb builds without
+            exec-out).
+        max_side: Downscale so the longer side is at most this many pixels.
+            None keeps the device resolution.
+        image_format: Upload format, one of "png", "jpeg" or "webp".
+        quality: Encoder quality for jpeg/webp (1-100).
+    """
+
+    mode: str = "stream"
+    max_side: int | None = None
+    image_format: str = "png"
+    quality: int = 85
+
+    def __post_init__(self):
+        if self.mode not in ("stream", "raw", "pull"):
+            raise ValueError(f"Unknown screenshot mode: {self.mode}")
+        if self.image_format not in _MIME_TYPES:
+            raise ValueError(f"Unsupported image format: {self.image_format}")
 
 
-def get_screenshot(device_id: str | None = None, timeout: int = 10) -> Screenshot:
+def get_screenshot(
+    device_id: str | None = None,
+    timeout: int = 10,
+    config: ScreenshotConfig | None = None,
+) -> Screenshot:
     """
     Capture a screenshot from the connected Android device.
 
     Args:
         device_id: Optional ADB device ID for multi-device setups.
         timeout: Timeout in seconds for screenshot operations.
+        config: Capture and encoding options. Defaults to streaming a
+            full-resolution PNG.
 
     Returns:
-        Screenshot object containing base64 data and dimensions.
+        Screenshot object containing base64 data and dimensions. width and
+        height are always the device resolution, even when the uploaded
+        image was downscaled.
 
     Note:
         If the screenshot fails (e.g., on sensitive screens like payment pages),
         a black fallback image is returned with is_sensitive=True.
     """
-    temp_path = os.path.join(tempfile.gettempdir(), f"screenshot_{uuid.uuid4()}.png")
-    adb_prefix = _get_adb_prefix(device_id)
+    config = config or ScreenshotConfig()
+
+    if config.mode == "raw":
+        return _capture_raw(device_id, timeout, config)
+    if config.mode == "pull":
+        return _capture_pull(device_id, timeout, config)
+    return _capture_stream(device_id, timeout, config)
+
+
+def _capture_stream(
+    device_id: str | None, timeout: int, config: ScreenshotConfig
+) -> Screenshot:
+    """Stream a PNG frame over stdout without touching device or local storage."""
+    try:
+        data, stderr = run_exec_out(["screencap", "-p"], device_id, timeout)
+
+        if not data.startswith(PNG_SIGNATURE):
+            # screencap prints its error text instead of image data on
+            # screens protected by FLAG_SECURE (payment pages etc.)
+            return _create_fallback_screenshot(
+                is_sensitive=_is_secure_failure(data + stderr)
+            )
+
+        return _screenshot_from_png(data, config)
+
+    except Exception as e:
+        print(f"Screenshot error: {e}")
+        return _create_fallback_screenshot(is_sensitive=False)
+
+
+def _capture_raw(
+    device_id: str | None, timeout: int, config: ScreenshotConfig
+) -> Screenshot:
+    """Read the raw framebuffer and encode it on the host."""
+    try:
+        data, stderr = run_exec_out(["screencap"], device_id, timeout)
+
+        try:
+            img = _decode_raw_frame(data)
+        except ValueError:
+            return _create_fallback_screenshot(
+                is_sensitive=_is_secure_failure(data + stderr)
+            )
+
+        width, height = img.size
+        return _encode_screenshot(img, width, height, config)
+
+    except Exception as e:
+        print(f"Screenshot error: {e}")
+        return _create_fallback_screenshot(is_sensitive=False)
 
+
+def _capture_pull(
+    device_id: str | None, timeout: int, config: ScreenshotConfig
+) -> Screenshot:
+    """Capture via a temp file on the device and a pull."""
     try:
         # Execute screenshot command
-        result = subprocess.run(
-            adb_prefix + ["shell", "screencap", "-p", "/sdcard/tmp.png"],
-            capture_output=True,
-            text=True,
-            timeout=timeout,
+        output = run_shell(
+            ["screencap", "-p", "/sdcard/tmp.png"], device_id, timeout=timeout
         )
 
         # Check for screenshot failure (sensitive screen)
-        output = result.stdout + result.stderr
         if "Status: -1" in output or "Failed" in output:
             return _create_fallback_screenshot(is_sensitive=True)
 
-        # Pull screenshot to local temp path
-        subprocess.run(
-            adb_prefix + ["pull", "/sdcard/tmp.png", temp_path],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
+        data = run_pull("/sdcard/tmp.png", device_id, timeout=5)
 
-        if not os.path.exists(temp_path):
+        if not data or not data.startswith(PNG_SIGNATURE):
             return _create_fallback_screenshot(is_sensitive=False)
 
-        # Read and encode image
-        img = Image.open(temp_path)
-        width, height = img.size
+        return _screenshot_from_png(data, config)
+
+    except Exception as e:
+        print(f"Screenshot error: {e}")
+        return _create_fallback_screenshot(is_sensitive=False)
 
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        base64_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
 
-        # Cleanup
-        os.remove(temp_path)
+def _screenshot_from_png(data: bytes, config: ScreenshotConfig) -> Screenshot:
+    """Build a Screenshot from device PNG bytes, transcoding only if needed."""
+    width, height = _read_png_size(data)
 
+    if config.image_format == "png" and not _needs_resize(width, height, config):
+        # screencap already produced a PNG, so hand the bytes on as-is
+        base64_data = base64.b64encode(data).decode("utf-8")
         return Screenshot(
             base64_data=base64_data, width=width, height=height, is_sensitive=False
         )
 
-    except Exception as e:
-        print(f"Screenshot error: {e}")
-        return _create_fallback_screenshot(is_sensitive=False)
+    img = Image.open(BytesIO(data))
+    return _encode_screenshot(img, width, height, config)
+
+
+def _encode_screenshot(
+    img: Image.Image, width: int, height: int, config: ScreenshotConfig
+) -> Screenshot:
+    """Downscale and encode an image, keeping the device dimensions."""
+    if _needs_resize(width, height, config):
+        scale = config.max_side / max(width, height)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        img = img.resize(size, Image.BILINEAR)
+
+    buffered = BytesIO()
+    if config.image_format == "jpeg":
+        img.convert("RGB").save(buffered, format="JPEG", quality=config.quality)
+    elif config.image_format == "webp":
+        img.convert("RGB").save(buffered, format="WEBP", quality=config.quality)
+    else:
+        # Favour speed over size; the bytes only live for one request
+        img.save(buffered, format="PNG", compress_level=1)
+
+    base64_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    return Screenshot(
+        base64_data=base64_data,
+        width=width,
+        height=height,
+        is_sensitive=False,
+        mime_type=_MIME_TYPES[config.image_format],
+    )
+
+
+def _needs_resize(width: int, height: int, config: ScreenshotConfig) -> bool:
+    """Check whether the frame exceeds the configured long side."""
+    return config.max_side is not None and max(width, height) > config.max_side
+
+
+def _decode_raw_frame(data: bytes) -> Image.Image:
+    """
+    Decode `screencap` raw output into an image.
+
+    The header is width, height and pixel format as little-endian uint32,
+    followed on Android 9+ by a fourth uint32 for the color space. The header
+    size is inferred from the payload length.
+    """
+    if len(data) < 12:
+        raise ValueError("Raw frame too short")
+
+    width, height, pixel_format = struct.unpack("<III", data[:12])
+    if pixel_format not in _RAW_PIXEL_FORMATS:
+        raise ValueError(f"Unsupported pixel format: {pixel_format}")
+
+    bpp, mode, raw_mode = _RAW_PIXEL_FORMATS[pixel_format]
+    pixels_len = width * height * bpp
+    header_len = len(data) - pixels_len
+    if width == 0 or height == 0 or header_len not in (12, 16):
+        raise ValueError("Raw frame size does not match header")
+
+    img = Image.frombuffer(
+        mode, (width, height), data[header_len:], "raw", raw_mode, 0, 1
+    )
+    return img.convert("RGB") if mode == "RGBX" else img
+
+
+def _read_png_size(data: bytes) -> Tuple[int, int]:
+    """Read width and height from the PNG IHDR chunk without decoding pixels."""
+    # Signature (8) + chunk length (4) + "IHDR" (4), then width/height as uint32 BE
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        raise ValueError("Invalid PNG header")
+    return struct.unpack(">II", data[16:24])
 
 
-def _get_adb_prefix(device_id: str | None) -> list:
-    """Get ADB command prefix with optional device specifier."""
-    if device_id:
-        return ["adb", "-s", device_id]
-    return ["adb"]
+def _is_secure_failure(output: bytes) -> bool:
+    """Check screencap output for the secure-surface failure message."""
+    text = output.decode("utf-8", errors="replace")
+    return "Status: -1" in text or "Failed" in text
 
 
 def _create_fallback_screenshot(is_sensitive: bool) -> Screenshot:
@@ -0,0 +1,442 @@
+"""Persistent ADB shell sessions for low-latency device commands."""
+
+import atexit
+import os
+import queue
+import shlex
+import socket
+import subprocess
+import tempfile
+import threading
+import uuid
+
+from phone_agent.adb.client import AdbClient
+
+
+class DeviceSessionError(RuntimeError):
+    """
+    Raised when a persistent shell session fails or times out.
+
+    Attributes:
+        command_sent: Whether the command reached the device shell, in which
+            case it may already have taken effect and must not be retried.
+    """
+
+    def __init__(self, message: str, command_sent: bool = False):
+        super().__init__(message)
+        self.command_sent = command_sent
+
+
+class DeviceSession:
+    """
+    Keeps one long-lived `adb shell` per device and runs commands over it.
+
+    Each command is followed by a unique sentinel line carrying the exit
+    status, so output can be framed on a single stream without spawning a new
+    `adb` client process per command.
+
+    With an AdbClient the shell runs over an `exec:sh` socket to the ADB
+    server and exec-out/pull go through the wire protocol, so the session
+    never forks the `adb` binary.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        adb_path: Path to ADB executable.
+        timeout: Default per-command timeout in seconds.
+        client: Optional native ADB client to use instead of the binary.
+
+    Example:
+        >>> session = DeviceSession("emulator-5554")
+        >>> session.shell(["input", "tap", "500", "800"])
+        >>> session.close()
+    """
+
+    def __init__(
+        self,
+        device_id: str | None = None,
+        adb_path: str = "adb",
+        timeout: float = 30.0,
+        client: AdbClient | None = None,
+    ):
+        self.device_id = device_id
+        self.adb_path = adb_path
+        self.timeout = timeout
+        self.client = client
+        self.last_exit_code: int | None = None
+
+        self._sentinel = f"__PHONE_AGENT_{uuid.uuid4().hex}__"
+        self._lock = threading.Lock()
+        self._proc: subprocess.Popen | None = None
+        self._sock: socket.socket | None = None
+        self._lines: queue.Queue = queue.Queue()
+
+    @property
+    def alive(self) -> bool:
+        """Whether the underlying shell is running."""
+        if self._sock is not None:
+            return True
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self) -> None:
+        """Start the shell if it is not already running."""
+        if self.alive:
+            return
+
+        self._lines = queue.Queue()
+        if self.client is not None:
+            # exec: gives a raw, pty-less stream, so nothing is echoed back
+            self._sock = self.client.connect_service(self.device_id, "exec:sh")
+            self._sock.settimeout(None)
+            stream = self._sock.makefile("rb")
+        else:
+            self._proc = subprocess.Popen(
+                self._adb_prefix() + ["shell"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+            stream = self._proc.stdout
+
+        reader = threading.Thread(
+            target=self._read_lines, args=(stream, self._lines), daemon=True
+        )
+        reader.start()
+
+    def shell(self, args: list[str] | str, timeout: float | None = None) -> str:
+        """
+        Run a command in the persistent shell.
+
+        Args:
+            args: Command arguments (quoted individually) or a raw shell string.
+            timeout: Timeout in seconds, defaults to the session timeout.
+
+        Returns:
+            Combined stdout and stderr of the command.
+
+        Raises:
+            DeviceSessionError: If the shell died or the command timed out.
+                The session is closed and restarts on the next call.
+        """
+        command = args if isinstance(args, str) else shlex.join(args)
+        timeout = timeout or self.timeout
+
+        with self._lock:
+            try:
+                self.start()
+            except Exception as e:
+                raise DeviceSessionError(f"Failed to start shell session: {e}")
+
+            # stdin is detached so a command can never swallow the next one
+            line = (
+                f"{{ {command}; }} </dev/null 2>&1; "
+                f"printf '\\n{self._sentinel} %d\\n' $?\n"
+            )
+            try:
+                self._write(line.encode("utf-8"))
+            except OSError as e:
+                self._terminate()
+                raise DeviceSessionError(f"Shell session write failed: {e}")
+
+            return self._read_until_sentinel(timeout)
+
+    def exec_out(
+        self, args: list[str], timeout: float | None = None
+    ) -> tuple[bytes, bytes]:
+        """
+        Run a command with binary-safe output.
+
+        Args:
+            args: Command arguments.
+            timeout: Timeout in seconds, defaults to the session timeout.
+
+        Returns:
+            Tuple of (stdout, stderr). stderr is empty on the native client.
+        """
+        timeout = timeout or self.timeout
+        if self.client is not None:
+            return self.client.exec_out(self.device_id, args, timeout), b""
+
+        result = subprocess.run(
+            self._adb_prefix() + ["exec-out"] + list(args),
+            capture_output=True,
+            timeout=timeout,
+        )
+        return result.stdout, result.stderr
+
+    def pull(self, remote_path: str, timeout: float | None = None) -> bytes | None:
+        """
+        Read a file from the device.
+
+        Args:
+            remote_path: Absolute path on the device.
+            timeout: Timeout in seconds, defaults to the session timeout.
+
+        Returns:
+            File contents, or None if the pull failed.
+        """
+        timeout = timeout or self.timeout
+        if self.client is not None:
+            try:
+                return self.client.pull(self.device_id, remote_path, timeout)
+            except Exception as e:
+                print(f"Pull error: {e}")
+                return None
+        return _pull_via_binary(self._adb_prefix(), remote_path, timeout)
+
+    def close(self) -> None:
+        """Close the shell session."""
+        with self._lock:
+            self._terminate()
+
+    def __enter__(self) -> "DeviceSession":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_until_sentinel(self, timeout: float) -> str:
+        """Collect output lines until the sentinel line for this command."""
+        chunks: list[str] = []
+        prefix = self._sentinel + " "
+
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                self._terminate()
+                raise DeviceSessionError(
+                    f"Shell command timed out after {timeout}s", command_sent=True
+                )
+
+            if line is None:
+                self._terminate()
+                raise DeviceSessionError(
+                    "Shell session closed unexpectedly", command_sent=True
+                )
+
+            if line.startswith(prefix):
+                try:
+                    self.last_exit_code = int(line[len(prefix) :].strip())
+                except ValueError:
+                    self.last_exit_code = None
+                output = "".join(chunks)
+                # Drop the newline printed in front of the sentinel
+                return output[:-1] if output.endswith("\n") else output
+
+            chunks.append(line)
+
+    def _adb_prefix(self) -> list:
+        """Get ADB command prefix for this session's device."""
+        if self.device_id:
+            return [self.adb_path, "-s", self.device_id]
+        return [self.adb_path]
+
+    def _write(self, data: bytes) -> None:
+        """Send bytes to the shell's stdin."""
+        if self._sock is not None:
+            self._sock.sendall(data)
+        else:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+
+    def _terminate(self) -> None:
+        """Tear down the shell, if any."""
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
+        self._proc = None
+
+    @staticmethod
+    def _read_lines(stream, lines: queue.Queue) -> None:
+        """Pump shell output into the line queue until EOF."""
+        try:
+            for raw in iter(stream.readline, b""):
+                lines.put(raw.decode("utf-8", errors="replace").replace("\r\n", "\n"))
+        except (OSError, ValueError):
+            pass
+        lines.put(None)
+
+
+_sessions: dict[str | None, DeviceSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def open_session(
+    device_id: str | None = None,
+    adb_path: str = "adb",
+    client: AdbClient | None = None,
+) -> DeviceSession:
+    """
+    Open (or reuse) the persistent shell session for a device.
+
+    Once opened, the device helpers and get_screenshot route their commands
+    through it.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        adb_path: Path to ADB executable.
+        client: Optional native ADB client; when given the session never forks
+            the `adb` binary.
+
+    Returns:
+        The running DeviceSession.
+    """
+    with _sessions_lock:
+        session = _sessions.get(device_id)
+        if session is None:
+            session = DeviceSession(device_id, adb_path=adb_path, client=client)
+            _sessions[device_id] = session
+    session.start()
+    return session
+
+
+def get_session(device_id: str | None = None) -> DeviceSession | None:
+    """Get the registered session for a device, if any."""
+    return _sessions.get(device_id)
+
+
+def close_session(device_id: str | None = None) -> None:
+    """Close and unregister the session for a device."""
+    with _sessions_lock:
+        session = _sessions.pop(device_id, None)
+    if session is not None:
+        session.close()
+
+
+def close_all_sessions() -> None:
+    """Close every registered session."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def run_shell(
+    args: list[str] | str, device_id: str | None = None, timeout: float | None = None
+) -> str:
+    """
+    Run a device shell command, preferring a persistent session.
+
+    Falls back to a one-off `adb shell` process when no session is open for
+    the device, or when the session failed before the command was sent.
+
+    Args:
+        args: Command arguments, or a raw shell string (pipes, redirects).
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Optional timeout in seconds.
+
+    Returns:
+        Combined stdout and stderr of the command.
+    """
+    session = get_session(device_id)
+    if session is not None:
+        try:
+            return session.shell(args, timeout=timeout)
+        except DeviceSessionError as e:
+            if e.command_sent:
+                print(f"Shell session error: {e}")
+                return ""
+            print(f"Shell session error, falling back to adb: {e}")
+
+    adb_prefix = _get_adb_prefix(device_id)
+    shell_args = [args] if isinstance(args, str) else list(args)
+    result = subprocess.run(
+        adb_prefix + ["shell"] + shell_args,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    return result.stdout + result.stderr
+
+
+def run_exec_out(
+    args: list[str], device_id: str | None = None, timeout: float | None = None
+) -> tuple[bytes, bytes]:
+    """
+    Run a command with binary-safe output, preferring a persistent session.
+
+    Args:
+        args: Command arguments.
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Optional timeout in seconds.
+
+    Returns:
+        Tuple of (stdout, stderr).
+    """
+    session = get_session(device_id)
+    if session is not None:
+        return session.exec_out(args, timeout=timeout)
+
+    result = subprocess.run(
+        _get_adb_prefix(device_id) + ["exec-out"] + list(args),
+        capture_output=True,
+        timeout=timeout,
+    )
+    return result.stdout, result.stderr
+
+
+def run_pull(
+    remote_path: str, device_id: str | None = None, timeout: float | None = None
+) -> bytes | None:
+    """
+    Read a file from the device, preferring a persistent session.
+
+    Args:
+        remote_path: Absolute path on the device.
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Optional timeout in seconds.
+
+    Returns:
+        File contents, or None if the pull failed.
+    """
+    session = get_session(device_id)
+    if session is not None:
+        return session.pull(remote_path, timeout=timeout)
+    return _pull_via_binary(_get_adb_prefix(device_id), remote_path, timeout)
+
+
+def _pull_via_binary(
+    adb_prefix: list, remote_path: str, timeout: float | None
+) -> bytes | None:
+    """Pull a file with `adb pull` through a local temp file."""
+    temp_path = os.path.join(tempfile.gettempdir(), f"pull_{uuid.uuid4()}")
+    try:
+        subprocess.run(
+            adb_prefix + ["pull", remote_path, temp_path],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        if not os.path.exists(temp_path):
+            return None
+        with open(temp_path, "rb") as f:
+            return f.read()
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _get_adb_prefix(device_id: str | None) -> list:
+    """Get ADB command prefix with optional device specifier."""
+    if device_id:
+        return ["adb", "-s", device_id]
+    return ["adb"]
+
+
+atexit.register(close_all_sessions)
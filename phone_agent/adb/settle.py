@@ -0,0 +1,135 @@
+"""Screen-settle detection to replace fixed post-action delays."""
+
+import re
+import time
+
+from phone_agent.adb.session import run_shell
+
+# SurfaceFlinger transaction 1013 replies with the display's page-flip count,
+# which only advances when a new frame is composited. It needs HARDWARE_TEST,
+# which the adb shell user holds on stock builds.
+FRAME_COUNTER_COMMAND = "service call SurfaceFlinger 1013"
+_PARCEL_INT_RE = re.compile(r"Parcel\(\s*([0-9a-fA-F]{8})\s")
+_MD5_PATTERN = re.compile(r"\b([0-9a-f]{32})\b")
+
+# Whether the page-flip counter works on a device, learned on first use
+_frame_counter_support: dict[str | None, bool] = {}
+
+
+def wait_for_settle(
+    device_id: str | None = None,
+    timeout: float = 3.0,
+    interval: float = 0.1,
+    stable_frames: int = 2,
+    min_delay: float = 0.0,
+    fallback_delay: float = 1.0,
+) -> bool:
+    """
+    Wait until the screen stops changing.
+
+    Polls a marker of the current frame (see `get_frame_signature`) and
+    returns as soon as `stable_frames` consecutive markers match, or when
+    `timeout` expires.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+        timeout: Maximum time to wait in seconds, including min_delay.
+        interval: Pause between polls in seconds.
+        stable_frames: Number of identical consecutive frames that count as
+            settled.
+        min_delay: Time to wait before the first poll, for actions whose
+            effect does not show up immediately (e.g. app launches).
+        fallback_delay: Fixed delay used when frames cannot be observed.
+
+    Returns:
+        True if the screen settled, False on timeout or fallback.
+    """
+    deadline = time.monotonic() + timeout
+    if min_delay > 0:
+        time.sleep(min_delay)
+
+    last_signature = None
+    stable = 1
+
+    while True:
+        signature = get_frame_signature(device_id)
+        if signature is None:
+            time.sleep(max(0.0, min(fallback_delay, deadline - time.monotonic())))
+            return False
+
+        if signature == last_signature:
+            stable += 1
+            if stable >= stable_frames:
+                return True
+        else:
+            stable = 1
+        last_signature = signature
+
+        if time.monotonic() + interval >= deadline:
+            return False
+        time.sleep(interval)
+
+
+def get_frame_signature(device_id: str | None = None) -> str | None:
+    """
+    Get a value that changes whenever a new frame is shown.
+
+    Uses the compositor's page-flip counter where the device exposes it, so
+    a poll is one short shell command instead of a screen capture. Other
+    devices fall back to `get_frame_hash`.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+
+    Returns:
+        The marker, or None if the frame could not be observed.
+    """
+    supported = _frame_counter_support.get(device_id)
+    if supported is not False:
+        counter = get_frame_counter(device_id)
+        if counter is not None:
+            _frame_counter_support[device_id] = True
+            return f"flips:{counter}"
+        if supported is None:
+            _frame_counter_support[device_id] = False
+    return get_frame_hash(device_id)
+
+
+def get_frame_counter(device_id: str | None = None) -> int | None:
+    """
+    Read the display's page-flip count from SurfaceFlinger.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+
+    Returns:
+        The count, or None if the device does not expose it.
+    """
+    try:
+        output = run_shell(FRAME_COUNTER_COMMAND, device_id, timeout=5)
+    except Exception:
+        return None
+    match = _PARCEL_INT_RE.search(output)
+    return int(match.group(1), 16) if match else None
+
+
+def get_frame_hash(device_id: str | None = None) -> str | None:
+    """
+    Get a hash of the current frame.
+
+    The raw framebuffer is hashed on the device so only the digest crosses
+    the wire.
+
+    Args:
+        device_id: Optional ADB device ID for multi-device setups.
+
+    Returns:
+        Hex digest, or None if the frame could not be captured or the device
+        has no md5sum.
+    """
+    try:
+        output = run_shell("screencap | md5sum", device_id, timeout=5)
+    except Exception:
+        return None
+    match = _MD5_PATTERN.search(output)
+    return match.group(1) if match else None
@@ -1,16 +1,29 @@
 """Main PhoneAgent class for orchestrating phone automation."""
 
 import json
+import queue
 import traceback
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Any, Callable
 
-from phone_agent.actions import ActionHandler
-from phone_agent.actions.handler import do, finish, parse_action
-from phone_agent.adb import get_current_app, get_screenshot
-from phone_agent.config import get_messages, get_system_prompt
+from phone_agent.actions import ActionHandler, ActionResult
+from phone_agent.actions.grammar import apply_guided_decoding
+from phone_agent.actions.handler import do, finish
+from phone_agent.actions.parser import parse_action, parse_action_plan
+from phone_agent.adb import (
+    AdbClient,
+    Screenshot,
+    ScreenshotConfig,
+    get_current_app,
+    get_screenshot,
+    invalidate_current_app,
+    open_session,
+)
+from phone_agent.config import get_messages, get_plan_prompt, get_system_prompt
+from phone_agent.macro import DEFAULT_MACRO_DIR, MacroCache, MacroSession
 from phone_agent.model import ModelClient, ModelConfig
-from phone_agent.model.client import MessageBuilder
+from phone_agent.model.client import MessageBuilder, ModelResponse
 
 
 @dataclass
@@ -22,10 +35,38 @@ class AgentConfig:
     lang: str = "cn"
     system_prompt: str | None = None
     verbose: bool = True
+    screenshot_config: ScreenshotConfig = field(default_factory=ScreenshotConfig)
+    persistent_shell: bool = False
+    native_adb: bool = False
+    settle_timeout: float | None = 3.0
+    pipeline_capture: bool = True
+    context_turns: int | None = None
+    context_collapse_every: int = 5
+    context_max_chars: int | None = None
+    message_layout: str = "default"
+    action_plan: bool = False
+    plan_max_actions: int = 4
+    macro_dir: str | None = DEFAULT_MACRO_DIR
+    macro_max_distance: int = 40
 
     def __post_init__(self):
+        if self.plan_max_actions < 1:
+            raise ValueError("plan_max_actions must be at least 1")
         if self.system_prompt is None:
             self.system_prompt = get_system_prompt(self.lang)
+            if self.action_plan:
+                self.system_prompt += get_plan_prompt(self.lang, self.plan_max_actions)
+        if self.context_turns is not None and self.context_turns < 1:
+            raise ValueError("context_turns must be at least 1")
+        if self.context_collapse_every < 1:
+            raise ValueError("context_collapse_every must be at least 1")
+        if self.message_layout not in ("default", "prefix"):
+            raise ValueError(f"Unsupported message layout: {self.message_layout}")
+
+    @property
+    def max_action_calls(self) -> int:
+        """Actions the model may emit per step."""
+        return self.plan_max_actions if self.action_plan else 1
 
 
 @dataclass
@@ -61,6 +102,13 @@ class PhoneAgent:
         >>> agent.run("Open WeChat and send a message to John")
     """
 
+    # Longest action text kept per entry in the collapsed action log
+    ACTION_LOG_ENTRY_CHARS = 200
+
+    # Swapped for their asyncio variants by AsyncPhoneAgent
+    model_client_class = ModelClient
+    action_handler_class = ActionHandler
+
     def __init__(
         self,
         model_config: ModelConfig | None = None,
@@ -68,36 +116,81 @@ class PhoneAgent:
         confirmation_callback: Callable[[str], bool] | None = None,
         takeover_callback: Callable[[str], None] | None = None,
     ):
-        self.model_config = model_config or ModelConfig()
         self.agent_config = agent_config or AgentConfig()
+        self.model_config = apply_guided_decoding(
+            model_config or ModelConfig(),
+            max_calls=self.agent_config.max_action_calls,
+        )
 
-        self.model_client = ModelClient(self.model_config)
-        self.action_handler = ActionHandler(
+        self.model_client = self.model_client_class(self.model_config)
+        self.model_client.max_action_calls = self.agent_config.max_action_calls
+        self.action_handler = self.action_handler_class(
             device_id=self.agent_config.device_id,
             confirmation_callback=confirmation_callback,
             takeover_callback=takeover_callback,
+            settle_timeout=self.agent_config.settle_timeout,
         )
 
+        if self.agent_config.native_adb:
+            open_session(self.agent_config.device_id, client=AdbClient())
+        elif self.agent_config.persistent_shell:
+            open_session(self.agent_config.device_id)
+
         self._context: list[dict[str, Any]] = []
         self._step_count = 0
+        self._task: str | None = None
+        self._current_app: str | None = None
+        self._action_log: list[str] = []
+        self._collapsed_steps = 0
+        self._macro_cache = self._create_macro_cache()
+        self._macro: MacroSession | None = None
+
+        # Captures run on worker threads so the next frame is taken while the
+        # current step finishes its bookkeeping; at most one frame is queued.
+        # Separate pools keep a prefetch from waiting on its own worker.
+        self._executor: ThreadPoolExecutor | None = None
+        self._prefetch_executor: ThreadPoolExecutor | None = None
+        if self.agent_config.pipeline_capture:
+            self._executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="phone-agent-capture"
+            )
+            self._prefetch_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="phone-agent-prefetch"
+            )
+        self._frames: queue.Queue[Future] = queue.Queue(maxsize=1)
 
-    def run(self, task: str) -> str:
+    def run(
+        self,
+        task: str,
+        macro_key: str | None = None,
+        macro_params: dict[str, str] | None = None,
+    ) -> str:
         """
         Run the agent to complete a task.
 
+        With a `macro_key`, a successful run is recorded under that key and
+        later runs replay it without model requests for as long as the
+        screens match. Only pass a key for tasks whose outcome follows from
+        the screen layout: replay also repeats the recorded finish message.
+
         Args:
             task: Natural language description of the task.
+            macro_key: Task template to record and replay under; None
+                disables the macro cache for this run.
+            macro_params: Values that vary between runs of the template;
+                they are substituted into replayed actions.
 
         Returns:
             Final message from the agent.
         """
-        self._context = []
-        self._step_count = 0
+        self.reset()
+        self._start_macro(macro_key, macro_params)
 
         # First step with user prompt
         result = self._execute_step(task, is_first=True)
 
         if result.finished:
+            self._close_macro(result)
             return result.message or "Task completed"
 
         # Continue until finished or max steps reached
@@ -105,8 +198,10 @@ class PhoneAgent:
             result = self._execute_step(is_first=False)
 
             if result.finished:
+                self._close_macro(result)
                 return result.message or "Task completed"
 
+        self._close_macro(None)
         return "Max steps reached"
 
     def step(self, task: str | None = None) -> StepResult:
@@ -132,6 +227,77 @@ class PhoneAgent:
         """Reset the agent state for a new task."""
         self._context = []
         self._step_count = 0
+        self._task = None
+        self._current_app = None
+        self._action_log = []
+        self._collapsed_steps = 0
+        self._macro = None
+        self._discard_prefetched_frame()
+        # The phone may have changed since the last task's final capture
+        invalidate_current_app(self.agent_config.device_id)
+
+    def close(self) -> None:
+        """
+        Stop the capture threads, dropping a frame that is still prefetching.
+
+        The agent stays usable afterwards but captures synchronously.
+        """
+        self._discard_prefetched_frame()
+        for executor in (self._prefetch_executor, self._executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._prefetch_executor = None
+
+    def __enter__(self) -> "PhoneAgent":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _create_macro_cache(self) -> MacroCache | None:
+        """Open the trajectory cache if one is configured."""
+        if self.agent_config.macro_dir is None:
+            return None
+        return MacroCache(
+            self.agent_config.macro_dir, self.agent_config.macro_max_distance
+        )
+
+    def _start_macro(self, key: str | None, params: dict[str, str] | None) -> None:
+        """Begin replaying/recording the trajectory of a run."""
+        if self._macro_cache is not None and key is not None:
+            self._macro = self._macro_cache.session(key, params)
+
+    def _close_macro(self, result: StepResult | None) -> None:
+        """Save the run's trajectory if the task finished successfully."""
+        macro, self._macro = self._macro, None
+        if macro is None:
+            return
+        macro.close(
+            result is not None
+            and result.success
+            and (result.action or {}).get("_metadata") == "finish"
+        )
+
+    def _replayed_response(
+        self, screenshot: Screenshot, current_app: str
+    ) -> ModelResponse | None:
+        """Recorded answer for this screen when a macro is being replayed."""
+        if self._macro is None:
+            return None
+        response = self._macro.observe(screenshot, current_app)
+        if response is None:
+            return None
+        try:
+            self._parse_action_text(response.action)
+        except ValueError:
+            # Never execute (or save) a recording this agent cannot parse
+            self._macro.abandon()
+            return None
+        if self.agent_config.verbose:
+            msgs = get_messages(self.agent_config.lang)
+            print(f"⏩ {msgs['macro_replay']} ({msgs['step']} {self._step_count})")
+        return response
 
     def _execute_step(
         self, user_prompt: str | None = None, is_first: bool = False
@@ -140,50 +306,99 @@ class PhoneAgent:
         self._step_count += 1
 
         # Capture current screen state
-        screenshot = get_screenshot(self.agent_config.device_id)
-        current_app = get_current_app(self.agent_config.device_id)
+        screenshot, current_app = self._next_screen_state()
+        self._append_screen_message(screenshot, current_app, user_prompt, is_first)
+
+        # Get model response, unless a recorded one matches this screen
+        response = self._replayed_response(screenshot, current_app)
+        if response is None:
+            try:
+                response = self.model_client.request(self._context)
+            except Exception as e:
+                return self._model_error_result(e)
+
+        action = self._parse_response_action(response)
+
+        # Execute action
+        try:
+            result = self.action_handler.execute(
+                action, screenshot.width, screenshot.height
+            )
+        except Exception as e:
+            if self.agent_config.verbose:
+                traceback.print_exc()
+            result = self.action_handler.execute(
+                finish(message=str(e)), screenshot.width, screenshot.height
+            )
+
+        # Check if finished
+        finished = action.get("_metadata") == "finish" or result.should_finish
+
+        # The action has settled, so start capturing the next step's screen
+        # while the bookkeeping below runs
+        if not finished:
+            self._prefetch_screen_state()
+
+        return self._complete_step(response, action, result, finished)
+
+    def _append_screen_message(
+        self,
+        screenshot: Screenshot,
+        current_app: str,
+        user_prompt: str | None,
+        is_first: bool,
+    ) -> None:
+        """
+        Add the user message carrying the current screen to the context.
+
+        The "prefix" layout keeps every earlier message byte-identical from
+        step to step so servers with automatic prefix caching can reuse the
+        KV cache: the task is its own message after the system prompt, and
+        the screen text comes before the image, so dropping the image later
+        only trims the end of the message.
+        """
+        self._current_app = current_app
+        prefix_layout = self.agent_config.message_layout == "prefix"
+        screen_info = MessageBuilder.build_screen_info(current_app)
 
-        # Build messages
         if is_first:
+            self._task = user_prompt
             self._context.append(
                 MessageBuilder.create_system_message(self.agent_config.system_prompt)
             )
+            if prefix_layout:
+                self._context.append(MessageBuilder.create_user_message(user_prompt))
 
-            screen_info = MessageBuilder.build_screen_info(current_app)
+        if is_first and not prefix_layout:
             text_content = f"{user_prompt}\n\n{screen_info}"
-
-            self._context.append(
-                MessageBuilder.create_user_message(
-                    text=text_content, image_base64=screenshot.base64_data
-                )
-            )
         else:
-            screen_info = MessageBuilder.build_screen_info(current_app)
             text_content = f"** Screen Info **\n\n{screen_info}"
 
-            self._context.append(
-                MessageBuilder.create_user_message(
-                    text=text_content, image_base64=screenshot.base64_data
-                )
+        self._context.append(
+            MessageBuilder.create_user_message(
+                text=text_content,
+                image_base64=screenshot.base64_data,
+                image_mime=screenshot.mime_type,
+                text_first=prefix_layout,
             )
+        )
 
-        # Get model response
-        try:
-            response = self.model_client.request(self._context)
-        except Exception as e:
-            if self.agent_config.verbose:
-                traceback.print_exc()
-            return StepResult(
-                success=False,
-                finished=True,
-                action=None,
-                thinking="",
-                message=f"Model error: {e}",
-            )
+    def _model_error_result(self, error: Exception) -> StepResult:
+        """Build the step result for a failed model request."""
+        if self.agent_config.verbose:
+            traceback.print_exc()
+        return StepResult(
+            success=False,
+            finished=True,
+            action=None,
+            thinking="",
+            message=f"Model error: {error}",
+        )
 
-        # Parse action from response
+    def _parse_response_action(self, response: ModelResponse) -> dict[str, Any]:
+        """Parse the model's action and drop the screenshot from the context."""
         try:
-            action = parse_action(response.action)
+            action = self._parse_action_text(response.action)
         except ValueError:
             if self.agent_config.verbose:
                 traceback.print_exc()
@@ -199,32 +414,48 @@ class PhoneAgent:
             print("-" * 50)
             print(f"🎯 {msgs['action']}:")
             print(json.dumps(action, ensure_ascii=False, indent=2))
+            if response.prompt_tokens is not None:
+                print("-" * 50)
+                print(
+                    f"📊 {msgs['prompt_tokens']}: {response.prompt_tokens} "
+                    f"({msgs['cached_tokens']}: {response.cached_tokens or 0})"
+                )
             print("=" * 50 + "\n")
 
         # Remove image from context to save space
         self._context[-1] = MessageBuilder.remove_images_from_message(self._context[-1])
 
-        # Execute action
-        try:
-            result = self.action_handler.execute(
-                action, screenshot.width, screenshot.height
-            )
-        except Exception as e:
-            if self.agent_config.verbose:
-                traceback.print_exc()
-            result = self.action_handler.execute(
-                finish(message=str(e)), screenshot.width, screenshot.height
-            )
+        return action
+
+    def _parse_action_text(self, text: str) -> dict[str, Any]:
+        """Parse an answer as a single action, or as a plan in plan mode."""
+        if self.agent_config.action_plan:
+            return parse_action_plan(text, self.agent_config.plan_max_actions)
+        return parse_action(text)
+
+    def _complete_step(
+        self,
+        response: ModelResponse,
+        action: dict[str, Any],
+        result: ActionResult,
+        finished: bool,
+    ) -> StepResult:
+        """Record the assistant turn and build the step result."""
+        # A plan cut short only keeps the actions that actually ran
+        action_text = response.action
+        if action.get("_metadata") == "plan" and result.executed is not None:
+            action_text = "\n".join(action["calls"][: result.executed])
 
         # Add assistant response to context
         self._context.append(
             MessageBuilder.create_assistant_message(
-                f"<think>{response.thinking}</think><answer>{response.action}</answer>"
+                f"<think>{response.thinking}</think><answer>{action_text}</answer>"
             )
         )
-
-        # Check if finished
-        finished = action.get("_metadata") == "finish" or result.should_finish
+        self._log_action(action_text, result)
+        if self._macro is not None:
+            self._macro.record(action, action_text, response.thinking)
+        self._compact_context()
 
         if finished and self.agent_config.verbose:
             msgs = get_messages(self.agent_config.lang)
@@ -242,6 +473,145 @@ class PhoneAgent:
             message=result.message or action.get("message"),
         )
 
+    def _log_action(self, action_text: str, result: ActionResult) -> None:
+        """Record a one-line summary of the step for the collapsed history."""
+        action = " ".join(action_text.split())
+        if len(action) > self.ACTION_LOG_ENTRY_CHARS:
+            action = action[: self.ACTION_LOG_ENTRY_CHARS] + "..."
+        entry = f"{self._step_count}. [{self._current_app}] {action}"
+        if not result.success and result.message:
+            entry += f" -> failed: {result.message}"
+        self._action_log.append(entry)
+
+    def _compact_context(self) -> None:
+        """
+        Apply the context policy after a completed step.
+
+        Turns older than the newest `context_turns` are collapsed into the
+        action log carried by the first user message. Collapsing happens in
+        blocks of `context_collapse_every` turns so the message prefix stays
+        the same for several steps in a row. If `context_max_chars` is still
+        exceeded, further turns are collapsed and finally the oldest log
+        entries are dropped.
+        """
+        config = self.agent_config
+        turns = (len(self._context) - self._context_head) // 2
+
+        collapse = 0
+        if (
+            config.context_turns is not None
+            and turns >= config.context_turns + config.context_collapse_every
+        ):
+            collapse = turns - config.context_turns
+
+        if collapse == 0 and (
+            config.context_max_chars is None
+            or self._context_chars(self._context) <= config.context_max_chars
+        ):
+            return
+
+        while True:
+            context = self._collapsed_context(collapse, omit=0)
+            if (
+                config.context_max_chars is None
+                or collapse >= turns - 1
+                or self._context_chars(context) <= config.context_max_chars
+            ):
+                break
+            collapse += 1
+
+        omit = 0
+        collapsed_total = self._collapsed_steps + collapse
+        while (
+            config.context_max_chars is not None
+            and omit < collapsed_total
+            and self._context_chars(context) > config.context_max_chars
+        ):
+            omit += 1
+            context = self._collapsed_context(collapse, omit)
+
+        self._context = context
+        self._collapsed_steps = collapsed_total
+
+    def _collapsed_context(self, collapse: int, omit: int) -> list[dict[str, Any]]:
+        """Build the context with `collapse` more turns folded into the log."""
+        if collapse == 0 and omit == 0:
+            return self._context
+
+        head = self._context[: self._context_head]
+        recent = self._context[self._context_head + 2 * collapse :]
+        collapsed_total = self._collapsed_steps + collapse
+
+        log = self._action_log[omit:collapsed_total]
+        if omit:
+            log = [f"... ({omit} earlier steps omitted)"] + log
+        header = "** Action Log **\n" + "\n".join(log)
+        if self.agent_config.message_layout != "prefix":
+            header = f"{self._task}\n\n{header}"
+
+        first = recent[0]
+        text = MessageBuilder.get_text(first)
+        if collapse == 0:
+            # Already carries the previous log; keep only its screen info
+            text = text[text.rindex("** Screen Info **") :]
+        recent = [
+            {**first, "content": [{"type": "text", "text": f"{header}\n\n{text}"}]}
+        ] + recent[1:]
+        return head + recent
+
+    @property
+    def _context_head(self) -> int:
+        """Number of leading messages that are never collapsed."""
+        return 2 if self.agent_config.message_layout == "prefix" else 1
+
+    @staticmethod
+    def _context_chars(context: list[dict[str, Any]]) -> int:
+        """Total text length of a context, ignoring images."""
+        return sum(len(MessageBuilder.get_text(message)) for message in context)
+
+    def _capture_screen_state(self) -> tuple[Screenshot, str]:
+        """Capture the screenshot and current app, concurrently if enabled."""
+        device_id = self.agent_config.device_id
+        config = self.agent_config.screenshot_config
+
+        if self._executor is None:
+            screenshot = get_screenshot(device_id, config=config)
+            return screenshot, get_current_app(device_id, cached=True)
+
+        app_future = self._executor.submit(get_current_app, device_id, cached=True)
+        screenshot = get_screenshot(device_id, config=config)
+        return screenshot, app_future.result()
+
+    def _next_screen_state(self) -> tuple[Screenshot, str]:
+        """Take the prefetched screen state if there is one, else capture now."""
+        try:
+            future = self._frames.get_nowait()
+        except queue.Empty:
+            return self._capture_screen_state()
+
+        try:
+            return future.result()
+        except Exception:
+            if self.agent_config.verbose:
+                traceback.print_exc()
+            return self._capture_screen_state()
+
+    def _prefetch_screen_state(self) -> None:
+        """Start capturing the next screen state in the background."""
+        if self._prefetch_executor is None:
+            return
+        self._discard_prefetched_frame()
+        self._frames.put_nowait(
+            self._prefetch_executor.submit(self._capture_screen_state)
+        )
+
+    def _discard_prefetched_frame(self) -> None:
+        """Drop a queued frame that no step will consume."""
+        try:
+            self._frames.get_nowait().cancel()
+        except queue.Empty:
+            pass
+
     @property
     def context(self) -> list[dict[str, Any]]:
         """Get the current conversation context."""
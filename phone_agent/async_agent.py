@@ -0,0 +1,142 @@
+"""Asyncio PhoneAgent for driving many devices from one event loop."""
+
+import asyncio
+import traceback
+
+from phone_agent.actions import AsyncActionHandler
+from phone_agent.actions.handler import finish
+from phone_agent.agent import PhoneAgent, StepResult
+from phone_agent.model import AsyncModelClient
+
+
+class AsyncPhoneAgent(PhoneAgent):
+    """
+    Asyncio variant of PhoneAgent.
+
+    Model requests go through AsyncOpenAI. Screen captures and actions run
+    PhoneAgent's and ActionHandler's own code in worker threads, over the same
+    device transport (`persistent_shell` / `native_adb` sessions included),
+    so one event loop can run an agent per device concurrently. When driving
+    more devices than the loop's default executor has threads, give the loop
+    a larger one with `loop.set_default_executor`.
+
+    Args:
+        model_config: Configuration for the AI model.
+        agent_config: Configuration for the agent behavior.
+        confirmation_callback: Optional callback for sensitive action confirmation.
+            Runs in a worker thread.
+        takeover_callback: Optional callback for takeover requests.
+            Runs in a worker thread.
+
+    Example:
+        >>> import asyncio
+        >>> from phone_agent import AsyncPhoneAgent
+        >>> from phone_agent.agent import AgentConfig
+        >>>
+        >>> agents = [
+        ...     AsyncPhoneAgent(agent_config=AgentConfig(device_id=serial))
+        ...     for serial in ("emulator-5554", "emulator-5556")
+        ... ]
+        >>> asyncio.run(asyncio.gather(*(a.run("打开微信") for a in agents)))
+    """
+
+    model_client_class = AsyncModelClient
+    action_handler_class = AsyncActionHandler
+
+    async def run(
+        self,
+        task: str,
+        macro_key: str | None = None,
+        macro_params: dict[str, str] | None = None,
+    ) -> str:
+        """
+        Run the agent to complete a task.
+
+        Args:
+            task: Natural language description of the task.
+            macro_key: Task template for the macro cache (see PhoneAgent.run).
+            macro_params: Values substituted into replayed actions.
+
+        Returns:
+            Final message from the agent.
+        """
+        self.reset()
+        self._start_macro(macro_key, macro_params)
+
+        # First step with user prompt
+        result = await self._execute_step(task, is_first=True)
+
+        if result.finished:
+            self._close_macro(result)
+            return result.message or "Task completed"
+
+        # Continue until finished or max steps reached
+        while self._step_count < self.agent_config.max_steps:
+            result = await self._execute_step(is_first=False)
+
+            if result.finished:
+                self._close_macro(result)
+                return result.message or "Task completed"
+
+        self._close_macro(None)
+        return "Max steps reached"
+
+    async def step(self, task: str | None = None) -> StepResult:
+        """
+        Execute a single step of the agent.
+
+        Args:
+            task: Task description (only needed for first step).
+
+        Returns:
+            StepResult with step details.
+        """
+        is_first = len(self._context) == 0
+
+        if is_first and not task:
+            raise ValueError("Task is required for the first step")
+
+        return await self._execute_step(task, is_first)
+
+    async def _execute_step(
+        self, user_prompt: str | None = None, is_first: bool = False
+    ) -> StepResult:
+        """Execute a single step of the agent loop."""
+        self._step_count += 1
+
+        # Capture current screen state
+        screenshot, current_app = await asyncio.to_thread(self._next_screen_state)
+        self._append_screen_message(screenshot, current_app, user_prompt, is_first)
+
+        # Get model response, unless a recorded one matches this screen
+        response = await asyncio.to_thread(
+            self._replayed_response, screenshot, current_app
+        )
+        if response is None:
+            try:
+                response = await self.model_client.request(self._context)
+            except Exception as e:
+                return self._model_error_result(e)
+
+        action = self._parse_response_action(response)
+
+        # Execute action
+        try:
+            result = await self.action_handler.execute(
+                action, screenshot.width, screenshot.height
+            )
+        except Exception as e:
+            if self.agent_config.verbose:
+                traceback.print_exc()
+            result = await self.action_handler.execute(
+                finish(message=str(e)), screenshot.width, screenshot.height
+            )
+
+        # Check if finished
+        finished = action.get("_metadata") == "finish" or result.should_finish
+
+        # Queues the capture on the agent's prefetch thread without blocking
+        if not finished:
+            self._prefetch_screen_state()
+
+        return self._complete_step(response, action, result, finished)
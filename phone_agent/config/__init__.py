@@ -2,7 +2,9 @@
 
 from phone_agent.config.apps import APP_PACKAGES
 from phone_agent.config.i18n import get_message, get_messages
+from phone_agent.config.prompts_en import PLAN_PROMPT as PLAN_PROMPT_EN
 from phone_agent.config.prompts_en import SYSTEM_PROMPT as SYSTEM_PROMPT_EN
+from phone_agent.config.prompts_zh import PLAN_PROMPT as PLAN_PROMPT_ZH
 from phone_agent.config.prompts_zh import SYSTEM_PROMPT as SYSTEM_PROMPT_ZH
 
 
@@ -21,6 +23,21 @@ def get_system_prompt(lang: str = "cn") -> str:
     return SYSTEM_PROMPT_ZH
 
 
+def get_plan_prompt(lang: str = "cn", max_actions: int = 4) -> str:
+    """
+    Get the system prompt addition for action-plan mode.
+
+    Args:
+        lang: Language code, 'cn' for Chinese, 'en' for English.
+        max_actions: Maximum number of actions in one plan.
+
+    Returns:
+        Text to append to the system prompt.
+    """
+    prompt = PLAN_PROMPT_EN if lang == "en" else PLAN_PROMPT_ZH
+    return prompt.format(max_actions=max_actions)
+
+
 # Default to Chinese for backward compatibility
 SYSTEM_PROMPT = SYSTEM_PROMPT_ZH
 
@@ -30,6 +47,7 @@ __all__ = [
     "SYSTEM_PROMPT_ZH",
     "SYSTEM_PROMPT_EN",
     "get_system_prompt",
+    "get_plan_prompt",
     "get_messages",
     "get_message",
 ]
@@ -188,6 +188,12 @@ APP_PACKAGES: dict[str, str] = {
 }
 
 
+# Package name to app name; the first name listed for a package wins
+PACKAGE_APPS: dict[str, str] = {
+    package: name for name, package in reversed(APP_PACKAGES.items())
+}
+
+
 def get_package_name(app_name: str) -> str | None:
     """
     Get the package name for an app.
@@ -211,10 +217,7 @@ def get_app_name(package_name: str) -> str | None:
     Returns:
         The display name of the app, or None if not found.
     """
-    for name, package in APP_PACKAGES.items():
-        if package == package_name:
-            return name
-    return None
+    return PACKAGE_APPS.get(package_name)
 
 
 def list_supported_apps() -> list[str]:
@@ -19,6 +19,9 @@ MESSAGES_ZH = {
     "step": "步骤",
     "task": "任务",
     "result": "结果",
+    "prompt_tokens": "输入 tokens",
+    "cached_tokens": "缓存命中",
+    "macro_replay": "按录制轨迹回放，跳过模型调用",
 }
 
 # English messages
@@ -40,6 +43,9 @@ MESSAGES_EN = {
     "step": "Step",
     "task": "Task",
     "result": "Result",
+    "prompt_tokens": "Prompt tokens",
+    "cached_tokens": "cached",
+    "macro_replay": "Replaying recorded step, model call skipped",
 }
 
 
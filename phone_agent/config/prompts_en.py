@@ -77,3 +77,13 @@ REMEMBER:
 - Generate execution code strictly according to format requirements.
 """
 )
+
+# Appended to the system prompt in action-plan mode
+PLAN_PROMPT = """
+
+ACTION PLANS:
+When the next few steps can all be decided from the current screenshot without looking at a new screen (e.g. tap the search box, type the query, tap search), you may put several do(...) calls in <answer>, one per line, at most {max_actions}.
+- The screen settles after every call; if a different app unexpectedly comes to the foreground, the remaining calls are skipped and the next screenshot shows the current state.
+- Put actions with unpredictable results (Launch, Back, Home, Swipe to look for content) last in a plan.
+- finish(message="xxx") must be output on its own, never combined with other calls.
+"""
@@ -75,3 +75,13 @@ SYSTEM_PROMPT = (
 18. 在结束任务前请一定要仔细检查任务是否完整准确的完成，如果出现错选、漏选、多选的情况，请返回之前的步骤进行纠正。
 """
 )
+
+# 动作计划模式下追加到系统提示词末尾
+PLAN_PROMPT = """
+
+动作计划模式：
+当接下来的几步操作在当前截图上就能确定、且中间不需要观察新页面时（例如点击搜索框、输入文字、点击搜索），可以在 <answer> 中按顺序输出多条 do(...) 指令，每行一条，最多 {max_actions} 条。
+- 每条指令执行后会等待页面稳定；如果页面跳转到了意料之外的应用，剩余指令不会执行，你会在下一张截图中看到当前状态。
+- 结果无法预知的操作（如 Launch、Back、Home、Swipe 查找内容）应放在计划的最后一条。
+- finish(message="xxx") 必须单独输出，不能与其他指令组合。
+"""
@@ -0,0 +1,321 @@
+"""Run agents on every connected device from one process."""
+
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from typing import Callable
+
+from phone_agent.adb import ADBConnection
+from phone_agent.agent import AgentConfig, PhoneAgent
+from phone_agent.model import ModelConfig
+
+
+@dataclass
+class FleetTask:
+    """A task waiting in the fleet queue."""
+
+    task_id: int
+    task: str
+    device_id: str | None = None
+    future: Future = field(default_factory=Future)
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class DeviceStats:
+    """Throughput counters for one device worker."""
+
+    device_id: str
+    completed: int = 0
+    failed: int = 0
+    busy_time: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+    healthy: bool = True
+
+    @property
+    def tasks_per_hour(self) -> float:
+        """Finished tasks (completed or failed) per hour since the worker started."""
+        elapsed = time.monotonic() - self.started_at
+        if elapsed <= 0:
+            return 0.0
+        return (self.completed + self.failed) * 3600 / elapsed
+
+    @property
+    def utilization(self) -> float:
+        """Fraction of the worker's lifetime spent running tasks."""
+        elapsed = time.monotonic() - self.started_at
+        if elapsed <= 0:
+            return 0.0
+        return min(1.0, self.busy_time / elapsed)
+
+
+class FleetRunner:
+    """
+    Drives one PhoneAgent per healthy device from a shared task queue.
+
+    Devices are discovered with `ADBConnection.list_devices`; every device in
+    the "device" state gets a worker thread with its own agent. Tasks may name
+    a preferred device: a worker takes tasks pinned to its device first, then
+    unpinned ones, and finally tasks pinned to a device that has no worker.
+    A worker whose device disconnects requeues its task and stops; periodic
+    rediscovery starts workers for devices that (re)appear.
+
+    Args:
+        model_config: Configuration for the AI model, shared by all agents.
+        agent_config: Template agent configuration; `device_id` is replaced
+            per worker.
+        connection: ADB connection used for discovery and health checks.
+        rediscover_interval: Seconds between device rediscovery passes, or
+            None to only discover on start().
+        agent_factory: Optional callable building the agent for a device
+            config, e.g. to pass confirmation callbacks.
+
+    Example:
+        >>> fleet = FleetRunner(ModelConfig(base_url="http://localhost:8000/v1"))
+        >>> fleet.start()
+        >>> futures = [fleet.submit("打开微信") for _ in range(10)]
+        >>> futures.append(fleet.submit("打开设置", device_id="emulator-5554"))
+        >>> print([f.result() for f in futures])
+        >>> fleet.shutdown()
+        >>> print(fleet.stats())
+    """
+
+    def __init__(
+        self,
+        model_config: ModelConfig | None = None,
+        agent_config: AgentConfig | None = None,
+        connection: ADBConnection | None = None,
+        rediscover_interval: float | None = 30.0,
+        agent_factory: Callable[[AgentConfig], PhoneAgent] | None = None,
+    ):
+        self.model_config = model_config or ModelConfig()
+        self.agent_config = agent_config or AgentConfig()
+        self.connection = connection or ADBConnection()
+        self.rediscover_interval = rediscover_interval
+        self.agent_factory = agent_factory or (
+            lambda config: PhoneAgent(self.model_config, config)
+        )
+
+        self._pending: list[FleetTask] = []
+        self._cond = threading.Condition()
+        self._workers: dict[str, threading.Thread] = {}
+        self._stats: dict[str, DeviceStats] = {}
+        self._ids = itertools.count(1)
+        self._stopping = False
+        self._monitor: threading.Thread | None = None
+
+    def start(self) -> list[str]:
+        """
+        Discover devices and start their workers.
+
+        Returns:
+            Device IDs with a running worker.
+        """
+        with self._cond:
+            self._stopping = False
+        self.refresh()
+
+        if self.rediscover_interval and self._monitor is None:
+            self._monitor = threading.Thread(
+                target=self._monitor_loop, name="fleet-monitor", daemon=True
+            )
+            self._monitor.start()
+
+        return self.devices()
+
+    def refresh(self) -> list[str]:
+        """
+        Rediscover devices and start workers for new healthy ones.
+
+        Returns:
+            Device IDs whose workers were started by this call.
+        """
+        healthy = [
+            d.device_id for d in self.connection.list_devices() if d.status == "device"
+        ]
+
+        started = []
+        with self._cond:
+            if self._stopping:
+                return started
+            for device_id in healthy:
+                worker = self._workers.get(device_id)
+                if worker is not None and worker.is_alive():
+                    continue
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    args=(device_id,),
+                    name=f"fleet-{device_id}",
+                    daemon=True,
+                )
+                self._workers[device_id] = worker
+                self._stats[device_id] = DeviceStats(device_id)
+                worker.start()
+                started.append(device_id)
+            # Tasks pinned to a device without a worker are now claimable
+            self._cond.notify_all()
+        return started
+
+    def submit(self, task: str, device_id: str | None = None) -> Future:
+        """
+        Queue a task.
+
+        Args:
+            task: Natural language task description.
+            device_id: Optional preferred device. Honored while that device
+                has a worker; otherwise any device may run the task.
+
+        Returns:
+            Future resolving to the agent's final message.
+        """
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("FleetRunner is shut down")
+            item = FleetTask(next(self._ids), task, device_id)
+            self._pending.append(item)
+            self._cond.notify_all()
+        return item.future
+
+    def devices(self) -> list[str]:
+        """Device IDs with a running worker."""
+        with self._cond:
+            return [d for d, w in self._workers.items() if w.is_alive()]
+
+    def pending(self) -> int:
+        """Number of tasks waiting for a worker."""
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> dict[str, DeviceStats]:
+        """Per-device throughput counters (snapshots)."""
+        with self._cond:
+            return {d: replace(s) for d, s in self._stats.items()}
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """
+        Stop the workers. Each worker closes its agent as it exits.
+
+        Args:
+            wait: Block until queued tasks are drained and workers exit.
+            cancel_pending: Cancel tasks that have not started instead of
+                running them first.
+        """
+        with self._cond:
+            self._stopping = True
+            if cancel_pending:
+                for item in self._pending:
+                    item.future.cancel()
+                self._pending.clear()
+            self._cond.notify_all()
+            workers = list(self._workers.values())
+
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _take(self, device_id: str) -> FleetTask | None:
+        """Block until a task for this device is available (None to stop)."""
+        with self._cond:
+            while True:
+                item = self._select(device_id)
+                if item is not None:
+                    self._pending.remove(item)
+                    return item
+                if self._stopping:
+                    # Whatever is left is pinned to other live workers
+                    return None
+                self._cond.wait(timeout=1.0)
+
+    def _select(self, device_id: str) -> FleetTask | None:
+        """Pick the best pending task for a device (caller holds the lock)."""
+        fallback = None
+        orphan = None
+        for item in self._pending:
+            if item.device_id == device_id:
+                return item
+            if item.device_id is None:
+                fallback = fallback or item
+            elif orphan is None and not self._has_worker(item.device_id):
+                orphan = item
+        return fallback or orphan
+
+    def _has_worker(self, device_id: str) -> bool:
+        """Whether a healthy worker is running for a device."""
+        worker = self._workers.get(device_id)
+        return (
+            worker is not None and worker.is_alive() and self._stats[device_id].healthy
+        )
+
+    def _requeue(self, item: FleetTask) -> None:
+        """Put a task back at the front of the queue."""
+        with self._cond:
+            self._pending.insert(0, item)
+            self._cond.notify_all()
+
+    def _worker_loop(self, device_id: str) -> None:
+        """Run tasks on one device until shutdown or disconnection."""
+        stats = self._stats[device_id]
+        try:
+            agent = self.agent_factory(replace(self.agent_config, device_id=device_id))
+        except Exception:
+            traceback.print_exc()
+            self._mark_unhealthy(stats)
+            return
+
+        try:
+            self._run_tasks(device_id, agent, stats)
+        finally:
+            # Runs on shutdown and on disconnection alike
+            agent.close()
+
+    def _run_tasks(self, device_id: str, agent: PhoneAgent, stats: DeviceStats) -> None:
+        """Take and run tasks until shutdown or disconnection."""
+        while True:
+            item = self._take(device_id)
+            if item is None:
+                return
+
+            if not self.connection.is_connected(device_id):
+                self._mark_unhealthy(stats)
+                self._requeue(item)
+                return
+
+            if not item.future.set_running_or_notify_cancel():
+                continue
+
+            started = time.monotonic()
+            try:
+                result = agent.run(item.task)
+            except Exception as e:
+                with self._cond:
+                    stats.failed += 1
+                    stats.busy_time += time.monotonic() - started
+                item.future.set_exception(e)
+                continue
+
+            with self._cond:
+                stats.completed += 1
+                stats.busy_time += time.monotonic() - started
+            item.future.set_result(result)
+
+    def _mark_unhealthy(self, stats: DeviceStats) -> None:
+        """Flag a device as gone so its pinned tasks can run elsewhere."""
+        with self._cond:
+            stats.healthy = False
+            self._cond.notify_all()
+
+    def _monitor_loop(self) -> None:
+        """Periodically pick up newly connected devices."""
+        while True:
+            time.sleep(self.rediscover_interval)
+            with self._cond:
+                if self._stopping:
+                    self._monitor = None
+                    return
+            try:
+                self.refresh()
+            except Exception:
+                traceback.print_exc()
@@ -0,0 +1,343 @@
+"""Record and replay the action trajectories of repeated tasks."""
+
+import base64
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from typing import Any
+
+from PIL import Image
+
+from phone_agent.actions.parser import ActionParseError, parse_action_plan
+from phone_agent.adb import Screenshot
+from phone_agent.model.client import ModelResponse
+
+# Actions whose arguments depend only on the screen layout. Anything that
+# reads screen content into its arguments (Call_API, Note) or hands control
+# to a human is always asked of the model.
+REPLAYABLE_ACTIONS = frozenset(
+    {
+        "Launch",
+        "Tap",
+        "Type",
+        "Type_Name",
+        "Swipe",
+        "Back",
+        "Home",
+        "Double Tap",
+        "Long Press",
+        "Wait",
+    }
+)
+
+# Typed text is replayed only when it is made up entirely of parameters;
+# anything else the model typed was specific to the recorded run
+TEXT_ACTIONS = frozenset({"Type", "Type_Name"})
+_PLACEHOLDER_RE = re.compile(r"\{\{\w+\}\}")
+_CALL_KEYS = ("_metadata", "action")
+
+HASH_SIZE = 16
+DEFAULT_MACRO_DIR = "~/.cache/phone_agent/macros"
+
+
+def screen_hash(screenshot: Screenshot, hash_size: int = HASH_SIZE) -> int:
+    """
+    Compute the difference hash (dHash) of a screenshot.
+
+    The frame is reduced to a `hash_size + 1` square grayscale grid. Each bit
+    records whether a cell is brighter than its right neighbour, then whether
+    it is brighter than the cell below, so the hash follows the edges of the
+    screen layout (rows of a list as well as columns) and ignores small
+    content changes.
+
+    Args:
+        screenshot: The captured screen.
+        hash_size: Grid size; the hash has `2 * hash_size ** 2` bits.
+
+    Returns:
+        The hash as an integer.
+    """
+    image = Image.open(BytesIO(base64.b64decode(screenshot.base64_data)))
+    # Lets the JPEG decoder downscale while decoding
+    image.draft("L", (hash_size * 8, hash_size * 8))
+    side = hash_size + 1
+    pixels = list(
+        image.convert("L").resize((side, side), Image.Resampling.BILINEAR).getdata()
+    )
+
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            offset = row * side + col
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + side])
+    return bits
+
+
+def hash_distance(a: int, b: int) -> int:
+    """Number of differing bits between two screen hashes."""
+    return (a ^ b).bit_count()
+
+
+def is_replayable(action: dict[str, Any]) -> bool:
+    """Whether a parsed action (or every action of a plan) may be replayed."""
+    metadata = action.get("_metadata")
+    if metadata == "finish":
+        return True
+    if metadata == "plan":
+        return all(is_replayable(a) for a in action["actions"])
+    return metadata == "do" and action.get("action") in REPLAYABLE_ACTIONS
+
+
+def format_call(action: dict[str, Any]) -> str:
+    """Render a parsed `do(...)` / `finish(...)` action back into call text."""
+    arguments = {k: v for k, v in action.items() if k != "_metadata"}
+    if "action" in arguments:
+        arguments = {"action": arguments.pop("action"), **arguments}
+    parts = ", ".join(f"{k}={_format_value(v)}" for k, v in arguments.items())
+    return f"{action['_metadata']}({parts})"
+
+
+def _format_value(value: Any) -> str:
+    """Render a literal in the syntax the action parser reads."""
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_format_value(v) for v in value) + "]"
+    if isinstance(value, dict):
+        items = (f"{_format_value(k)}: {_format_value(v)}" for k, v in value.items())
+        return "{" + ", ".join(items) + "}"
+    return repr(value)
+
+
+def _action_calls(action: dict[str, Any]) -> list[dict[str, Any]]:
+    """The single actions of a parsed action or plan."""
+    if action.get("_metadata") == "plan":
+        return action["actions"]
+    return [action]
+
+
+@dataclass
+class MacroStep:
+    """One recorded step: the screen it started from and the model's answer."""
+
+    app: str
+    screen_hash: str
+    thinking: str
+    action: str
+    replayable: bool = True
+
+
+class MacroCache:
+    """
+    Directory of recorded trajectories, one JSON file per task key.
+
+    Args:
+        directory: Where trajectories are stored; created on first save.
+        max_distance: Largest screen hash distance (in bits) at which a
+            recorded step is still replayed.
+    """
+
+    def __init__(self, directory: str, max_distance: int = 40):
+        self.directory = os.path.expanduser(directory)
+        self.max_distance = max_distance
+
+    def load(self, key: str) -> list[MacroStep] | None:
+        """Return the trajectory recorded for a key, if any."""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("key") != key:
+            return None
+        try:
+            return [MacroStep(**step) for step in data["steps"]]
+        except (KeyError, TypeError):
+            return None
+
+    def save(self, key: str, steps: list[MacroStep]) -> None:
+        """Store the trajectory for a key, replacing any previous one."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"key": key, "steps": [asdict(step) for step in steps]},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        os.replace(tmp_path, path)
+
+    def discard(self, key: str) -> None:
+        """Forget the trajectory for a key."""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def session(self, key: str, params: dict[str, str] | None = None) -> "MacroSession":
+        """Start replaying/recording one run of the task `key`."""
+        return MacroSession(self, key, params)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}.json")
+
+
+class MacroSession:
+    """
+    Replay state and recorder for one run of a task.
+
+    Each step first calls `observe` with the current screen. While every
+    step so far matched the recording, it returns the recorded answer for
+    the agent to execute instead of querying the model. The first step whose
+    app or screen hash differs ends replay for the rest of the run. `record`
+    stores what was executed, and `close` saves the trajectory when the run
+    succeeded and differs from the stored one.
+
+    Parameter values (e.g. the contact and message of a reply task) are
+    stored as `{{name}}` placeholders, so one recording serves every run of
+    the same task template.
+    """
+
+    def __init__(
+        self, cache: MacroCache, key: str, params: dict[str, str] | None = None
+    ):
+        self.cache = cache
+        self.key = key
+        self.params = {name: value for name, value in (params or {}).items() if value}
+        self._replay = cache.load(key) or []
+        self._diverged = not self._replay
+        self._failed = False
+        self._steps: list[MacroStep] = []
+        self._pending: tuple[str, str] | None = None
+
+    @property
+    def replaying(self) -> bool:
+        """Whether the run still follows the recording."""
+        return not self._diverged
+
+    def observe(self, screenshot: Screenshot, app: str) -> ModelResponse | None:
+        """
+        Register the screen of a new step.
+
+        Returns:
+            The recorded response for this screen, or None to ask the model.
+        """
+        current = None if screenshot.is_sensitive else screen_hash(screenshot)
+        self._pending = (app, "" if current is None else f"{current:x}")
+        if self._diverged:
+            return None
+
+        index = len(self._steps)
+        step = self._replay[index] if index < len(self._replay) else None
+        if (
+            step is None
+            or current is None
+            or not step.replayable
+            or step.app != app
+            or hash_distance(current, int(step.screen_hash, 16))
+            > self.cache.max_distance
+        ):
+            self._diverged = True
+            return None
+
+        try:
+            calls = _action_calls(parse_action_plan(step.action))
+        except ActionParseError:
+            self.abandon()
+            return None
+        return ModelResponse(
+            thinking=self._fill_text(step.thinking),
+            action="\n".join(format_call(self._fill(call)) for call in calls),
+            raw_content="",
+        )
+
+    def abandon(self) -> None:
+        """Stop replaying after a bad recorded step; the run will not be saved."""
+        self._diverged = True
+        self._failed = True
+
+    def record(self, action: dict[str, Any], action_text: str, thinking: str) -> None:
+        """Record the answer executed for the last observed screen."""
+        if self._pending is None:
+            return
+        app, current = self._pending
+        self._pending = None
+
+        replayable = bool(current) and is_replayable(action)
+        try:
+            calls = [
+                {
+                    k: v if k in _CALL_KEYS else self._template(v)
+                    for k, v in call.items()
+                }
+                for call in _action_calls(parse_action_plan(action_text))
+            ]
+        except ActionParseError:
+            # Unparsable answers are kept for reference but never replayed
+            text, replayable = action_text, False
+        else:
+            text = "\n".join(format_call(call) for call in calls)
+            replayable = replayable and all(
+                _PLACEHOLDER_RE.sub("", call.get("text", "")) == ""
+                for call in calls
+                if call.get("action") in TEXT_ACTIONS
+            )
+
+        self._steps.append(
+            MacroStep(
+                app=app,
+                screen_hash=current,
+                thinking=self._template_text(thinking),
+                action=text,
+                replayable=replayable,
+            )
+        )
+
+    def close(self, success: bool) -> None:
+        """Save the run's trajectory if it succeeded and is new."""
+        if not success or self._failed or not self._steps:
+            return
+        if not self._diverged and len(self._steps) == len(self._replay):
+            return
+        try:
+            self.cache.save(self.key, self._steps)
+        except OSError as e:
+            print(f"Failed to save macro for {self.key!r}: {e}")
+
+    def _template(self, value: Any) -> Any:
+        """Replace parameter values inside the strings of a parsed value."""
+        if isinstance(value, str):
+            return self._template_text(value)
+        if isinstance(value, (list, tuple)):
+            return [self._template(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self._template(v) for k, v in value.items()}
+        return value
+
+    def _fill(self, value: Any) -> Any:
+        """Substitute parameter values into the strings of a parsed value."""
+        if isinstance(value, str):
+            return self._fill_text(value)
+        if isinstance(value, (list, tuple)):
+            return [self._fill(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self._fill(v) for k, v in value.items()}
+        return value
+
+    def _template_text(self, text: str) -> str:
+        # Longest values first so a value containing another is kept whole
+        for name, value in sorted(self.params.items(), key=lambda p: -len(p[1])):
+            text = text.replace(value, "{{" + name + "}}")
+        return text
+
+    def _fill_text(self, text: str) -> str:
+        for name, value in self.params.items():
+            text = text.replace("{{" + name + "}}", value)
+        return text
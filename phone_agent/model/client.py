@@ -1,10 +1,11 @@
 """Model client for AI inference using OpenAI-compatible API."""
 
 import json
+import time
 from dataclasses import dataclass, field
 from typing import Any
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 
 @dataclass
@@ -19,6 +20,14 @@ class ModelConfig:
     top_p: float = 0.85
     frequency_penalty: float = 0.2
     extra_body: dict[str, Any] = field(default_factory=dict)
+    stream: bool = False
+    # "regex" or "json": constrain output to the action grammar (vLLM guided
+    # decoding), see phone_agent.actions.grammar
+    guided_decoding: str | None = None
+
+    def __post_init__(self):
+        if self.guided_decoding not in (None, "regex", "json"):
+            raise ValueError(f"Unsupported guided decoding: {self.guided_decoding}")
 
 
 @dataclass
@@ -28,6 +37,10 @@ class ModelResponse:
     thinking: str
     action: str
     raw_content: str
+    time_to_first_token: float | None = None
+    total_time: float | None = None
+    prompt_tokens: int | None = None
+    cached_tokens: int | None = None
 
 
 class ModelClient:
@@ -38,14 +51,25 @@ class ModelClient:
         config: Model configuration.
     """
 
+    # Swapped for AsyncOpenAI by AsyncModelClient
+    openai_class = OpenAI
+
     def __init__(self, config: ModelConfig | None = None):
         self.config = config or ModelConfig()
-        self.client = OpenAI(base_url=self.config.base_url, api_key=self.config.api_key)
+        self.client = self.openai_class(
+            base_url=self.config.base_url, api_key=self.config.api_key
+        )
+        # Action calls a streamed response may carry before it is cut off
+        # (more than one in action-plan mode)
+        self.max_action_calls = 1
 
     def request(self, messages: list[dict[str, Any]]) -> ModelResponse:
         """
         Send a request to the model.
 
+        With `config.stream` enabled the completion is streamed and cut off
+        as soon as the action call is complete.
+
         Args:
             messages: List of message dictionaries in OpenAI format.
 
@@ -55,23 +79,96 @@ class ModelClient:
         Raises:
             ValueError: If the response cannot be parsed.
         """
+        if self.config.stream:
+            return self._request_stream(messages)
+
+        start = time.perf_counter()
         response = self.client.chat.completions.create(
-            messages=messages,
-            model=self.config.model_name,
-            max_tokens=self.config.max_tokens,
-            temperature=self.config.temperature,
-            top_p=self.config.top_p,
-            frequency_penalty=self.config.frequency_penalty,
-            extra_body=self.config.extra_body,
-            stream=False,
+            **self._completion_kwargs(messages, stream=False)
         )
 
         raw_content = response.choices[0].message.content
 
         # Parse thinking and action from response
         thinking, action = self._parse_response(raw_content)
+        prompt_tokens, cached_tokens = _usage_counts(response.usage)
+
+        return ModelResponse(
+            thinking=thinking,
+            action=action,
+            raw_content=raw_content,
+            total_time=time.perf_counter() - start,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+        )
+
+    def _request_stream(self, messages: list[dict[str, Any]]) -> ModelResponse:
+        """
+        Stream the completion and stop as soon as the action call is complete.
+
+        Tokens are scanned as they arrive for the same `do(action=` /
+        `finish(message=` markers `_parse_response` uses. Once the call's
+        closing parenthesis balances, the stream is closed, which cancels the
+        rest of the generation on the server.
+        """
+        start = time.perf_counter()
+        stream = self.client.chat.completions.create(
+            **self._completion_kwargs(messages, stream=True)
+        )
+
+        tracker = _ActionCallTracker(self.max_action_calls)
+        time_to_first_token = None
+        usage = None
+
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+                if tracker.feed(delta):
+                    break
+        finally:
+            stream.close()
+
+        raw_content = tracker.content
+        thinking, action = self._parse_response(raw_content)
+        prompt_tokens, cached_tokens = _usage_counts(usage)
+
+        return ModelResponse(
+            thinking=thinking,
+            action=action,
+            raw_content=raw_content,
+            time_to_first_token=time_to_first_token,
+            total_time=time.perf_counter() - start,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+        )
 
-        return ModelResponse(thinking=thinking, action=action, raw_content=raw_content)
+    def _completion_kwargs(
+        self, messages: list[dict[str, Any]], stream: bool
+    ) -> dict[str, Any]:
+        """Build the chat completion arguments from the config."""
+        kwargs = {
+            "messages": messages,
+            "model": self.config.model_name,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature,
+            "top_p": self.config.top_p,
+            "frequency_penalty": self.config.frequency_penalty,
+            "extra_body": self.config.extra_body,
+            "stream": stream,
+        }
+        if stream:
+            # Usage arrives in a final chunk, which is only seen when the
+            # stream is not cut off early
+            kwargs["stream_options"] = {"include_usage": True}
+        return kwargs
 
     def _parse_response(self, content: str) -> tuple[str, str]:
         """
@@ -85,24 +182,44 @@ class ModelClient:
         3. Fallback: If content contains '<answer>', use legacy parsing with XML tags.
         4. Otherwise, return empty thinking and full content as action.
 
+        With JSON guided decoding the content is a `{"thinking", "action"}`
+        object, and the action is rendered back into a `do(...)` call.
+
+        When several calls per turn are allowed (action-plan mode), the action
+        starts at the first call after the thinking, so `do(...)` calls before
+        a trailing `finish(...)` stay part of the plan.
+
         Args:
             content: Raw response content.
 
         Returns:
             Tuple of (thinking, action).
         """
+        if self.config.guided_decoding == "json":
+            try:
+                turn = json.loads(content)
+                return turn.get("thinking", ""), _format_action_call(turn["action"])
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass
+
+        if self.max_action_calls > 1:
+            start = _first_call(content)
+            if start is not None:
+                thinking = _strip_tags(content[:start])
+                return thinking, _strip_answer_tag(content[start:])
+
         # Rule 1: Check for finish(message=
         if "finish(message=" in content:
             parts = content.split("finish(message=", 1)
-            thinking = parts[0].strip()
-            action = "finish(message=" + parts[1]
+            thinking = _strip_tags(parts[0])
+            action = "finish(message=" + _strip_answer_tag(parts[1])
             return thinking, action
 
         # Rule 2: Check for do(action=
         if "do(action=" in content:
             parts = content.split("do(action=", 1)
-            thinking = parts[0].strip()
-            action = "do(action=" + parts[1]
+            thinking = _strip_tags(parts[0])
+            action = "do(action=" + _strip_answer_tag(parts[1])
             return thinking, action
 
         # Rule 3: Fallback to legacy XML tag parsing
@@ -116,6 +233,262 @@ class ModelClient:
         return "", content
 
 
+class AsyncModelClient(ModelClient):
+    """
+    Asyncio variant of ModelClient built on AsyncOpenAI.
+
+    Args:
+        config: Model configuration.
+    """
+
+    openai_class = AsyncOpenAI
+
+    async def request(self, messages: list[dict[str, Any]]) -> ModelResponse:
+        """
+        Send a request to the model.
+
+        Args:
+            messages: List of message dictionaries in OpenAI format.
+
+        Returns:
+            ModelResponse containing thinking and action.
+        """
+        if self.config.stream:
+            return await self._request_stream(messages)
+
+        start = time.perf_counter()
+        response = await self.client.chat.completions.create(
+            **self._completion_kwargs(messages, stream=False)
+        )
+
+        raw_content = response.choices[0].message.content
+        thinking, action = self._parse_response(raw_content)
+        prompt_tokens, cached_tokens = _usage_counts(response.usage)
+
+        return ModelResponse(
+            thinking=thinking,
+            action=action,
+            raw_content=raw_content,
+            total_time=time.perf_counter() - start,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+        )
+
+    async def _request_stream(self, messages: list[dict[str, Any]]) -> ModelResponse:
+        """Stream the completion and stop at the first complete action call."""
+        start = time.perf_counter()
+        stream = await self.client.chat.completions.create(
+            **self._completion_kwargs(messages, stream=True)
+        )
+
+        tracker = _ActionCallTracker(self.max_action_calls)
+        time_to_first_token = None
+        usage = None
+
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+                if tracker.feed(delta):
+                    break
+        finally:
+            await stream.close()
+
+        raw_content = tracker.content
+        thinking, action = self._parse_response(raw_content)
+        prompt_tokens, cached_tokens = _usage_counts(usage)
+
+        return ModelResponse(
+            thinking=thinking,
+            action=action,
+            raw_content=raw_content,
+            time_to_first_token=time_to_first_token,
+            total_time=time.perf_counter() - start,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+        )
+
+
+class _ActionCallTracker:
+    """
+    Incrementally detects a complete `do(...)` / `finish(...)` call in a stream.
+
+    Parentheses are counted outside string literals only, so text such as
+    `do(action="Type", text=":)")` is handled correctly. With `max_calls`
+    above 1 the stream runs on until that many calls, a finish, or the
+    closing `</answer>` tag are seen.
+    """
+
+    MARKERS = ("finish(message=", "do(action=")
+    # Text kept unscanned at the end of a chunk in case a marker or tag is cut
+    _OVERLAP = max(len(m) for m in (*MARKERS, "</answer>")) - 1
+
+    def __init__(self, max_calls: int = 1):
+        self.content = ""
+        self.max_calls = max_calls
+        self._calls = 0
+        self._call_start: int | None = None
+        self._pos = 0
+        # Where the next marker search starts; only moves forward
+        self._search_pos = 0
+        self._think_done = False
+        self._depth = 0
+        self._quote: str | None = None
+        self._escaped = False
+
+    def feed(self, text: str) -> bool:
+        """
+        Append streamed text.
+
+        Returns:
+            True once a complete action call has been seen. `content` is then
+            cut right after the call's closing parenthesis.
+        """
+        self.content += text
+        content = self.content
+        if not self._skip_think(content):
+            return False
+
+        while True:
+            if self._call_start is None:
+                found = [
+                    i
+                    for i in (content.find(m, self._search_pos) for m in self.MARKERS)
+                    if i >= 0
+                ]
+                if self._calls and self._answer_closed(content, found):
+                    self.content = content[: self._pos]
+                    return True
+                if not found:
+                    self._search_pos = max(
+                        self._search_pos, len(content) - self._OVERLAP
+                    )
+                    return False
+                self._call_start = min(found)
+                # Start scanning at the call's opening parenthesis
+                self._pos = content.index("(", self._call_start)
+
+            if not self._scan_call(content):
+                return False
+
+            self._calls += 1
+            if self._calls >= self.max_calls or content.startswith(
+                "finish", self._call_start
+            ):
+                self.content = content[: self._pos]
+                return True
+            self._call_start = None
+            self._search_pos = self._pos
+
+    def _skip_think(self, content: str) -> bool:
+        """Move the search past a leading `<think>` block; False while inside it."""
+        if self._think_done:
+            return True
+        stripped = content.lstrip()
+        if not stripped.startswith("<think>"):
+            if "<think>".startswith(stripped):
+                # The opening tag may still be arriving
+                return False
+            self._think_done = True
+            return True
+
+        end = content.find("</think>", self._search_pos)
+        if end < 0:
+            self._search_pos = max(self._search_pos, len(content) - len("</think>") + 1)
+            return False
+        self._search_pos = end + len("</think>")
+        self._think_done = True
+        return True
+
+    def _answer_closed(self, content: str, next_calls: list[int]) -> bool:
+        """Whether `</answer>` follows the last call before any further call."""
+        end = content.find("</answer>", self._search_pos)
+        return end >= 0 and all(end < i for i in next_calls)
+
+    def _scan_call(self, content: str) -> bool:
+        """Advance through the current call; True once its parenthesis closes."""
+        while self._pos < len(content):
+            char = content[self._pos]
+            self._pos += 1
+
+            if self._quote:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+            elif char in ("'", '"'):
+                self._quote = char
+            elif char in "([{":
+                self._depth += 1
+            elif char in ")]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    return True
+
+        return False
+
+
+def _first_call(content: str) -> int | None:
+    """Offset of the first action call after the thinking, if any."""
+    think_end = content.find("</think>")
+    search_from = think_end + len("</think>") if think_end >= 0 else 0
+    found = [
+        i
+        for i in (content.find(m, search_from) for m in _ActionCallTracker.MARKERS)
+        if i >= 0
+    ]
+    return min(found) if found else None
+
+
+def _strip_tags(thinking: str) -> str:
+    """Drop the <think>/<answer> tags around the thinking part."""
+    for tag in ("<think>", "</think>", "<answer>"):
+        thinking = thinking.replace(tag, "")
+    return thinking.strip()
+
+
+def _strip_answer_tag(action: str) -> str:
+    """Drop a closing </answer> tag after the action call."""
+    action = action.rstrip()
+    if action.endswith("</answer>"):
+        action = action[: -len("</answer>")].rstrip()
+    return action
+
+
+def _format_action_call(action: dict[str, Any]) -> str:
+    """Render a JSON action object as a `do(...)` / `finish(...)` call."""
+    arguments = dict(action)
+    name = arguments.pop("action")
+    if name == "finish":
+        message = json.dumps(arguments.get("message", ""), ensure_ascii=False)
+        return f"finish(message={message})"
+
+    parts = [f"action={json.dumps(name, ensure_ascii=False)}"]
+    parts.extend(
+        f"{key}={json.dumps(value, ensure_ascii=False)}"
+        for key, value in arguments.items()
+    )
+    return f"do({', '.join(parts)})"
+
+
+def _usage_counts(usage: Any) -> tuple[int | None, int | None]:
+    """Get (prompt_tokens, cached_tokens) from a usage object, if reported."""
+    if usage is None:
+        return None, None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details else None
+    return getattr(usage, "prompt_tokens", None), cached
+
+
 class MessageBuilder:
     """Helper class for building conversation messages."""
 
@@ -126,7 +499,10 @@ class MessageBuilder:
 
     @staticmethod
     def create_user_message(
-        text: str, image_base64: str | None = None
+        text: str,
+        image_base64: str | None = None,
+        image_mime: str = "image/png",
+        text_first: bool = False,
     ) -> dict[str, Any]:
         """
         Create a user message with optional image.
@@ -134,21 +510,23 @@ class MessageBuilder:
         Args:
             text: Text content.
             image_base64: Optional base64-encoded image.
+            image_mime: MIME type of the encoded image.
+            text_first: Put the text before the image instead of after it.
 
         Returns:
             Message dictionary.
         """
-        content = []
+        content = [{"type": "text", "text": text}]
 
         if image_base64:
-            content.append(
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{image_base64}"},
-                }
-            )
-
-        content.append({"type": "text", "text": text})
+            image = {
+                "type": "image_url",
+                "image_url": {"url": f"data:{image_mime};base64,{image_base64}"},
+            }
+            if text_first:
+                content.append(image)
+            else:
+                content.insert(0, image)
 
         return {"role": "user", "content": content}
 
@@ -166,14 +544,35 @@ class MessageBuilder:
             message: Message dictionary.
 
         Returns:
-            Message with images removed.
+            Copy of the message with images removed; the input is not modified.
         """
         if isinstance(message.get("content"), list):
-            message["content"] = [
-                item for item in message["content"] if item.get("type") == "text"
-            ]
+            return {
+                **message,
+                "content": [
+                    item for item in message["content"] if item.get("type") == "text"
+                ],
+            }
         return message
 
+    @staticmethod
+    def get_text(message: dict[str, Any]) -> str:
+        """
+        Get the text of a message, ignoring images.
+
+        Args:
+            message: Message dictionary.
+
+        Returns:
+            Concatenated text content.
+        """
+        content = message.get("content")
+        if isinstance(content, list):
+            return "".join(
+                item.get("text", "") for item in content if item.get("type") == "text"
+            )
+        return content or ""
+
     @staticmethod
     def build_screen_info(current_app: str, **extra_info) -> str:
         """
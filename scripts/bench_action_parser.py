@@ -0,0 +1,144 @@
+"""
+Benchmark the action parser against the legacy eval()-based parsing.
+
+The corpus is a file of logged model actions, one per line. Lines may be raw
+action strings or JSON objects with an "action" field. Without --corpus a
+small built-in sample is used.
+
+Usage:
+  python scripts/bench_action_parser.py
+  python scripts/bench_action_parser.py --corpus logs/actions.jsonl --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phone_agent.actions.handler import do, finish  # noqa: E402
+from phone_agent.actions.parser import ActionParseError, parse_action  # noqa: E402
+
+SAMPLE_CORPUS = [
+    'do(action="Launch", app="微信")',
+    'do(action="Tap", element=[512, 873])',
+    'do(action="Tap", element=[120, 64], message="确认支付")',
+    'do(action="Type", text="北京到上海的高铁票")',
+    'do(action="Type", text="他说：\\"明天见\\"")',
+    'do(action="Swipe", start=[500, 1500], end=[500, 400])',
+    'do(action="Long Press", element=[300, 700])',
+    'do(action="Double Tap", element=[640, 360])',
+    'do(action="Back")',
+    'do(action="Home")',
+    'do(action="Wait", duration="2 seconds")',
+    'do(action="Call_API", url="http://localhost:8000/enqueue", data={"user": "张三", "content": "查询报表"})',
+    'finish(message="已完成任务")',
+    'finish(message="页面显示"无结果"，任务结束")',
+]
+
+
+def legacy_parse_action(response):
+    """The eval()-based parser this benchmark compares against."""
+    try:
+        response = response.strip()
+        if response.startswith("do"):
+            action = eval(response, {"do": do, "finish": finish})
+        elif response.startswith("finish"):
+            action = {
+                "_metadata": "finish",
+                "message": response.replace("finish(message=", "")[1:-2],
+            }
+        else:
+            raise ValueError(f"Failed to parse action: {response}")
+        return action
+    except Exception as e:
+        raise ValueError(f"Failed to parse action: {e}")
+
+
+def load_corpus(path):
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line).get("action", "")
+            if line:
+                corpus.append(line)
+    return corpus
+
+
+def try_parse(parser, response):
+    try:
+        return parser(response)
+    except ValueError as e:
+        return e
+
+
+def bench(parser, corpus, repeat):
+    def run():
+        for response in corpus:
+            try_parse(parser, response)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(corpus) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark action parsing: parser vs eval()."
+    )
+    parser.add_argument(
+        "--corpus",
+        help="File with one logged action per line (raw or JSON with an 'action' field)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="Timing repetitions; the best run is reported (default 10)",
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=100,
+        help="Times the corpus is replicated per run (default 100)",
+    )
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else SAMPLE_CORPUS
+    if not corpus:
+        print("[!] Corpus is empty")
+        sys.exit(1)
+
+    mismatches = 0
+    errors = 0
+    for response in corpus:
+        new = try_parse(parse_action, response)
+        old = try_parse(legacy_parse_action, response)
+        if isinstance(new, ActionParseError):
+            errors += 1
+            print(f"[!] {new}")
+        if isinstance(new, Exception) != isinstance(old, Exception) or (
+            not isinstance(new, Exception) and new != old
+        ):
+            mismatches += 1
+            print(
+                f"[~] Differs from eval: {response!r}\n    parser: {new!r}\n    eval:   {old!r}"
+            )
+
+    timed = corpus * args.scale
+    new_us = bench(parse_action, timed, args.repeat)
+    old_us = bench(legacy_parse_action, timed, args.repeat)
+
+    print(f"[*] Corpus: {len(corpus)} actions ({args.corpus or 'built-in sample'})")
+    print(f"[*] Parse errors: {errors}, differences from eval: {mismatches}")
+    print(f"[*] eval():  {old_us:8.2f} us/action")
+    print(f"[*] parser:  {new_us:8.2f} us/action  ({old_us / new_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
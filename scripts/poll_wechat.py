@@ -1,15 +1,21 @@
 import time
 import subprocess
 import argparse
+import re
 import sys
 import os
 
-def run_auto_glm(target_user, webhook_url, model_args):
-    """
-    Runs the Auto-GLM agent with a specific instruction to check for messages.
-    """
-    # Construct the natural language prompt
-    prompt = (
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+WECHAT_PACKAGE = "com.tencent.mm"
+# 只把通知记录头和标题/正文行传回来，避免每次拉取完整的 dumpsys 输出
+NOTIFICATION_DUMP_CMD = (
+    "dumpsys notification --noredact | grep -E 'NotificationRecord\\(|android\\.(title|text)='"
+)
+
+def build_prompt(target_user, webhook_url):
+    return (
         f"打开微信。在消息列表中寻找用户'{target_user}'。"
         f"仔细观察该用户的行是否有红色未读消息圆点（红点或数字）。"
         f"1. 如果没有红点，直接 finish 结束任务，不要做其他操作。"
@@ -23,16 +29,30 @@ def run_auto_glm(target_user, webhook_url, model_args):
         f"7. 发送回复后，finish 结束任务。"
     )
 
+def run_auto_glm(target_users, webhook_url, model_args):
+    """
+    Runs the Auto-GLM agent with a specific instruction to check for messages.
+    Several users are handled one after another in the same agent session.
+    """
+    if len(target_users) == 1:
+        prompt = build_prompt(target_users[0], webhook_url)
+    else:
+        steps = "".join(
+            f"\n【第 {i} 个用户】{build_prompt(user, webhook_url).replace('finish 结束任务', '继续下一个用户')}"
+            for i, user in enumerate(target_users, 1)
+        )
+        prompt = f"依次检查以下 {len(target_users)} 个微信用户的新消息，每个用户处理完后返回消息列表。{steps}\n全部用户处理完成后 finish 结束任务。"
+
     cmd = [sys.executable, "main.py", prompt] + model_args
     
-    print(f"[*] Starting Auto-GLM check for user: {target_user}...")
+    print(f"[*] Starting Auto-GLM check for users: {', '.join(target_users)}...")
     try:
         # Run the agent as a subprocess
         result = subprocess.run(
             cmd, 
             capture_output=True, 
             text=True, 
-            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Run from root
+            cwd=PROJECT_ROOT # Run from root
         )
         
         if result.returncode == 0:
@@ -44,11 +64,85 @@ def run_auto_glm(target_user, webhook_url, model_args):
     except Exception as e:
         print(f"[!] Error running agent: {e}")
 
+def parse_notifications(output):
+    """
+    Parses filtered `dumpsys notification --noredact` output into
+    {notification key: {"title": ..., "text": ...}} for WeChat notifications.
+    """
+    records = {}
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("NotificationRecord("):
+            current = None
+            if f"pkg={WECHAT_PACKAGE} " in line:
+                match = re.search(r"key=([^\s:]+)", line)
+                if match:
+                    current = records.setdefault(match.group(1), {"title": "", "text": ""})
+        elif current is not None:
+            match = re.match(r"android\.(title|text)=\w+ \((.*)\)$", line)
+            if match:
+                current[match.group(1)] = match.group(2)
+    return records
+
+def read_wechat_notifications(device_id=None):
+    from phone_agent.adb.session import run_shell
+
+    return parse_notifications(run_shell(NOTIFICATION_DUMP_CMD, device_id, timeout=15))
+
+def changed_users(previous, current, users):
+    """Users whose WeChat notification appeared or changed since the last snapshot."""
+    changed = [r for key, r in current.items() if previous.get(key) != r]
+    return [u for u in users if any(u in r["title"] for r in changed)]
+
+def watch(args, model_args):
+    """
+    Cheap watcher: diffs WeChat notifications every --watch-interval seconds and
+    only starts the agent for contacts that have something new. A full check of
+    every contact still runs every --interval seconds, for chats whose
+    notifications are muted or were dismissed.
+    """
+    from phone_agent.adb import open_session
+
+    try:
+        open_session(args.device_id)
+    except Exception as e:
+        print(f"[!] Persistent shell unavailable, using adb per poll: {e}")
+
+    previous = {}
+    last_full = time.monotonic()
+    while True:
+        try:
+            current = read_wechat_notifications(args.device_id)
+        except Exception as e:
+            print(f"[!] Failed to read notifications: {e}")
+            time.sleep(args.watch_interval)
+            continue
+
+        users = changed_users(previous, current, args.user)
+        previous = current
+        if time.monotonic() - last_full >= args.interval:
+            users = args.user
+            last_full = time.monotonic()
+
+        if users:
+            run_auto_glm(users, args.webhook, model_args)
+            # 代理打开聊天后通知会被清除，重新取一次快照作为基线
+            try:
+                previous = read_wechat_notifications(args.device_id)
+            except Exception:
+                pass
+
+        time.sleep(args.watch_interval)
+
 def main():
-    parser = argparse.ArgumentParser(description="Poll WeChat for messages from a specific user.")
-    parser.add_argument("--user", required=True, help="The WeChat username/nickname to monitor.")
+    parser = argparse.ArgumentParser(description="Poll WeChat for messages from specific users.")
+    parser.add_argument("--user", required=True, action="append", help="The WeChat username/nickname to monitor (repeatable).")
     parser.add_argument("--webhook", required=True, help="The URL to send the message content to.")
-    parser.add_argument("--interval", type=int, default=900, help="Polling interval in seconds (default: 900s / 15min).")
+    parser.add_argument("--interval", type=int, default=900, help="Polling interval in seconds (default: 900s / 15min). In watch mode, the interval between full checks.")
+    parser.add_argument("--watch", action="store_true", help="Watch WeChat notifications via dumpsys and only run the agent when a monitored user has new messages.")
+    parser.add_argument("--watch-interval", type=float, default=5, help="Notification polling interval in watch mode (default: 5s).")
+    parser.add_argument("--device-id", help="ADB device id")
     
     # Pass-through arguments for the model connection
     parser.add_argument("--base-url", help="Model API Base URL")
@@ -65,8 +159,15 @@ def main():
         model_args.extend(["--apikey", args.apikey])
     if args.model:
         model_args.extend(["--model", args.model])
+    if args.device_id:
+        model_args.extend(["--device-id", args.device_id])
+
+    if args.watch:
+        print(f"[*] Starting Watcher. Targets: {', '.join(args.user)}, Watch interval: {args.watch_interval}s, Full check: {args.interval}s")
+        watch(args, model_args)
+        return
 
-    print(f"[*] Starting Poller. Target: {args.user}, Interval: {args.interval}s")
+    print(f"[*] Starting Poller. Targets: {', '.join(args.user)}, Interval: {args.interval}s")
     
     while True:
         run_auto_glm(args.user, args.webhook, model_args)
@@ -3,6 +3,24 @@ import argparse
 import sys
 import os
 
+# Replies always walk the same screens (search contact, open chat, type, send),
+# so they are recorded once and replayed with the contact/message substituted
+MACRO_KEY = "reply_msg"
+
+def build_prompt(user, message):
+    return (
+        f"打开微信，找到用户'{user}'，并发送以下消息：{message}。"
+        f"发送完成后结束任务。"
+    )
+
+def run(payload, agent):
+    """Entrypoint used by the task queue's notification worker (warm process)."""
+    return agent.run(
+        build_prompt(payload["user"], payload["message"]),
+        macro_key=MACRO_KEY,
+        macro_params={"user": payload["user"], "message": payload["message"]},
+    )
+
 def main():
     parser = argparse.ArgumentParser(description="Send a reply to a WeChat user via Auto-GLM.")
     parser.add_argument("--user", required=True, help="The WeChat username/nickname to reply to.")
@@ -16,10 +34,7 @@ def main():
     args = parser.parse_args()
 
     # Construct the natural language prompt
-    prompt = (
-        f"打开微信，找到用户'{args.user}'，并发送以下消息：{args.message}。"
-        f"发送完成后结束任务。"
-    )
+    prompt = build_prompt(args.user, args.message)
 
     # Collect model args
     model_args = []
@@ -30,7 +45,13 @@ def main():
     if args.model:
         model_args.extend(["--model", args.model])
 
-    cmd = [sys.executable, "main.py", prompt] + model_args
+    macro_args = [
+        "--macro-key", MACRO_KEY,
+        "--macro-param", f"user={args.user}",
+        "--macro-param", f"message={args.message}",
+    ]
+
+    cmd = [sys.executable, "main.py", prompt] + model_args + macro_args
     
     print(f"[*] Triggering Auto-GLM to reply to {args.user}...")
     try:
@@ -1,19 +1,26 @@
+import ast
+import atexit
+import base64
+import json
 import os
+import queue
 import socket
+import sqlite3
 import subprocess
 import sys
 import threading
 import time
 import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional, Tuple
-import json
-import sqlite3
-import pymysql
 
+import pymysql
 import uvicorn
 from fastapi import BackgroundTasks, FastAPI
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 # -----------------------------------------------------------------------------
@@ -40,71 +47,208 @@ TASK_KEY_PREFIX = os.getenv("AGLM_TASK_PREFIX", "aglm:task")
 WORKER_COUNT = int(os.getenv("AGLM_WORKER_COUNT", "2"))
 BRPOP_TIMEOUT = int(os.getenv("AGLM_BRPOP_TIMEOUT", "10"))
 DEFAULT_CMD_TIMEOUT = int(os.getenv("AGLM_CMD_TIMEOUT", "300"))
+DB_POOL_SIZE = int(os.getenv("AGLM_DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("AGLM_DB_POOL_TIMEOUT", "30"))
+DB_PING_INTERVAL = float(os.getenv("AGLM_DB_PING_INTERVAL", "30"))
+EVENT_FLUSH_INTERVAL = float(os.getenv("AGLM_EVENT_FLUSH_INTERVAL", "0.5"))
+EVENT_BATCH_SIZE = int(os.getenv("AGLM_EVENT_BATCH_SIZE", "200"))
+# 写库失败时缓冲区最多保留的事件数，超出后丢弃最旧的
+EVENT_BUFFER_LIMIT = int(os.getenv("AGLM_EVENT_BUFFER_LIMIT", "10000"))
+INPROCESS_WORKFLOWS = os.getenv("AGLM_INPROCESS_WORKFLOWS", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+WORKFLOW_PROCESSES = int(os.getenv("AGLM_WORKFLOW_PROCESSES", str(WORKER_COUNT)))
+# 每台在线设备一个 worker；关闭后退回 AGLM_WORKER_COUNT 个不绑定设备的 worker
+DEVICE_WORKERS = os.getenv("AGLM_DEVICE_WORKERS", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+DEVICE_SCAN_INTERVAL = float(os.getenv("AGLM_DEVICE_SCAN_INTERVAL", "15"))
+NOTIFY_QUEUE_KEY = os.getenv("AGLM_NOTIFY_QUEUE", "aglm:notify_queue")
+# 专门发送通知的设备，不再承接任务；未配置时设备模式下借用空闲的任务设备，
+# 非设备模式下由独立的常驻进程使用默认设备
+NOTIFY_DEVICE_ID = os.getenv("AGLM_NOTIFY_DEVICE_ID") or None
+NOTIFY_COALESCE_WINDOW = float(os.getenv("AGLM_NOTIFY_COALESCE_WINDOW", "3"))
+NOTIFY_TIMEOUT = int(os.getenv("AGLM_NOTIFY_TIMEOUT", "600"))
+
+# 直接以脚本方式启动时也能以包路径导入 task_queue_service / workflows
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from task_queue_service.workflow_runtime import (
+    DeviceSupervisor,
+    WarmWorker,
+    WarmWorkerPool,
+    agent_options_from_env,
+)
 
 # -----------------------------------------------------------------------------
 # Redis 轻量客户端 (仅覆盖必要命令)
 # -----------------------------------------------------------------------------
 
 
+class RedisReplyError(RuntimeError):
+    """Redis 返回的 -ERR 回复"""
+
+
+class _RedisConnection:
+    def __init__(self, host: str, port: int, db: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.fp = self.sock.makefile("rb", buffering=65536)
+        self.timeout = timeout
+        self.used = False
+        if db:
+            # 每个连接只 SELECT 一次
+            self.send([["SELECT", db]])
+            reply = self.read()
+            if isinstance(reply, RedisReplyError):
+                self.close()
+                raise reply
+
+    def send(self, commands: List[List[Any]], timeout: Optional[float] = None):
+        if timeout != self.timeout:
+            self.sock.settimeout(timeout)
+            self.timeout = timeout
+        self.sock.sendall(b"".join(_encode_command(parts) for parts in commands))
+
+    def read(self):
+        return _read_reply(self.fp)
+
+    def close(self):
+        try:
+            self.fp.close()
+        finally:
+            self.sock.close()
+
+
+def _encode_command(parts: List[Any]) -> bytes:
+    out = bytearray(b"*%d\r\n" % len(parts))
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        out += b"$%d\r\n" % len(data)
+        out += data
+        out += b"\r\n"
+    return bytes(out)
+
+
+def _read_reply(fp):
+    """解析一条 RESP 回复；错误回复以 RedisReplyError 对象返回而不是抛出，保证流不会错位"""
+    line = fp.readline()
+    if not line:
+        raise ConnectionError("Redis connection closed")
+
+    prefix, body = line[:1], line[1:].rstrip(b"\r\n")
+    if prefix == b"+":
+        return body.decode("utf-8")
+    if prefix == b"-":
+        return RedisReplyError(body.decode("utf-8"))
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length == -1:
+            return None
+        data = fp.read(length + 2)
+        if len(data) < length + 2:
+            raise ConnectionError("Redis connection closed")
+        return data[:length].decode("utf-8")
+    if prefix == b"*":
+        length = int(body)
+        if length == -1:
+            return None
+        return [_read_reply(fp) for _ in range(length)]
+
+    raise RuntimeError(f"Unsupported Redis prefix: {prefix}")
+
+
 class SimpleRedisClient:
+    """
+    轻量 Redis 客户端：每个线程复用一条长连接（连接时 SELECT 一次），
+    缓冲读取 RESP 回复，并支持 pipeline / MULTI 批量提交。
+    """
+
     def __init__(self, host: str, port: int, db: int = 0, default_timeout: int = 5):
         self.host = host
         self.port = port
         self.db = db
         self.default_timeout = default_timeout
-
-    def _read_response(self, fp):
-        prefix = fp.read(1)
-        if not prefix:
-            raise RuntimeError("Empty Redis response")
-
-        if prefix == b"+":
-            return fp.readline().rstrip(b"\r\n").decode("utf-8")
-        if prefix == b"-":
-            raise RuntimeError(fp.readline().rstrip(b"\r\n").decode("utf-8"))
-        if prefix == b":":
-            return int(fp.readline().rstrip(b"\r\n"))
-        if prefix == b"$":
-            length = int(fp.readline().rstrip(b"\r\n"))
-            if length == -1:
-                return None
-            data = fp.read(length)
-            fp.read(2)  # CRLF
-            return data.decode("utf-8")
-        if prefix == b"*":
-            length = int(fp.readline().rstrip(b"\r\n"))
-            if length == -1:
-                return None
-            return [self._read_response(fp) for _ in range(length)]
-
-        raise RuntimeError(f"Unsupported Redis prefix: {prefix}")
-
-    def _execute(self, command_parts: List[Any], timeout: Optional[int] = None):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout or self.default_timeout)
+        self._local = threading.local()
+        self._conns: List[_RedisConnection] = []
+        self._conns_lock = threading.Lock()
+
+    def _get_conn(self) -> _RedisConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _RedisConnection(self.host, self.port, self.db, self.default_timeout)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _drop_conn(self, conn: _RedisConnection):
+        self._local.conn = None
+        with self._conns_lock:
+            if conn in self._conns:
+                self._conns.remove(conn)
         try:
-            sock.connect((self.host, self.port))
-
-            req = f"*{len(command_parts)}\r\n"
-            for part in command_parts:
-                part_str = str(part)
-                req += f"${len(part_str.encode('utf-8'))}\r\n{part_str}\r\n"
-
-            sock.sendall(req.encode("utf-8"))
-            fp = sock.makefile("rb")
-            return self._read_response(fp)
-        finally:
-            sock.close()
+            conn.close()
+        except OSError:
+            pass
+
+    def _execute_many(
+        self, commands: List[List[Any]], timeout: Optional[float] = None
+    ) -> List[Any]:
+        timeout = timeout or self.default_timeout
+        for attempt in range(2):
+            conn = self._get_conn()
+            reused = conn.used
+            try:
+                conn.send(commands, timeout)
+                replies = [conn.read() for _ in commands]
+                conn.used = True
+                return replies
+            except socket.timeout:
+                # 超时后命令可能已执行，回复状态未知，丢弃连接且不重试
+                self._drop_conn(conn)
+                raise
+            except OSError:
+                # 复用的空闲连接可能已被服务端关闭，重连后重试一次
+                self._drop_conn(conn)
+                if attempt or not reused:
+                    raise
+        return []
+
+    def _execute(self, command_parts: List[Any], timeout: Optional[float] = None):
+        reply = self._execute_many([command_parts], timeout)[0]
+        if isinstance(reply, RedisReplyError):
+            raise reply
+        return reply
+
+    def pipeline(self, transaction: bool = False) -> "RedisPipeline":
+        return RedisPipeline(self, transaction)
+
+    def close(self):
+        with self._conns_lock:
+            conns = list(self._conns)
+            self._conns.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except OSError:
+                pass
 
     def select_db(self):
-        self._execute(["SELECT", self.db])
+        # 连接建立时已 SELECT，保留该方法以兼容旧调用
+        self._get_conn()
 
     def lpush(self, key: str, value: str) -> int:
-        self.select_db()
         return int(self._execute(["LPUSH", key, value]) or 0)
 
     def brpop(self, key: str, timeout: int) -> Optional[Tuple[str, str]]:
-        self.select_db()
         resp = self._execute(["BRPOP", key, timeout], timeout=timeout + 2)
         if resp is None:
             return None
@@ -113,24 +257,94 @@ class SimpleRedisClient:
         return None
 
     def hset(self, key: str, mapping: Dict[str, Any]) -> int:
-        self.select_db()
-        parts: List[Any] = ["HSET", key]
-        for field, value in mapping.items():
-            parts.extend([field, value])
-        return int(self._execute(parts) or 0)
+        return int(self._execute(_hset_parts(key, mapping)) or 0)
 
     def hget(self, key: str, field: str) -> Optional[str]:
-        self.select_db()
         resp = self._execute(["HGET", key, field])
         if resp is None:
             return None
         return str(resp)
 
+    def hmget(self, key: str, fields: List[str]) -> Dict[str, Optional[str]]:
+        resp = self._execute(["HMGET", key] + list(fields)) or []
+        return dict(zip(fields, resp))
+
     def llen(self, key: str) -> int:
-        self.select_db()
         return int(self._execute(["LLEN", key]) or 0)
 
 
+class RedisPipeline:
+    """
+    攒批命令一次写出、一次读回。transaction=True 时用 MULTI/EXEC 包裹，
+    execute() 返回各命令的回复列表。
+    """
+
+    def __init__(self, client: SimpleRedisClient, transaction: bool = False):
+        self.client = client
+        self.transaction = transaction
+        self.commands: List[List[Any]] = []
+
+    def __enter__(self) -> "RedisPipeline":
+        return self
+
+    def __exit__(self, *exc):
+        self.commands = []
+
+    def execute_command(self, *parts: Any) -> "RedisPipeline":
+        self.commands.append(list(parts))
+        return self
+
+    def lpush(self, key: str, value: str) -> "RedisPipeline":
+        return self.execute_command("LPUSH", key, value)
+
+    def hset(self, key: str, mapping: Dict[str, Any]) -> "RedisPipeline":
+        return self.execute_command(*_hset_parts(key, mapping))
+
+    def hget(self, key: str, field: str) -> "RedisPipeline":
+        return self.execute_command("HGET", key, field)
+
+    def hmget(self, key: str, fields: List[str]) -> "RedisPipeline":
+        return self.execute_command("HMGET", key, *fields)
+
+    def llen(self, key: str) -> "RedisPipeline":
+        return self.execute_command("LLEN", key)
+
+    def lrange(self, key: str, start: int, stop: int) -> "RedisPipeline":
+        return self.execute_command("LRANGE", key, start, stop)
+
+    def delete(self, key: str) -> "RedisPipeline":
+        return self.execute_command("DEL", key)
+
+    def execute(self) -> List[Any]:
+        commands, self.commands = self.commands, []
+        if not commands:
+            return []
+
+        if self.transaction:
+            replies = self.client._execute_many([["MULTI"]] + commands + [["EXEC"]])
+            # MULTI 与各命令的 +QUEUED 之后，EXEC 返回真正的结果数组
+            queued_errors = [r for r in replies[:-1] if isinstance(r, RedisReplyError)]
+            if queued_errors:
+                raise queued_errors[0]
+            results = replies[-1]
+            if results is None:
+                raise RedisReplyError("Transaction aborted")
+        else:
+            results = self.client._execute_many(commands)
+
+        for result in results:
+            if isinstance(result, RedisReplyError):
+                raise result
+        return results
+
+
+def _hset_parts(key: str, mapping: Dict[str, Any]) -> List[Any]:
+    parts: List[Any] = ["HSET", key]
+    for field, value in mapping.items():
+        parts.extend([field, value])
+    return parts
+
+
 # -----------------------------------------------------------------------------
 # 模型与任务结构
 # -----------------------------------------------------------------------------
@@ -154,9 +368,11 @@ class FinishRequest(BaseModel):
 @dataclass
 class WorkflowDefinition:
     name: str
-    build_command: Callable[[Dict[str, Any]], List[str]]
+    build_command: Optional[Callable[[Dict[str, Any]], List[str]]]
     timeout: int
     description: str
+    # "模块:函数"，在常驻工作进程中以 fn(payload, agent) 调用；为空则走子进程命令
+    entrypoint: Optional[str] = None
 
     def command(self, payload: Dict[str, Any]) -> List[str]:
         return self.build_command(payload)
@@ -168,10 +384,17 @@ class WorkflowDefinition:
 
 
 def _build_deployment_check_cmd(payload: Dict[str, Any]) -> List[str]:
-    base_url = os.getenv("PHONE_AGENT_BASE_URL", os.getenv("AGLM_MODEL_BASE_URL", "http://localhost:8000/v1"))
-    model = os.getenv("PHONE_AGENT_MODEL", os.getenv("AGLM_MODEL_NAME", "autoglm-phone-9b"))
+    base_url = os.getenv(
+        "PHONE_AGENT_BASE_URL",
+        os.getenv("AGLM_MODEL_BASE_URL", "http://localhost:8000/v1"),
+    )
+    model = os.getenv(
+        "PHONE_AGENT_MODEL", os.getenv("AGLM_MODEL_NAME", "autoglm-phone-9b")
+    )
     api_key = os.getenv("PHONE_AGENT_API_KEY", "EMPTY")
-    messages_file = os.getenv("AGLM_DEPLOY_MESSAGES_FILE", str(SCRIPTS_ROOT / "sample_messages.json"))
+    messages_file = os.getenv(
+        "AGLM_DEPLOY_MESSAGES_FILE", str(SCRIPTS_ROOT / "sample_messages.json")
+    )
 
     return [
         sys.executable,
@@ -222,7 +445,7 @@ def _build_travel_plan_cmd(payload: Dict[str, Any]) -> List[str]:
     base_url = os.getenv("PHONE_AGENT_BASE_URL") or os.getenv("AGLM_MODEL_BASE_URL")
     model = os.getenv("PHONE_AGENT_MODEL") or os.getenv("AGLM_MODEL_NAME")
     api_key = os.getenv("PHONE_AGENT_API_KEY")
-    device_id = os.getenv("PHONE_AGENT_DEVICE_ID")
+    device_id = payload.get("device_id") or os.getenv("PHONE_AGENT_DEVICE_ID")
 
     if base_url:
         cmd.extend(["--base-url", base_url])
@@ -254,6 +477,7 @@ WORKFLOW_REGISTRY: Dict[str, WorkflowDefinition] = {
         build_command=_build_travel_plan_cmd,
         timeout=1800,
         description="Multi-city travel plan workflow using phone agent apps",
+        entrypoint="workflows.travel_plan:run",
     ),
     "echo": WorkflowDefinition(
         name="echo",
@@ -267,7 +491,16 @@ INTENT_RULES = [
     {
         "intent": "deployment_check",
         "workflow": "deployment_check",
-        "keywords": ["部署", "上线", "发布", "deployment", "health", "健康", "接口", "模型"],
+        "keywords": [
+            "部署",
+            "上线",
+            "发布",
+            "deployment",
+            "health",
+            "健康",
+            "接口",
+            "模型",
+        ],
     },
     {
         "intent": "report_query",
@@ -277,7 +510,22 @@ INTENT_RULES = [
     {
         "intent": "travel_plan",
         "workflow": "travel_plan",
-        "keywords": ["旅游", "旅行", "行程", "攻略", "机票", "航班", "高铁", "火车", "12306", "携程", "美团", "住宿", "酒店", "比价"],
+        "keywords": [
+            "旅游",
+            "旅行",
+            "行程",
+            "攻略",
+            "机票",
+            "航班",
+            "高铁",
+            "火车",
+            "12306",
+            "携程",
+            "美团",
+            "住宿",
+            "酒店",
+            "比价",
+        ],
     },
 ]
 
@@ -293,7 +541,9 @@ def detect_intent(content: str) -> Dict[str, str]:
     return DEFAULT_INTENT.copy()
 
 
-def register_dynamic_script_workflow(task_type: str, script_args: Optional[List[str]] = None) -> Optional[str]:
+def register_dynamic_script_workflow(
+    task_type: str, script_args: Optional[List[str]] = None
+) -> Optional[str]:
     """
     If a script named scripts/{task_type}.py exists, register a workflow that calls it.
     Returns the workflow name if registered.
@@ -323,10 +573,22 @@ def register_dynamic_script_workflow(task_type: str, script_args: Optional[List[
         build_command=_build_dynamic_cmd,
         timeout=DEFAULT_CMD_TIMEOUT,
         description=f"Dynamic script workflow for {script_path.name}",
+        entrypoint=f"workflows.{task_type}:run" if _defines_run(script_path) else None,
     )
     return task_type
 
 
+def _defines_run(script_path: Path) -> bool:
+    """脚本顶层定义了 run(payload, agent) 时可直接在常驻进程中执行"""
+    try:
+        tree = ast.parse(script_path.read_text(encoding="utf-8"))
+    except (OSError, SyntaxError, UnicodeDecodeError):
+        return False
+    return any(
+        isinstance(node, ast.FunctionDef) and node.name == "run" for node in tree.body
+    )
+
+
 # -----------------------------------------------------------------------------
 # 执行与调度
 # -----------------------------------------------------------------------------
@@ -335,6 +597,13 @@ def register_dynamic_script_workflow(task_type: str, script_args: Optional[List[
 redis_client = SimpleRedisClient(REDIS_HOST, REDIS_PORT, REDIS_DB)
 app = FastAPI()
 worker_threads: List[threading.Thread] = []
+workflow_pool: Optional[WarmWorkerPool] = None
+workflow_pool_lock = threading.Lock()
+device_supervisor: Optional[DeviceSupervisor] = None
+device_threads: Dict[str, threading.Thread] = {}
+workers_lock = threading.Lock()
+notify_worker: Optional[WarmWorker] = None
+notifier_thread: Optional[threading.Thread] = None
 
 
 # -----------------------------------------------------------------------------
@@ -356,11 +625,220 @@ def get_db_conn():
         )
     # default sqlite
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=30, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    # WAL 让读不阻塞写；写入统一由 SQLiteWriter 单线程完成
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
 
+class DBPoolTimeout(RuntimeError):
+    """连接池已满，等待空闲连接超时"""
+
+
+class DBPool:
+    """
+    连接池：MySQL 复用固定上限的连接（空闲过久先 ping），
+    SQLite 每个线程一条只读连接（语句缓存随连接复用）。
+    """
+
+    def __init__(self, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[Tuple[Any, float]]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def connection(self):
+        if DB_DRIVER != "mysql":
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = get_db_conn()
+                self._local.conn = conn
+            yield conn
+            return
+
+        conn = self._acquire()
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # 连接可能已断开，不放回池中
+            self._discard(conn)
+            raise
+        except Exception:
+            self._idle.put((conn, time.monotonic()))
+            raise
+        else:
+            self._idle.put((conn, time.monotonic()))
+
+    def _acquire(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return get_db_conn()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    conn, last_used = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise DBPoolTimeout(
+                        f"No free database connection after {self.timeout:g}s "
+                        f"(pool size {self.size}, see AGLM_DB_POOL_SIZE)"
+                    ) from None
+
+            if time.monotonic() - last_used < DB_PING_INTERVAL:
+                return conn
+            try:
+                conn.ping(reconnect=True)
+                return conn
+            except Exception:
+                self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class SQLiteWriter:
+    """
+    SQLite 单写线程：所有写语句排队执行，一批任务合并为一个事务提交；
+    批内有语句失败时逐条重试，只让出错的那条失败。
+    """
+
+    def __init__(self, max_batch: int = 256):
+        self.max_batch = max_batch
+        self._jobs: "queue.Queue[Tuple[str, Any, bool, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, sql: str, params: Any = (), many: bool = False) -> Future:
+        self._ensure_thread()
+        future: Future = Future()
+        self._jobs.put((sql, params, many, future))
+        return future
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="sqlite-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        conn = get_db_conn()
+        while True:
+            batch = [self._jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                with conn:
+                    for sql, params, many, _ in batch:
+                        self._apply(conn, sql, params, many)
+            except Exception:
+                for sql, params, many, future in batch:
+                    try:
+                        with conn:
+                            self._apply(conn, sql, params, many)
+                    except Exception as exc:
+                        future.set_exception(exc)
+                    else:
+                        future.set_result(None)
+                continue
+
+            for *_, future in batch:
+                future.set_result(None)
+
+    @staticmethod
+    def _apply(conn, sql: str, params: Any, many: bool):
+        if many:
+            conn.executemany(sql, params)
+        else:
+            conn.execute(sql, params)
+
+
+class EventBuffer:
+    """task_events 写后缓冲：攒批后由后台线程批量插入，读取事件前先 flush"""
+
+    def __init__(
+        self,
+        interval: float = EVENT_FLUSH_INTERVAL,
+        batch_size: int = EVENT_BATCH_SIZE,
+        limit: int = EVENT_BUFFER_LIMIT,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.limit = limit
+        self._rows: List[Tuple[Any, ...]] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, row: Tuple[Any, ...]):
+        with self._cond:
+            self._rows.append(row)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="event-flusher", daemon=True
+                )
+                self._thread.start()
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self) -> bool:
+        """写入缓冲的事件；失败时放回缓冲区头部等待下次重试，返回是否成功"""
+        # 串行化 flush，保证事件按写入顺序落库
+        with self._flush_lock:
+            with self._cond:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return True
+            try:
+                db_executemany(EVENT_INSERT_SQL, rows)
+                return True
+            except Exception as exc:
+                with self._cond:
+                    self._rows[:0] = rows
+                    dropped = len(self._rows) - self.limit
+                    if dropped > 0:
+                        del self._rows[:dropped]
+                print(f"[!] Failed to flush {len(rows)} task events, will retry: {exc}")
+                if dropped > 0:
+                    print(
+                        f"[!] Event buffer full, dropped {dropped} oldest task events"
+                    )
+                return False
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._rows) < self.batch_size:
+                    self._cond.wait(timeout=self.interval)
+            if not self.flush():
+                # 数据库故障时退避，避免满批次下空转重试
+                time.sleep(self.interval)
+
+
 def init_db():
     conn = get_db_conn()
     try:
@@ -432,44 +910,162 @@ def init_db():
                 )
                 """
             )
+        for name, table, columns in TABLE_INDEXES:
+            _ensure_index(cur, name, table, columns)
         conn.commit()
     finally:
         conn.close()
 
 
+# 事件按 task_id 倒序翻页；任务列表按状态/用户/时间过滤，均以 (created_at, id) 做键集分页
+TABLE_INDEXES = [
+    ("idx_task_events_task_id_id", "task_events", "task_id, id"),
+    ("idx_tasks_status_created", "tasks", "status, created_at, id"),
+    ("idx_tasks_user_created", "tasks", "user, created_at, id"),
+    ("idx_tasks_created", "tasks", "created_at, id"),
+]
+
+
+def _ensure_index(cur, name: str, table: str, columns: str):
+    if DB_DRIVER != "mysql":
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        return
+    # MySQL 不支持 CREATE INDEX IF NOT EXISTS，先查 information_schema
+    cur.execute(
+        "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+        (table, name),
+    )
+    if not cur.fetchone():
+        cur.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+# -----------------------------------------------------------------------------
+# SQL 方言：统一用 ? 占位符书写，执行前按驱动转换
+# -----------------------------------------------------------------------------
+
+
+_DIALECT_CACHE: Dict[str, str] = {}
+
+
+def to_dialect(sql: str) -> str:
+    """把 ? 占位符转换为 PyMySQL 的 %s（并转义字面量 %），跳过引号内的内容；SQLite 原样返回"""
+    if DB_DRIVER != "mysql":
+        return sql
+
+    converted = _DIALECT_CACHE.get(sql)
+    if converted is not None:
+        return converted
+
+    out: List[str] = []
+    quote: Optional[str] = None
+    for ch in sql:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"', "`"):
+            quote = ch
+        elif ch == "?":
+            out.append("%s")
+            continue
+        out.append("%%" if ch == "%" else ch)
+
+    converted = "".join(out)
+    _DIALECT_CACHE[sql] = converted
+    return converted
+
+
+def upsert_sql(
+    table: str, columns: List[str], key: str, update_columns: List[str]
+) -> str:
+    """
+    生成按主键/唯一索引 upsert 的语句（? 占位符）：
+    MySQL 用 ON DUPLICATE KEY UPDATE，SQLite 用 ON CONFLICT ... DO UPDATE。
+    """
+    placeholders = ", ".join("?" for _ in columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if DB_DRIVER == "mysql":
+        updates = ", ".join(f"{col} = VALUES({col})" for col in update_columns)
+        return f"{sql} ON DUPLICATE KEY UPDATE {updates}"
+    updates = ", ".join(f"{col} = excluded.{col}" for col in update_columns)
+    return f"{sql} ON CONFLICT({key}) DO UPDATE SET {updates}"
+
+
+db_pool = DBPool()
+sqlite_writer = SQLiteWriter()
+
+
 def db_execute(sql: str, params: Tuple[Any, ...] = (), fetch: str = ""):
-    conn = get_db_conn()
-    try:
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        if not getattr(conn, "autocommit", False):
-            conn.commit()
-        if fetch == "one":
-            row = cur.fetchone()
-            if not row:
-                return None
-            return dict(row)
-        if fetch == "all":
-            rows = cur.fetchall()
-            return [dict(r) for r in rows]
+    sql = to_dialect(sql)
+    if DB_DRIVER != "mysql" and not fetch:
+        sqlite_writer.submit(sql, params).result()
         return None
-    finally:
-        conn.close()
 
+    with db_pool.connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            if fetch == "one":
+                row = cur.fetchone()
+                if not row:
+                    return None
+                return dict(row)
+            if fetch == "all":
+                rows = cur.fetchall()
+                return [dict(r) for r in rows]
+            return None
+        finally:
+            cur.close()
+
+
+def db_executemany(sql: str, rows: List[Tuple[Any, ...]]):
+    sql = to_dialect(sql)
+    if DB_DRIVER != "mysql":
+        sqlite_writer.submit(sql, rows, many=True).result()
+        return
 
-def persist_task_record(task_id: str, user: str, workflow: str, task_type: Optional[str], payload: Dict[str, Any]):
+    with db_pool.connection() as conn:
+        cur = conn.cursor()
+        try:
+            # PyMySQL 会把 INSERT ... VALUES 的 executemany 合并成多值插入
+            cur.executemany(sql, rows)
+        finally:
+            cur.close()
+
+
+# 已存在的任务保留原状态与创建时间，仅刷新元数据
+PERSIST_TASK_SQL = upsert_sql(
+    "tasks",
+    [
+        "id",
+        "user",
+        "type",
+        "status",
+        "redis_key",
+        "created_at",
+        "updated_at",
+        "payload_json",
+    ],
+    key="id",
+    update_columns=["user", "type", "redis_key", "updated_at", "payload_json"],
+)
+
+
+def persist_task_record(
+    task_id: str,
+    user: str,
+    workflow: str,
+    task_type: Optional[str],
+    payload: Dict[str, Any],
+):
     payload_json = json.dumps(payload, ensure_ascii=False)
     now = time.time()
     db_execute(
-        """
-        INSERT OR REPLACE INTO tasks (id, user, type, status, redis_key, created_at, updated_at, payload_json)
-        VALUES (?, ?, ?, COALESCE((SELECT status FROM tasks WHERE id = ?), 'pending'), ?, ?, ?, ?)
-        """,
+        PERSIST_TASK_SQL,
         (
             task_id,
             user,
             task_type or workflow,
-            task_id,
+            "pending",
             f"{TASK_KEY_PREFIX}:{task_id}",
             now,
             now,
@@ -478,7 +1074,13 @@ def persist_task_record(task_id: str, user: str, workflow: str, task_type: Optio
     )
 
 
-def update_task_record(task_id: str, status: str, result: str = "", resume_hint: str = "", checkpoint: str = ""):
+def update_task_record(
+    task_id: str,
+    status: str,
+    result: str = "",
+    resume_hint: str = "",
+    checkpoint: str = "",
+):
     now = time.time()
     db_execute(
         """
@@ -490,14 +1092,27 @@ def update_task_record(task_id: str, status: str, result: str = "", resume_hint:
     )
 
 
-def record_task_event(task_id: str, phase: str, status: str, input_text: str = "", output_text: str = "", checkpoint_token: str = ""):
+EVENT_INSERT_SQL = """
+    INSERT INTO task_events (task_id, phase, status, input, output, checkpoint_token, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+event_buffer = EventBuffer()
+atexit.register(event_buffer.flush)
+
+
+def record_task_event(
+    task_id: str,
+    phase: str,
+    status: str,
+    input_text: str = "",
+    output_text: str = "",
+    checkpoint_token: str = "",
+):
+    # 事件异步批量落库，不阻塞任务主流程
     now = time.time()
-    db_execute(
-        """
-        INSERT INTO task_events (task_id, phase, status, input, output, checkpoint_token, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (task_id, phase, status, input_text, output_text, checkpoint_token, now),
+    event_buffer.add(
+        (task_id, phase, status, input_text, output_text, checkpoint_token, now)
     )
 
 
@@ -505,10 +1120,92 @@ def load_task_record(task_id: str) -> Optional[Dict[str, Any]]:
     return db_execute("SELECT * FROM tasks WHERE id = ?", (task_id,), fetch="one")
 
 
+TASK_LIST_COLUMNS = "id, user, type, status, created_at, updated_at, resume_hint, last_checkpoint, retries, result_summary"
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def list_tasks(
+    status: Optional[str] = None,
+    user: Optional[str] = None,
+    since: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> Dict[str, Any]:
+    """按创建时间倒序列出任务，以 (created_at, id) 键集分页，避免 OFFSET 深翻页扫描"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    where: List[str] = []
+    params: List[Any] = []
+
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if user:
+        where.append("user = ?")
+        params.append(user)
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(since)
+    if cursor:
+        created_at, task_id = decode_cursor(cursor)
+        where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+        params.extend([created_at, created_at, task_id])
+
+    sql = f"SELECT {TASK_LIST_COLUMNS} FROM tasks"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = db_execute(sql, tuple(params), fetch="all") or []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return {"tasks": rows, "next_cursor": next_cursor}
+
+
+def list_task_events(
+    task_id: str, before: Optional[int] = None, limit: int = 20
+) -> Dict[str, Any]:
+    """按事件 id 倒序列出某任务的事件，before 为上一页最后一条事件 id"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    sql = "SELECT id, phase, status, input, output, checkpoint_token, created_at FROM task_events WHERE task_id = ?"
+    params: List[Any] = [task_id]
+    if before is not None:
+        sql += " AND id < ?"
+        params.append(before)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = db_execute(sql, tuple(params), fetch="all") or []
+    next_before = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_before = rows[-1]["id"]
+    return {"events": rows, "next_before": next_before}
+
+
 def summarize_task(task_id: str) -> Dict[str, Any]:
     meta = load_task_record(task_id) or {}
-    redis_status = redis_client.hget(task_status_key(task_id), "status")
-    result = redis_client.hget(task_status_key(task_id), "final_result")
+    cached = redis_client.hmget(task_status_key(task_id), ["status", "final_result"])
+    redis_status = cached["status"]
+    result = cached["final_result"]
     merged = {
         "task_id": task_id,
         "status": redis_status or meta.get("status"),
@@ -541,17 +1238,165 @@ def trigger_reply(user: str, message: str):
     if model:
         extra_args.extend(["--model", model])
 
-    cmd = [sys.executable, str(SCRIPTS_ROOT / "reply_msg.py"), "--user", user, "--message", message] + extra_args
+    cmd = [
+        sys.executable,
+        str(SCRIPTS_ROOT / "reply_msg.py"),
+        "--user",
+        user,
+        "--message",
+        message,
+    ] + extra_args
     try:
         subprocess.run(cmd, cwd=str(PROJECT_ROOT), check=False)
     except Exception as exc:
         print(f"[!] Failed to trigger reply for {user}: {exc}")
 
 
-def run_workflow(task_payload: Dict[str, Any]) -> Tuple[str, str]:
+# -----------------------------------------------------------------------------
+# 通知队列：任务完成只入队，由单独线程合并同一用户的消息后在通知设备上发送
+# -----------------------------------------------------------------------------
+
+
+def enqueue_notification(user: str, message: str):
+    item = {"user": user, "message": message, "created_at": time.time()}
+    redis_client.lpush(NOTIFY_QUEUE_KEY, json.dumps(item, ensure_ascii=False))
+
+
+def drain_notifications() -> List[Dict[str, Any]]:
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.lrange(NOTIFY_QUEUE_KEY, 0, -1).delete(NOTIFY_QUEUE_KEY)
+    items, _ = pipe.execute()
+    # LPUSH 入队，倒序即为先进先出
+    return [json.loads(raw) for raw in reversed(items or [])]
+
+
+def coalesce_notifications(items: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    grouped: Dict[str, List[str]] = {}
+    for item in items:
+        grouped.setdefault(item["user"], []).append(item["message"])
+
+    merged: List[Tuple[str, str]] = []
+    for user, messages in grouped.items():
+        if len(messages) == 1:
+            merged.append((user, messages[0]))
+        else:
+            merged.append(
+                (user, f"共 {len(messages)} 条任务通知：\n\n" + "\n\n".join(messages))
+            )
+    return merged
+
+
+def get_notify_worker() -> WarmWorker:
+    global notify_worker
+    with workers_lock:
+        if notify_worker is None:
+            notify_worker = WarmWorker(
+                agent_options_from_env(NOTIFY_DEVICE_ID), name="notify-worker"
+            )
+        return notify_worker
+
+
+def notify_on_device() -> bool:
+    # 设备模式下通知也经 supervisor 发送，与任务共用每台设备唯一的进程
+    return DEVICE_WORKERS and device_supervisor is not None
+
+
+def notify_device_ready() -> bool:
+    if NOTIFY_DEVICE_ID is not None:
+        return device_supervisor.has_device(NOTIFY_DEVICE_ID)
+    return bool(device_supervisor.devices())
+
+
+def send_notification(user: str, message: str):
+    if not INPROCESS_WORKFLOWS:
+        trigger_reply(user, message)
+        return
+
+    payload = {"user": user, "message": message}
+    if notify_on_device() and NOTIFY_DEVICE_ID is not None:
+        status, output = device_supervisor.run(
+            NOTIFY_DEVICE_ID, "scripts.reply_msg:run", payload, NOTIFY_TIMEOUT
+        )
+    elif notify_on_device():
+        # 等某台设备空闲再发送，不会与正在执行的任务同时操作同一台手机
+        status, output = device_supervisor.run_any(
+            "scripts.reply_msg:run", payload, NOTIFY_TIMEOUT
+        )
+    else:
+        status, output = get_notify_worker().run(
+            "scripts.reply_msg:run", payload, NOTIFY_TIMEOUT
+        )
+    if status != "success":
+        print(f"[!] Failed to notify {user}: {output}")
+
+
+def notifier_loop():
+    print("[*] Notifier started, waiting for messages...")
+    while True:
+        try:
+            # 通知设备未接入时消息留在队列中
+            if notify_on_device() and not notify_device_ready():
+                time.sleep(BRPOP_TIMEOUT)
+                continue
+
+            item = redis_client.brpop(NOTIFY_QUEUE_KEY, BRPOP_TIMEOUT)
+            if item is None:
+                continue
+
+            # 等一个合并窗口，把同一用户陆续完成的任务结果合成一条消息
+            time.sleep(NOTIFY_COALESCE_WINDOW)
+            items = [json.loads(item[1])] + drain_notifications()
+            for user, message in coalesce_notifications(items):
+                send_notification(user, message)
+        except Exception as exc:
+            print(f"[!] Notifier error: {exc}")
+            time.sleep(2)
+
+
+def ensure_notifier():
+    global notifier_thread
+    with workers_lock:
+        if notifier_thread is not None:
+            return
+        notifier_thread = threading.Thread(
+            target=notifier_loop, name="notifier", daemon=True
+        )
+        notifier_thread.start()
+
+
+def get_workflow_pool() -> WarmWorkerPool:
+    global workflow_pool
+    with workflow_pool_lock:
+        if workflow_pool is None:
+            workflow_pool = WarmWorkerPool(WORKFLOW_PROCESSES, agent_options_from_env())
+        return workflow_pool
+
+
+def run_workflow(
+    task_payload: Dict[str, Any], device_id: Optional[str] = None
+) -> Tuple[str, str]:
     workflow_name = task_payload.get("workflow", "echo")
     workflow = WORKFLOW_REGISTRY.get(workflow_name, WORKFLOW_REGISTRY["echo"])
 
+    if workflow.entrypoint and (INPROCESS_WORKFLOWS or workflow.build_command is None):
+        print(
+            f"[*] Running workflow {workflow.name} -> {workflow.entrypoint} on {device_id or 'default device'}"
+        )
+        if device_id and device_supervisor is not None:
+            status, output = device_supervisor.run(
+                device_id, workflow.entrypoint, task_payload, workflow.timeout
+            )
+        else:
+            status, output = get_workflow_pool().run(
+                workflow.entrypoint, task_payload, workflow.timeout
+            )
+        return status, (output.strip() or "无输出")[-2000:]
+
+    env = None
+    if device_id:
+        task_payload = dict(task_payload, device_id=device_id)
+        env = dict(os.environ, PHONE_AGENT_DEVICE_ID=device_id)
+
     try:
         cmd = workflow.command(task_payload)
     except Exception as exc:
@@ -565,6 +1410,7 @@ def run_workflow(task_payload: Dict[str, Any]) -> Tuple[str, str]:
             text=True,
             cwd=str(PROJECT_ROOT),
             timeout=workflow.timeout,
+            env=env,
         )
     except subprocess.TimeoutExpired:
         return "failed", "执行超时"
@@ -579,16 +1425,19 @@ def run_workflow(task_payload: Dict[str, Any]) -> Tuple[str, str]:
 
 def get_task_metadata(task_id: str) -> Dict[str, Optional[str]]:
     fields = ["user", "workflow", "intent", "task_type", "content"]
-    meta: Dict[str, Optional[str]] = {}
-    for field in fields:
-        try:
-            meta[field] = redis_client.hget(task_status_key(task_id), field)
-        except Exception:
-            meta[field] = None
-    return meta
-
-
-def finalize_task(task_payload: Dict[str, Any], status: str, result: str, notify: bool = True):
+    try:
+        return redis_client.hmget(task_status_key(task_id), fields)
+    except Exception:
+        return {field: None for field in fields}
+
+
+def finalize_task(
+    task_payload: Dict[str, Any],
+    status: str,
+    result: str,
+    notify: bool = True,
+    notifier: Optional[Callable[[str, str], None]] = None,
+):
     task_id = task_payload.get("id")
     if not task_id:
         return
@@ -616,12 +1465,15 @@ def finalize_task(task_payload: Dict[str, Any], status: str, result: str, notify
 
     if notify and user:
         reply_msg = f"任务 {task_id} ({workflow}) {status}。\n结果: {result_text}"
-        trigger_reply(user, reply_msg)
+        (notifier or enqueue_notification)(user, reply_msg)
 
 
-def worker_loop(worker_id: int):
+def worker_loop(worker_id: Any, device_id: Optional[str] = None):
     print(f"[*] Worker {worker_id} started, waiting for tasks...")
-    while True:
+    # 绑定设备的 worker 在设备断开后退出，设备重新接入时由 supervisor 再拉起
+    while device_id is None or (
+        device_supervisor is not None and device_supervisor.has_device(device_id)
+    ):
         try:
             item = redis_client.brpop(TASK_QUEUE_KEY, BRPOP_TIMEOUT)
             if item is None:
@@ -643,27 +1495,69 @@ def worker_loop(worker_id: int):
                 },
             )
 
-            record_task_event(task_id, phase="start", status="running", input_text=task_payload.get("content", ""))
+            record_task_event(
+                task_id,
+                phase="start",
+                status="running",
+                input_text=task_payload.get("content", ""),
+            )
             update_task_record(task_id, status="running")
 
-            status, result = run_workflow(task_payload)
+            status, result = run_workflow(task_payload, device_id)
 
             finalize_task(task_payload, status, result, notify=True)
         except Exception as exc:
             print(f"[!] Worker {worker_id} error: {exc}")
             time.sleep(2)
+    print(f"[*] Worker {worker_id} stopped: device disconnected")
+
+
+def start_device_worker(device_id: str):
+    if device_id == NOTIFY_DEVICE_ID:
+        return  # 通知专用设备不接任务
+    with workers_lock:
+        t = device_threads.get(device_id)
+        if t is not None and t.is_alive():
+            return
+        t = threading.Thread(
+            target=worker_loop,
+            args=(device_id, device_id),
+            name=f"worker-{device_id}",
+            daemon=True,
+        )
+        t.start()
+        device_threads[device_id] = t
 
 
 def ensure_workers():
-    if worker_threads:
+    global device_supervisor
+    ensure_notifier()
+    if DEVICE_WORKERS:
+        with workers_lock:
+            if device_supervisor is not None:
+                return
+            device_supervisor = DeviceSupervisor(
+                agent_options_from_env(),
+                on_device=start_device_worker,
+                interval=DEVICE_SCAN_INTERVAL,
+            )
+        devices = device_supervisor.start()
+        if not devices:
+            print("[!] No device attached yet; tasks stay queued until one connects")
         return
-    for idx in range(WORKER_COUNT):
-        t = threading.Thread(target=worker_loop, args=(idx,), daemon=True)
-        t.start()
-        worker_threads.append(t)
 
+    with workers_lock:
+        if worker_threads:
+            return
+        for idx in range(WORKER_COUNT):
+            t = threading.Thread(target=worker_loop, args=(idx,), daemon=True)
+            t.start()
+            worker_threads.append(t)
 
-def resolve_workflow(content: str, task_type: Optional[str], script_args: Optional[List[str]]) -> Dict[str, str]:
+
+def resolve_workflow(
+    content: str, task_type: Optional[str], script_args: Optional[List[str]]
+) -> Dict[str, str]:
     if task_type:
         # 先尝试匹配已有 workflow
         if task_type in WORKFLOW_REGISTRY:
@@ -677,7 +1571,9 @@ def resolve_workflow(content: str, task_type: Optional[str], script_args: Option
     return detect_intent(content)
 
 
-def enqueue_task(user: str, content: str, task_type: Optional[str], script_args: Optional[List[str]]) -> Dict[str, Any]:
+def enqueue_task(
+    user: str, content: str, task_type: Optional[str], script_args: Optional[List[str]]
+) -> Dict[str, Any]:
     intent = resolve_workflow(content, task_type, script_args)
     workflow_name = intent["workflow"]
     task_id = f"AGLM-{uuid.uuid4().hex[:8].upper()}"
@@ -693,8 +1589,9 @@ def enqueue_task(user: str, content: str, task_type: Optional[str], script_args:
         "script_args": script_args or [],
     }
 
-    queue_length = redis_client.lpush(TASK_QUEUE_KEY, json.dumps(payload, ensure_ascii=False))
-    redis_client.hset(
+    # 状态先于入队写入，且两条命令在同一事务里一次往返提交，worker 取到任务时状态已就绪
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(
         task_status_key(task_id),
         {
             "status": "pending",
@@ -706,6 +1603,8 @@ def enqueue_task(user: str, content: str, task_type: Optional[str], script_args:
             "task_type": task_type or "",
         },
     )
+    pipe.lpush(TASK_QUEUE_KEY, json.dumps(payload, ensure_ascii=False))
+    _, queue_length = pipe.execute()
 
     persist_task_record(task_id, user, workflow_name, task_type, payload)
     record_task_event(task_id, phase="enqueue", status="pending", input_text=content)
@@ -716,13 +1615,27 @@ def enqueue_task(user: str, content: str, task_type: Optional[str], script_args:
 @app.on_event("startup")
 def startup_event():
     init_db()
+    if INPROCESS_WORKFLOWS and not DEVICE_WORKERS:
+        # 预热常驻进程：导入 phone_agent 并构建 agent，首个任务不再承担冷启动
+        get_workflow_pool().start()
+    # 设备模式下 supervisor 为每台设备预热一个进程
     ensure_workers()
+    if INPROCESS_WORKFLOWS and not notify_on_device():
+        try:
+            get_notify_worker().start()
+        except Exception as exc:
+            print(f"[!] Failed to start notify worker: {exc}")
+
+
+# 以下接口中的 Redis / DB 调用都是阻塞的，统一放到线程池执行，避免卡住事件循环
 
 
 @app.post("/enqueue")
 async def enqueue(task: TaskRequest, background_tasks: BackgroundTasks):
     try:
-        result = enqueue_task(task.user, task.content, task.task_type, task.script_args)
+        result = await run_in_threadpool(
+            enqueue_task, task.user, task.content, task.task_type, task.script_args
+        )
     except Exception as exc:
         print(f"[!] Failed to enqueue task: {exc}")
         return {"status": "error", "msg": str(exc)}
@@ -743,8 +1656,7 @@ async def receive_task(task: TaskRequest, background_tasks: BackgroundTasks):
     return await enqueue(task, background_tasks)
 
 
-@app.post("/finish")
-async def finish(finish_req: FinishRequest):
+def _finish_task(finish_req: FinishRequest):
     meta = get_task_metadata(finish_req.task_id)
     payload = {
         "id": finish_req.task_id,
@@ -753,7 +1665,15 @@ async def finish(finish_req: FinishRequest):
         "task_type": meta.get("task_type"),
     }
 
-    finalize_task(payload, finish_req.status, finish_req.result or "", notify=finish_req.notify)
+    # 通知只入队，由 notifier 线程异步发送
+    finalize_task(
+        payload, finish_req.status, finish_req.result or "", notify=finish_req.notify
+    )
+
+
+@app.post("/finish")
+async def finish(finish_req: FinishRequest):
+    await run_in_threadpool(_finish_task, finish_req)
     return {"status": "ok", "task_id": finish_req.task_id}
 
 
@@ -762,16 +1682,59 @@ async def health_check():
     return {"status": "ok"}
 
 
-@app.get("/task/{task_id}")
-async def get_task(task_id: str):
+@app.on_event("shutdown")
+def shutdown_event():
+    event_buffer.flush()
+    if workflow_pool is not None:
+        workflow_pool.shutdown()
+    if device_supervisor is not None:
+        device_supervisor.shutdown()
+    if notify_worker is not None:
+        notify_worker.stop()
+
+
+def _get_task(task_id: str) -> Dict[str, Any]:
     summary = summarize_task(task_id)
-    events = db_execute(
-        "SELECT id, phase, status, input, output, checkpoint_token, created_at FROM task_events WHERE task_id = ? ORDER BY id DESC LIMIT 20",
-        (task_id,),
-        fetch="all",
-    ) or []
+    event_buffer.flush()
+    events = list_task_events(task_id)["events"]
     return {"task": summary, "events": events}
 
 
+@app.get("/task/{task_id}")
+async def get_task(task_id: str):
+    return await run_in_threadpool(_get_task, task_id)
+
+
+def _get_task_events(task_id: str, before: Optional[int], limit: int) -> Dict[str, Any]:
+    event_buffer.flush()
+    return list_task_events(task_id, before=before, limit=limit)
+
+
+@app.get("/task/{task_id}/events")
+async def get_task_events(task_id: str, before: Optional[int] = None, limit: int = 20):
+    return await run_in_threadpool(_get_task_events, task_id, before, limit)
+
+
+@app.get("/tasks")
+async def get_tasks(
+    status: Optional[str] = None,
+    user: Optional[str] = None,
+    since: Optional[float] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    try:
+        return await run_in_threadpool(
+            list_tasks,
+            status=status,
+            user=user,
+            since=since,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as exc:
+        return {"status": "error", "msg": str(exc)}
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,440 @@
+"""
+常驻工作进程：在独立进程中预先加载 phone_agent 并持有 PhoneAgent / ModelClient，
+工作流以 "模块:函数" 形式的入口在进程内执行，避免每个任务重新拉起 Python 解释器。
+
+入口函数签名：run(payload: Dict[str, Any], agent: PhoneAgent) -> str
+返回值作为任务结果；抛出异常视为任务失败。
+入口模块可定义 AGENT_OPTIONS（如 {"action_plan": True}）覆盖该工作流使用的 agent 配置。
+
+WarmWorkerPool 为不绑定设备的进程池；DeviceSupervisor 为每台在线设备维护一个进程。
+"""
+
+import importlib
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def attached_devices() -> List[str]:
+    """AGLM_DEVICE_IDS（逗号分隔）优先，否则取 adb devices 中状态为 device 的设备"""
+    configured = os.getenv("AGLM_DEVICE_IDS")
+    if configured:
+        return [d.strip() for d in configured.split(",") if d.strip()]
+
+    from phone_agent.adb import list_devices
+
+    return [d.device_id for d in list_devices() if d.status == "device"]
+
+
+def agent_options_from_env(device_id: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "base_url": os.getenv("PHONE_AGENT_BASE_URL")
+        or os.getenv("AGLM_MODEL_BASE_URL"),
+        "model": os.getenv("PHONE_AGENT_MODEL") or os.getenv("AGLM_MODEL_NAME"),
+        "api_key": os.getenv("PHONE_AGENT_API_KEY"),
+        "device_id": device_id or os.getenv("PHONE_AGENT_DEVICE_ID"),
+        "lang": os.getenv("PHONE_AGENT_LANG", "cn"),
+        "max_steps": int(os.getenv("PHONE_AGENT_MAX_STEPS", "100")),
+        "action_plan": os.getenv("PHONE_AGENT_ACTION_PLAN", "0").lower()
+        in ("1", "true", "yes"),
+        "macro_dir": os.getenv("PHONE_AGENT_MACRO_DIR"),
+    }
+
+
+# -----------------------------------------------------------------------------
+# 子进程侧
+# -----------------------------------------------------------------------------
+
+
+def _build_agent(options: Dict[str, Any]):
+    from phone_agent import PhoneAgent
+    from phone_agent.agent import AgentConfig
+    from phone_agent.model import ModelConfig
+
+    model_kwargs = {}
+    if options.get("base_url"):
+        model_kwargs["base_url"] = options["base_url"]
+    if options.get("model"):
+        model_kwargs["model_name"] = options["model"]
+    if options.get("api_key"):
+        model_kwargs["api_key"] = options["api_key"]
+
+    agent_kwargs = {}
+    if options.get("macro_dir"):
+        agent_kwargs["macro_dir"] = options["macro_dir"]
+
+    agent_config = AgentConfig(
+        max_steps=options.get("max_steps", 100),
+        device_id=options.get("device_id"),
+        lang=options.get("lang", "cn"),
+        verbose=False,
+        action_plan=options.get("action_plan", False),
+        **agent_kwargs,
+    )
+
+    def _decline(message: str) -> bool:
+        # 无人值守：敏感操作一律拒绝
+        print(f"[!] Sensitive action declined in worker: {message}")
+        return False
+
+    def _takeover(message: str) -> None:
+        print(f"[!] Manual takeover requested in worker: {message}")
+
+    return PhoneAgent(
+        model_config=ModelConfig(**model_kwargs),
+        agent_config=agent_config,
+        confirmation_callback=_decline,
+        takeover_callback=_takeover,
+    )
+
+
+def load_entrypoint(entrypoint: str) -> Callable[..., Any]:
+    module_name, _, attr = entrypoint.partition(":")
+    if not module_name or not attr:
+        raise ValueError(f"Invalid workflow entrypoint: {entrypoint}")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr)
+
+
+def _worker_main(conn, options: Dict[str, Any]):
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    os.chdir(PROJECT_ROOT)
+
+    # 按工作流的 AGENT_OPTIONS 分别持有 agent，默认配置的 agent 预先创建
+    agents: Dict[Tuple, Any] = {(): _build_agent(options)}
+    entrypoints: Dict[str, Callable[..., Any]] = {}
+    conn.send(("ready", os.getpid()))
+    try:
+        _serve(conn, options, agents, entrypoints)
+    finally:
+        # 退出前关闭各 agent 的截图线程池
+        for agent in agents.values():
+            agent.close()
+
+
+def _serve(
+    conn,
+    options: Dict[str, Any],
+    agents: Dict[Tuple, Any],
+    entrypoints: Dict[str, Callable[..., Any]],
+):
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+
+        entrypoint, payload = message
+        agent = None
+        try:
+            func = entrypoints.get(entrypoint)
+            if func is None:
+                func = entrypoints[entrypoint] = load_entrypoint(entrypoint)
+            overrides = getattr(sys.modules[func.__module__], "AGENT_OPTIONS", {})
+            key = tuple(sorted(overrides.items()))
+            agent = agents.get(key)
+            if agent is None:
+                agent = agents[key] = _build_agent({**options, **overrides})
+            result = func(payload, agent)
+            reply = ("success", "" if result is None else str(result))
+        except (Exception, SystemExit) as exc:
+            traceback.print_exc()
+            reply = ("failed", f"执行异常: {exc}")
+        if agent is not None:
+            try:
+                agent.reset()
+            except Exception:
+                # reset 失败时丢弃该 agent，下个任务重新创建；结果照常回传
+                traceback.print_exc()
+                agents.pop(key, None)
+                agent.close()
+        conn.send(reply)
+
+
+# -----------------------------------------------------------------------------
+# 父进程侧
+# -----------------------------------------------------------------------------
+
+
+class WarmWorker:
+    """单个常驻工作进程；超时或崩溃时杀掉并重新拉起"""
+
+    def __init__(self, options: Dict[str, Any], name: str = "workflow-worker"):
+        self.options = options
+        self.name = name
+        self.pid: Optional[int] = None
+        self._ctx = multiprocessing.get_context("spawn")
+        self._proc = None
+        self._conn = None
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    def start(self, timeout: float = 120):
+        self.launch()
+        self.wait_ready(timeout)
+
+    def launch(self):
+        if self.alive:
+            return
+        self.stop()  # 清理已退出的旧进程
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._proc = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.options),
+            name=self.name,
+            daemon=True,
+        )
+        self._proc.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    def wait_ready(self, timeout: float = 120):
+        # 等待子进程完成导入与 agent 初始化
+        if self.pid is not None:
+            return
+        if not self._conn.poll(timeout):
+            self.stop()
+            raise RuntimeError(f"{self.name} did not become ready in {timeout}s")
+        try:
+            _, self.pid = self._conn.recv()
+        except EOFError:
+            self.stop()
+            raise RuntimeError(f"{self.name} exited during startup")
+
+    def run(
+        self, entrypoint: str, payload: Dict[str, Any], timeout: float
+    ) -> Tuple[str, str]:
+        try:
+            self.start()
+            self._conn.send((entrypoint, payload))
+        except Exception as exc:
+            self.stop()
+            return "failed", f"工作进程不可用: {exc}"
+
+        if not self._conn.poll(timeout):
+            self.stop()
+            return "failed", "执行超时"
+        try:
+            return self._conn.recv()
+        except (EOFError, OSError):
+            self.stop()
+            return "failed", "工作进程异常退出"
+
+    def stop(self):
+        conn, self._conn = self._conn, None
+        proc, self._proc = self._proc, None
+        if conn is not None:
+            try:
+                conn.send(None)
+            except Exception:
+                pass
+            conn.close()
+        if proc is not None:
+            proc.join(timeout=1)
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+        self.pid = None
+
+
+class WarmWorkerPool:
+    """一组常驻工作进程，run() 借用空闲进程执行入口函数"""
+
+    def __init__(self, size: int, options: Optional[Dict[str, Any]] = None):
+        self.size = max(1, size)
+        self.options = options or agent_options_from_env()
+        self._workers: List[WarmWorker] = [
+            WarmWorker(self.options, name=f"workflow-worker-{idx}")
+            for idx in range(self.size)
+        ]
+        self._idle: "queue.Queue[WarmWorker]" = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def start(self, timeout: float = 120):
+        # 先全部拉起再统一等待，多个进程并行完成导入
+        for worker in self._workers:
+            worker.launch()
+        for worker in self._workers:
+            try:
+                worker.wait_ready(timeout)
+            except Exception as exc:
+                print(f"[!] Failed to start {worker.name}: {exc}")
+
+    def run(
+        self, entrypoint: str, payload: Dict[str, Any], timeout: float
+    ) -> Tuple[str, str]:
+        worker = self._idle.get()
+        try:
+            return worker.run(entrypoint, payload, timeout)
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.stop()
+
+
+class DeviceSupervisor:
+    """
+    每台在线设备一个常驻工作进程（已加载 phone_agent 并持有绑定该设备的 agent）。
+    后台线程定期重新发现设备：为新设备拉起进程，重启崩溃的进程，回收已断开设备的进程；
+    执行超时（卡死）的进程由 WarmWorker.run 杀掉并在下个任务前重启。
+    """
+
+    def __init__(
+        self,
+        options: Optional[Dict[str, Any]] = None,
+        on_device: Optional[Callable[[str], None]] = None,
+        interval: float = 15.0,
+        discover: Callable[[], List[str]] = attached_devices,
+    ):
+        self.options = options or agent_options_from_env()
+        self.on_device = on_device
+        self.interval = interval
+        self.discover = discover
+        self._workers: Dict[str, WarmWorker] = {}
+        self._busy: Dict[str, WarmWorker] = {}
+        self._lock = threading.Lock()
+        # 设备空闲或断开时唤醒等待 run / run_any 的线程
+        self._idle = threading.Condition(self._lock)
+        self._stopping = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+    def start(self) -> List[str]:
+        self._stopping.clear()
+        self.refresh()
+        if self._monitor is None:
+            self._monitor = threading.Thread(
+                target=self._monitor_loop, name="device-supervisor", daemon=True
+            )
+            self._monitor.start()
+        return self.devices()
+
+    def refresh(self) -> List[str]:
+        """同步设备列表，返回本次新接入的设备"""
+        try:
+            online = set(self.discover())
+        except Exception as exc:
+            print(f"[!] Device discovery failed: {exc}")
+            return []
+
+        added: List[WarmWorker] = []
+        with self._lock:
+            if self._stopping.is_set():
+                return []
+            for device_id in online:
+                worker = self._workers.get(device_id)
+                if worker is None:
+                    worker = WarmWorker(
+                        dict(self.options, device_id=device_id),
+                        name=f"workflow-{device_id}",
+                    )
+                    self._workers[device_id] = worker
+                    added.append(worker)
+                elif device_id not in self._busy and not worker.alive:
+                    print(f"[!] Worker for {device_id} exited, restarting")
+                else:
+                    continue
+                worker.launch()
+
+            gone = [d for d in self._workers if d not in online]
+            for device_id in gone:
+                worker = self._workers.pop(device_id)
+                print(f"[*] Device {device_id} disconnected")
+                if device_id not in self._busy:
+                    worker.stop()
+            if gone:
+                self._idle.notify_all()
+
+        for worker in added:
+            try:
+                worker.wait_ready()
+            except Exception as exc:
+                print(f"[!] Failed to start {worker.name}: {exc}")
+        new_devices = [w.options["device_id"] for w in added]
+        for device_id in new_devices:
+            if self.on_device is not None:
+                self.on_device(device_id)
+        return new_devices
+
+    def devices(self) -> List[str]:
+        with self._lock:
+            return list(self._workers)
+
+    def has_device(self, device_id: str) -> bool:
+        with self._lock:
+            return device_id in self._workers
+
+    def run(
+        self, device_id: str, entrypoint: str, payload: Dict[str, Any], timeout: float
+    ) -> Tuple[str, str]:
+        """在指定设备上执行；设备正忙时排队等待，同一设备同一时刻只跑一个任务"""
+        with self._idle:
+            while True:
+                worker = self._workers.get(device_id)
+                if worker is None or self._stopping.is_set():
+                    return "failed", f"设备不可用: {device_id}"
+                if device_id not in self._busy:
+                    break
+                self._idle.wait()
+            self._busy[device_id] = worker
+        return self._run_claimed(device_id, worker, entrypoint, payload, timeout)
+
+    def run_any(
+        self, entrypoint: str, payload: Dict[str, Any], timeout: float
+    ) -> Tuple[str, str]:
+        """在任一空闲设备上执行；都在忙时等待第一台空出来的设备"""
+        with self._idle:
+            while True:
+                if not self._workers or self._stopping.is_set():
+                    return "failed", "没有可用设备"
+                idle = [d for d in self._workers if d not in self._busy]
+                if idle:
+                    break
+                self._idle.wait()
+            device_id = idle[0]
+            worker = self._busy[device_id] = self._workers[device_id]
+        return self._run_claimed(device_id, worker, entrypoint, payload, timeout)
+
+    def _run_claimed(
+        self,
+        device_id: str,
+        worker: WarmWorker,
+        entrypoint: str,
+        payload: Dict[str, Any],
+        timeout: float,
+    ) -> Tuple[str, str]:
+        try:
+            return worker.run(entrypoint, payload, timeout)
+        finally:
+            with self._idle:
+                self._busy.pop(device_id, None)
+                if self._workers.get(device_id) is not worker:
+                    worker.stop()
+                self._idle.notify_all()
+
+    def shutdown(self):
+        self._stopping.set()
+        with self._idle:
+            workers = list(self._workers.values())
+            self._workers.clear()
+            self._idle.notify_all()
+        for worker in workers:
+            worker.stop()
+
+    def _monitor_loop(self):
+        while not self._stopping.wait(self.interval):
+            self.refresh()
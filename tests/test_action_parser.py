@@ -0,0 +1,199 @@
+"""Tests for the do(...)/finish(...) action parser."""
+
+import pytest
+
+from phone_agent.actions.parser import (
+    ActionParseError,
+    parse_action,
+    parse_action_plan,
+)
+
+
+class TestQuoting:
+    def test_double_quoted_arguments(self):
+        assert parse_action('do(action="Launch", app="微信")') == {
+            "action": "Launch",
+            "app": "微信",
+            "_metadata": "do",
+        }
+
+    def test_single_quoted_arguments(self):
+        assert parse_action("do(action='Type', text='北京')") == {
+            "action": "Type",
+            "text": "北京",
+            "_metadata": "do",
+        }
+
+    def test_other_quote_inside_string(self):
+        action = parse_action('do(action="Type", text="it\'s")')
+        assert action["text"] == "it's"
+
+    def test_closing_paren_inside_string(self):
+        action = parse_action('do(action="Type", text=":) (")')
+        assert action["text"] == ":) ("
+
+    def test_whitespace_around_tokens(self):
+        action = parse_action(' do ( action = "Tap" ,\n element = [ 1 , 2 ] , ) ')
+        assert action == {"action": "Tap", "element": [1, 2], "_metadata": "do"}
+
+
+class TestEscapes:
+    @pytest.mark.parametrize(
+        ("literal", "expected"),
+        [
+            (r'"a\"b"', 'a"b'),
+            (r'"a\\b"', "a\\b"),
+            (r'"line1\nline2"', "line1\nline2"),
+            (r'"tab\there"', "tab\there"),
+            (r'"\u4e2d\u6587"', "中文"),
+            (r'"\x41"', "A"),
+            (r"'\''", "'"),
+        ],
+    )
+    def test_known_escapes(self, literal, expected):
+        action = parse_action(f'do(action="Type", text={literal})')
+        assert action["text"] == expected
+
+    def test_unknown_escape_is_kept(self):
+        action = parse_action(r'do(action="Type", text="C:\path")')
+        assert action["text"] == "C:\\path"
+
+    def test_invalid_unicode_escape(self):
+        with pytest.raises(ActionParseError, match="Invalid escape"):
+            parse_action(r'do(action="Type", text="\u12")')
+
+
+class TestValues:
+    def test_nested_brackets(self):
+        action = parse_action(
+            'do(action="Call_API", url="http://x/api", '
+            'data={"users": ["张三", "李四"], "range": (1, [2, 3]), "ok": True})'
+        )
+        assert action["data"] == {
+            "users": ["张三", "李四"],
+            "range": (1, [2, 3]),
+            "ok": True,
+        }
+
+    def test_numbers_and_constants(self):
+        action = parse_action('do(action="X", a=-3, b=1.5, c=2e3, d=None, e=False)')
+        assert action["a"] == -3
+        assert action["b"] == 1.5
+        assert action["c"] == 2000.0
+        assert action["d"] is None
+        assert action["e"] is False
+
+    @pytest.mark.parametrize(
+        "response",
+        [
+            'do(action="Tap", element=[500, 873])',
+            'do(action="Swipe", start=[1, 2], end=[3, 4])',
+            'do(action="Type", text="hello")',
+        ],
+    )
+    def test_fast_path_matches_full_parser(self, response):
+        # A trailing comma skips the fast-path regexes
+        assert parse_action(response) == parse_action(response[:-1] + ",)")
+
+
+class TestMalformed:
+    @pytest.mark.parametrize(
+        ("response", "reason"),
+        [
+            ('do(action="Tap"', "Expected ',' or ')'"),
+            ('do(action="Type", text="abc)', "Unterminated string"),
+            ('eval(action="Tap")', "Unknown action function"),
+            ('do(action="Tap") extra', "Unexpected trailing text"),
+            ('do(action="Tap", action="Back")', "Duplicate argument"),
+            ('do("Tap")', "Expected a name"),
+            ("do(action=Tap)", "Expected a value"),
+            ('do(action="Tap", element=[1, 2)', "Expected ',' or ']'"),
+            ("", "Expected a name"),
+        ],
+    )
+    def test_errors(self, response, reason):
+        with pytest.raises(ActionParseError) as excinfo:
+            parse_action(response)
+        assert excinfo.value.reason.startswith(reason)
+        assert 0 <= excinfo.value.position <= len(response)
+
+    def test_error_is_a_value_error(self):
+        with pytest.raises(ValueError):
+            parse_action("__import__('os')")
+
+    def test_nothing_is_evaluated(self):
+        with pytest.raises(ActionParseError):
+            parse_action('do(action=__import__("os").system("true"))')
+
+
+class TestFinish:
+    def test_well_formed(self):
+        assert parse_action('finish(message="已完成")') == {
+            "message": "已完成",
+            "_metadata": "finish",
+        }
+
+    def test_unescaped_quotes_fall_back(self):
+        action = parse_action('finish(message="页面显示"无结果"，任务结束")')
+        assert action == {
+            "_metadata": "finish",
+            "message": '页面显示"无结果"，任务结束',
+        }
+
+    def test_fallback_keeps_newlines_and_spacing(self):
+        action = parse_action('finish( message = "第一行\n他说"好"" )')
+        assert action["message"] == '第一行\n他说"好"'
+
+    def test_fallback_single_quotes(self):
+        action = parse_action("finish(message='it's done')")
+        assert action["message"] == "it's done"
+
+    def test_fallback_requires_a_quoted_message(self):
+        with pytest.raises(ActionParseError):
+            parse_action("finish(message=done)")
+
+    def test_fallback_requires_closing_paren(self):
+        with pytest.raises(ActionParseError):
+            parse_action('finish(message="a"b"')
+
+
+class TestPlan:
+    def test_single_call_is_a_plain_action(self):
+        assert parse_action_plan('do(action="Back")') == {
+            "action": "Back",
+            "_metadata": "do",
+        }
+
+    def test_several_calls(self):
+        plan = parse_action_plan(
+            'do(action="Tap", element=[1, 2])\n'
+            'do(action="Type", text="a; b")\n'
+            'finish(message="ok")'
+        )
+        assert plan["_metadata"] == "plan"
+        assert [a["_metadata"] for a in plan["actions"]] == ["do", "do", "finish"]
+        assert plan["calls"] == [
+            'do(action="Tap", element=[1, 2])',
+            'do(action="Type", text="a; b")',
+            'finish(message="ok")',
+        ]
+
+    def test_semicolon_separator_and_limit(self):
+        plan = parse_action_plan(
+            'do(action="Back"); do(action="Home"); do(action="Back")', max_actions=2
+        )
+        assert plan["calls"] == ['do(action="Back")', 'do(action="Home")']
+
+    def test_limit_of_one_gives_a_plain_action(self):
+        action = parse_action_plan(
+            'do(action="Back")\ndo(action="Home")', max_actions=1
+        )
+        assert action == {"action": "Back", "_metadata": "do"}
+
+    def test_lenient_finish(self):
+        action = parse_action_plan('finish(message="他说"好"")')
+        assert action == {"_metadata": "finish", "message": '他说"好"'}
+
+    def test_malformed_plan(self):
+        with pytest.raises(ActionParseError):
+            parse_action_plan('do(action="Back")\ndo(action=')
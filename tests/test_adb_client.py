@@ -0,0 +1,261 @@
+"""Tests for AdbClient against a local fake ADB server."""
+
+import socket
+import socketserver
+import struct
+import threading
+
+import pytest
+
+from phone_agent.adb.client import AdbClient, AdbProtocolError
+
+DEVICES = {"emu-1": "device", "emu-2": "offline"}
+
+
+def _recv_exact(sock, size):
+    buf = b""
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise EOFError
+        buf += chunk
+    return buf
+
+
+def _okay_payload(payload: bytes) -> bytes:
+    return b"OKAY" + b"%04x" % len(payload) + payload
+
+
+def _fail(message: bytes) -> bytes:
+    return b"FAIL" + b"%04x" % len(message) + message
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """
+    Speaks the ADB smart-socket protocol for a few scripted services.
+
+    `requests` records every decoded request in order, `connections` counts
+    accepted client connections.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeAdbHandler)
+        self.requests: list[str] = []
+        self.connections = 0
+        self.commands: dict[str, bytes] = {}
+        self.files: dict[str, bytes] = {}
+        self.chunk_size = 4
+        self.bad_status = False
+        self.drop_sync_after_pull = False
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+class _FakeAdbHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server: FakeAdbServer = self.server
+        server.connections += 1
+        sock = self.request
+        serial = None
+        while True:
+            try:
+                request = _recv_exact(sock, int(_recv_exact(sock, 4), 16)).decode()
+            except EOFError:
+                return
+            server.requests.append(request)
+
+            if server.bad_status:
+                sock.sendall(b"WHAT")
+                return
+            if request == "host:version":
+                sock.sendall(_okay_payload(b"0029"))
+                return
+            if request == "host:devices-l":
+                lines = "".join(
+                    f"{s}\t{state} product:sdk model:Pixel_7 transport_id:{i}\n"
+                    for i, (s, state) in enumerate(DEVICES.items(), 1)
+                )
+                sock.sendall(_okay_payload(lines.encode()))
+                return
+            if request == "host:transport-any":
+                serial = next(iter(DEVICES))
+                sock.sendall(b"OKAY")
+                continue
+            if request.startswith("host:transport:"):
+                serial = request.split(":", 2)[2]
+                if DEVICES.get(serial) != "device":
+                    sock.sendall(_fail(f"device '{serial}' not found".encode()))
+                    return
+                sock.sendall(b"OKAY")
+                continue
+            if serial and request.startswith(("exec:", "shell:")):
+                command = request.split(":", 1)[1]
+                if command not in server.commands:
+                    sock.sendall(_fail(b"unknown command"))
+                    return
+                sock.sendall(b"OKAY" + server.commands[command])
+                return
+            if serial and request == "sync:":
+                sock.sendall(b"OKAY")
+                self._sync(sock)
+                return
+            sock.sendall(_fail(b"unknown host service"))
+            return
+
+    def _sync(self, sock):
+        server: FakeAdbServer = self.server
+        while True:
+            try:
+                frame_id, length = struct.unpack("<4sI", _recv_exact(sock, 8))
+                path = _recv_exact(sock, length).decode() if length else ""
+            except EOFError:
+                return
+            server.requests.append(f"{frame_id.decode()} {path}".strip())
+            if frame_id == b"QUIT":
+                return
+
+            data = server.files.get(path)
+            if data is None:
+                message = b"No such file or directory"
+                sock.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+                continue
+            for i in range(0, len(data), server.chunk_size):
+                chunk = data[i : i + server.chunk_size]
+                sock.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+            sock.sendall(b"DONE" + struct.pack("<I", 0))
+            if server.drop_sync_after_pull:
+                sock.shutdown(socket.SHUT_RDWR)
+                return
+
+
+@pytest.fixture
+def server():
+    fake = FakeAdbServer()
+    thread = threading.Thread(
+        target=fake.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield fake
+    fake.shutdown()
+    fake.server_close()
+
+
+@pytest.fixture
+def client(server):
+    adb = AdbClient(port=server.port, timeout=5)
+    yield adb
+    adb.close()
+
+
+class TestHostServices:
+    def test_host_request_reads_length_prefixed_payload(self, client, server):
+        assert client.host_request("host:version") == "0029"
+        assert server.requests == ["host:version"]
+
+    def test_devices(self, client):
+        assert client.devices() == [
+            (
+                "emu-1",
+                "device",
+                {"product": "sdk", "model": "Pixel_7", "transport_id": "1"},
+            ),
+            (
+                "emu-2",
+                "offline",
+                {"product": "sdk", "model": "Pixel_7", "transport_id": "2"},
+            ),
+        ]
+
+    def test_unknown_host_service_fails(self, client):
+        with pytest.raises(AdbProtocolError, match="unknown host service"):
+            client.host_request("host:bogus")
+
+    def test_unexpected_status(self, client, server):
+        server.bad_status = True
+        with pytest.raises(AdbProtocolError, match="unexpected status"):
+            client.host_request("host:version")
+
+
+class TestDeviceServices:
+    def test_exec_out_is_binary_safe(self, client, server):
+        frame = b"\x89PNG\r\n\x1a\n\x00\xff" * 1000
+        server.commands["screencap -p"] = frame
+        assert client.exec_out("emu-1", ["screencap", "-p"]) == frame
+        assert server.requests == ["host:transport:emu-1", "exec:screencap -p"]
+
+    def test_arguments_are_shell_quoted(self, client, server):
+        server.commands["input text 'a b'"] = b""
+        client.exec_out("emu-1", ["input", "text", "a b"])
+        assert server.requests[-1] == "exec:input text 'a b'"
+
+    def test_shell_normalizes_line_endings(self, client, server):
+        server.commands["getprop ro.product.model"] = b"Pixel 7\r\n"
+        assert client.shell("emu-1", "getprop ro.product.model") == "Pixel 7\n"
+        assert server.requests[-1] == "shell:getprop ro.product.model"
+
+    def test_transport_any_without_serial(self, client, server):
+        server.commands["echo hi"] = b"hi\n"
+        assert client.exec_out(None, "echo hi") == b"hi\n"
+        assert server.requests[0] == "host:transport-any"
+
+    def test_transport_failure(self, client):
+        with pytest.raises(AdbProtocolError, match="device 'emu-2' not found"):
+            client.exec_out("emu-2", ["true"])
+
+    def test_service_failure(self, client):
+        with pytest.raises(AdbProtocolError, match="exec:missing: unknown command"):
+            client.exec_out("emu-1", ["missing"])
+
+
+class TestSyncPull:
+    def test_recv_collects_data_frames(self, client, server):
+        server.files["/sdcard/a.png"] = b"0123456789"
+        assert client.pull("emu-1", "/sdcard/a.png") == b"0123456789"
+        assert server.requests == [
+            "host:transport:emu-1",
+            "sync:",
+            "RECV /sdcard/a.png",
+        ]
+
+    def test_empty_file(self, client, server):
+        server.files["/sdcard/empty"] = b""
+        assert client.pull("emu-1", "/sdcard/empty") == b""
+
+    def test_sync_connection_is_reused(self, client, server):
+        server.files["/a"] = b"first"
+        server.files["/b"] = b"second"
+        assert client.pull("emu-1", "/a") == b"first"
+        assert client.pull("emu-1", "/b") == b"second"
+        assert server.connections == 1
+
+    def test_fail_frame(self, client, server):
+        with pytest.raises(AdbProtocolError, match="No such file or directory"):
+            client.pull("emu-1", "/missing")
+
+        # The failed connection is not reused
+        server.files["/a"] = b"ok"
+        assert client.pull("emu-1", "/a") == b"ok"
+        assert server.connections == 2
+
+    def test_stale_connection_is_replaced(self, client, server):
+        server.files["/a"] = b"data"
+        server.drop_sync_after_pull = True
+        assert client.pull("emu-1", "/a") == b"data"
+        assert client.pull("emu-1", "/a") == b"data"
+        assert server.connections == 2
+
+    def test_close_sends_quit(self, client, server):
+        server.files["/a"] = b"data"
+        client.pull("emu-1", "/a")
+        client.close()
+        # The handler reads QUIT and exits; wait for it to be recorded
+        for _ in range(100):
+            if server.requests[-1] == "QUIT":
+                break
+            threading.Event().wait(0.01)
+        assert server.requests[-1] == "QUIT"
@@ -0,0 +1,84 @@
+"""Tests for cutting off streamed model output after the action call."""
+
+import pytest
+
+from phone_agent.model.client import _ActionCallTracker
+
+
+def _feed(tracker, text, chunk_size=3):
+    for i in range(0, len(text), chunk_size):
+        if tracker.feed(text[i : i + chunk_size]):
+            return True
+    return False
+
+
+class TestSingleCall:
+    @pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+    def test_stops_after_call(self, chunk_size):
+        tracker = _ActionCallTracker()
+        text = (
+            '<think>点击搜索</think><answer>do(action="Tap", element=[1, 2])</answer>'
+        )
+        assert _feed(tracker, text + "trailing", chunk_size)
+        assert tracker.content.endswith('do(action="Tap", element=[1, 2])')
+
+    def test_parenthesis_inside_string(self):
+        tracker = _ActionCallTracker()
+        assert not tracker.feed('<think></think>do(action="Type", text=":)')
+        assert tracker.feed('")')
+        assert tracker.content.endswith('text=":)")')
+
+    def test_without_think_block(self):
+        tracker = _ActionCallTracker()
+        assert _feed(tracker, 'finish(message="done")')
+
+    def test_incomplete_call(self):
+        tracker = _ActionCallTracker()
+        assert not _feed(tracker, '<think>x</think><answer>do(action="Tap", ')
+
+
+class TestThinkBlock:
+    def test_calls_inside_think_are_ignored(self):
+        tracker = _ActionCallTracker(max_calls=2)
+        text = (
+            '<think>先 do(action="Back") 再 do(action="Home")</think>'
+            '<answer>do(action="Tap", element=[1, 2])\n'
+        )
+        assert not _feed(tracker, text, chunk_size=1)
+        assert tracker.feed('do(action="Back")')
+        assert tracker.content.endswith(
+            'do(action="Tap", element=[1, 2])\ndo(action="Back")'
+        )
+
+    def test_markers_split_across_chunks(self):
+        tracker = _ActionCallTracker()
+        chunks = ["<thi", "nk>a</th", "ink><answer>do(act", 'ion="Back")']
+        assert [tracker.feed(c) for c in chunks] == [False, False, False, True]
+
+
+class TestPlan:
+    def test_stops_at_closing_answer_tag(self):
+        tracker = _ActionCallTracker(max_calls=4)
+        text = '<think></think><answer>do(action="Back")\ndo(action="Home")</ans'
+        assert not _feed(tracker, text)
+        assert tracker.feed("wer>")
+        assert tracker.content.endswith('do(action="Back")\ndo(action="Home")')
+
+    def test_finish_ends_the_plan(self):
+        tracker = _ActionCallTracker(max_calls=4)
+        assert _feed(tracker, 'do(action="Back")\nfinish(message="ok")')
+
+    def test_call_limit(self):
+        tracker = _ActionCallTracker(max_calls=2)
+        assert _feed(tracker, 'do(action="Back")\ndo(action="Home")\ndo(action=')
+        assert tracker.content == 'do(action="Back")\ndo(action="Home")'
+
+
+def test_long_thinking_is_scanned_once():
+    tracker = _ActionCallTracker()
+    tracker.feed("<think>")
+    for _ in range(2000):
+        assert not tracker.feed("思考" * 50)
+        # Only the unscanned tail is searched again
+        assert len(tracker.content) - tracker._search_pos < len("</think>")
+    assert tracker.feed('</think><answer>do(action="Back")')
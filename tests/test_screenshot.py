@@ -0,0 +1,53 @@
+"""Tests for decoding raw screencap frames."""
+
+import struct
+
+import pytest
+
+from phone_agent.adb.screenshot import _decode_raw_frame
+
+RED, GREEN, BLUE = (255, 0, 0), (0, 255, 0), (0, 0, 255)
+
+
+def _frame(pixel_format, pixels, color_space=True):
+    header = struct.pack("<III", len(pixels), 1, pixel_format)
+    if color_space:
+        header += struct.pack("<I", 1)
+    return header + b"".join(pixels)
+
+
+def _rgb565(r, g, b):
+    return struct.pack("<H", (r >> 3) << 11 | (g >> 2) << 5 | b >> 3)
+
+
+@pytest.mark.parametrize(
+    ("pixel_format", "encode"),
+    [
+        (1, lambda c: bytes(c) + b"\xff"),  # RGBA_8888
+        (2, lambda c: bytes(c) + b"\x00"),  # RGBX_8888
+        (3, bytes),  # RGB_888
+        (4, lambda c: _rgb565(*c)),  # RGB_565
+        (5, lambda c: bytes(reversed(c)) + b"\xff"),  # BGRA_8888
+    ],
+)
+def test_channel_order(pixel_format, encode):
+    img = _decode_raw_frame(
+        _frame(pixel_format, [encode(c) for c in (RED, GREEN, BLUE)])
+    )
+    assert [img.getpixel((x, 0))[:3] for x in range(3)] == [RED, GREEN, BLUE]
+
+
+def test_header_without_color_space():
+    img = _decode_raw_frame(_frame(3, [bytes(RED)], color_space=False))
+    assert img.size == (1, 1)
+    assert img.getpixel((0, 0)) == RED
+
+
+def test_unsupported_pixel_format():
+    with pytest.raises(ValueError, match="Unsupported pixel format"):
+        _decode_raw_frame(_frame(99, [b"\x00\x00\x00\x00"]))
+
+
+def test_size_mismatch():
+    with pytest.raises(ValueError, match="does not match header"):
+        _decode_raw_frame(_frame(1, [b"\x00\x00\x00"]))
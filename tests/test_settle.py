@@ -0,0 +1,59 @@
+"""Tests for screen-settle detection."""
+
+import pytest
+
+from phone_agent.adb import settle
+
+COUNTER = settle.FRAME_COUNTER_COMMAND
+HASH = "screencap | md5sum"
+DENIED = 'Result: Parcel(Error: 0xffffffb6 "Permission denied")'
+
+
+def _parcel(count):
+    return f"Result: Parcel({count:08x}    '....')"
+
+
+class FakeShell:
+    """Replays scripted output per command and records the calls."""
+
+    def __init__(self, outputs):
+        self.outputs = {cmd: list(out) for cmd, out in outputs.items()}
+        self.calls = []
+
+    def __call__(self, command, device_id=None, timeout=None):
+        self.calls.append(command)
+        return self.outputs[command].pop(0)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_support_cache(monkeypatch):
+    monkeypatch.setattr(settle, "_frame_counter_support", {})
+    monkeypatch.setattr(settle.time, "sleep", lambda _: None)
+
+
+def test_counter_settles_without_capturing(monkeypatch):
+    shell = FakeShell({COUNTER: [_parcel(7), _parcel(9), _parcel(9)]})
+    monkeypatch.setattr(settle, "run_shell", shell)
+    assert settle.wait_for_settle("emu") is True
+    assert shell.calls == [COUNTER] * 3
+
+
+def test_falls_back_to_hash_once_counter_is_unavailable(monkeypatch):
+    digest = "d41d8cd98f00b204e9800998ecf8427e  -"
+    shell = FakeShell({COUNTER: [DENIED], HASH: [digest, digest]})
+    monkeypatch.setattr(settle, "run_shell", shell)
+    assert settle.wait_for_settle("emu") is True
+    # The counter is probed once per device
+    assert shell.calls == [COUNTER, HASH, HASH]
+
+
+def test_unobservable_frame_uses_fixed_delay(monkeypatch):
+    shell = FakeShell({COUNTER: [DENIED], HASH: ["md5sum: not found"]})
+    monkeypatch.setattr(settle, "run_shell", shell)
+    assert settle.wait_for_settle("emu") is False
+
+
+def test_counter_signature(monkeypatch):
+    shell = FakeShell({COUNTER: [_parcel(255)]})
+    monkeypatch.setattr(settle, "run_shell", shell)
+    assert settle.get_frame_signature("emu") == "flips:255"
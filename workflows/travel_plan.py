@@ -7,6 +7,8 @@ Usage examples:
   python workflows/travel_plan.py --to 三亚 --from 北京 --from 上海 --depart-date 2025-05-01 --return-date 2025-05-05
   python workflows/travel_plan.py --to 成都 --note "2大1小 预算有限 想吃美食" --from 深圳
   python workflows/travel_plan.py --base-url http://localhost:8000/v1 --model autoglm-phone-9b --apikey sk-xxx --to 厦门 --from 广州
+
+In the task queue service the workflow runs in a warm worker process through run(payload, agent).
 """
 
 import argparse
@@ -14,11 +16,15 @@ import os
 import subprocess
 import sys
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
+# 比价流程以填写表单为主（点输入框、输入、搜索），按计划批量执行可省去近半模型调用；
+# 常驻进程据此为本工作流单独启用计划模式，命令行方式见 build_cmd 中的 --action-plan
+AGENT_OPTIONS: Dict[str, Any] = {"action_plan": True}
+
 
 def build_prompt(args: argparse.Namespace) -> str:
     departures = ", ".join(args.from_city) if args.from_city else "未指定（请在应用内选择最近可行出发地）"
@@ -80,10 +86,12 @@ def build_cmd(args: argparse.Namespace) -> List[str]:
         cmd.extend(["--device-id", args.device_id])
     if args.lang:
         cmd.extend(["--lang", args.lang])
+    # 与 AGENT_OPTIONS 一致，启用计划模式
+    cmd.append("--action-plan")
     return cmd
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Travel plan workflow launcher")
     parser.add_argument("--to", dest="to", help="目的地")
     parser.add_argument("--from", dest="from_city", action="append", help="出发地，可多次指定")
@@ -100,7 +108,17 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--device-id", help="ADB device id")
     parser.add_argument("--lang", choices=["cn", "en"], default="cn", help="Prompt language (default cn)")
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
+
+
+def run(payload: Dict[str, Any], agent) -> str:
+    """Workflow entrypoint for the task queue's warm worker processes."""
+    argv = [str(a) for a in payload.get("script_args") or []]
+    if not argv and payload.get("content"):
+        argv = ["--note", str(payload["content"])]
+    # 模型与设备参数由常驻进程中的 agent 决定，这里只解析行程参数
+    args = parse_args(argv)
+    return agent.run(build_prompt(args))
 
 
 def main():